@@ -0,0 +1,30 @@
+"""Add archived_at column to feed_items table"""
+import sys
+from pathlib import Path
+
+# Add backend to path
+current_dir = Path(__file__).parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from utils.database import engine, DATABASE_URL
+from sqlalchemy import text, inspect
+
+def add_archived_column():
+    """Add archived_at column to feed_items table if it doesn't exist"""
+    inspector = inspect(engine)
+    columns = [col['name'] for col in inspector.get_columns('feed_items')]
+
+    if 'archived_at' not in columns:
+        print("Adding archived_at column...")
+        column_type = "DATETIME" if DATABASE_URL.startswith('sqlite') else "TIMESTAMP"
+        with engine.connect() as conn:
+            conn.execute(text(f"ALTER TABLE feed_items ADD COLUMN archived_at {column_type}"))
+            conn.commit()
+        print("✓ archived_at column added successfully!")
+    else:
+        print("✓ archived_at column already exists.")
+
+if __name__ == "__main__":
+    print(f"Database: {DATABASE_URL}")
+    add_archived_column()
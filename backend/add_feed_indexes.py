@@ -0,0 +1,76 @@
+"""Add composite indexes to feed_items (and user_emails.user_id), dropping the ones they replace"""
+import sys
+from pathlib import Path
+
+# Add backend to path
+current_dir = Path(__file__).parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from utils.database import engine, DATABASE_URL
+from sqlalchemy import text, inspect
+
+# (name, unique, column list) - must match the Index definitions in models.py
+FEED_INDEXES = [
+    ("ix_feed_items_sender_received", False, "sender_email, received_date DESC"),
+    ("ix_feed_items_user_id", False, "user_id"),
+    ("ix_feed_items_dedupe", True, "sender_email, core_link, received_date"),
+]
+
+# ix_feed_items_sender_email is covered by the leftmost column of
+# ix_feed_items_sender_received; ix_feed_items_user_received had no reader
+REPLACED_INDEXES = ["ix_feed_items_sender_email", "ix_feed_items_user_received"]
+
+def has_dedupe_constraint(inspector) -> bool:
+    """Tables created by worker.py already have UNIQUE(sender_email, core_link, received_date)"""
+    dedupe = ['sender_email', 'core_link', 'received_date']
+    for constraint in inspector.get_unique_constraints('feed_items'):
+        if constraint['column_names'] == dedupe:
+            return True
+    for index in inspector.get_indexes('feed_items'):
+        if index.get('unique') and index['column_names'] == dedupe:
+            return True
+    return False
+
+def add_feed_indexes():
+    """Create missing feed_items indexes (CONCURRENTLY on PostgreSQL)"""
+    inspector = inspect(engine)
+    existing = {index['name'] for index in inspector.get_indexes('feed_items')}
+    is_sqlite = DATABASE_URL.startswith('sqlite')
+    concurrently = "" if is_sqlite else "CONCURRENTLY "
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, unique, columns in FEED_INDEXES:
+            if name in existing:
+                print(f"✓ {name} already exists.")
+                continue
+            if name == "ix_feed_items_dedupe" and has_dedupe_constraint(inspector):
+                print(f"✓ Dedupe key already enforced by a unique constraint, skipping {name}.")
+                continue
+            print(f"Creating {name}...")
+            try:
+                conn.execute(text(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX {concurrently}{name} ON feed_items ({columns})"
+                ))
+            except Exception as e:
+                print(f"✗ Failed to create {name}: {e}")
+                if unique:
+                    print("  (remove duplicate sender_email/core_link/received_date rows and re-run)")
+                continue
+            print(f"✓ {name} created.")
+
+        # Every feed request looks up the user's linked addresses by user_id
+        if 'ix_user_emails_user_id' not in {i['name'] for i in inspector.get_indexes('user_emails')}:
+            print("Creating ix_user_emails_user_id...")
+            conn.execute(text(f"CREATE INDEX {concurrently}ix_user_emails_user_id ON user_emails (user_id)"))
+            print("✓ ix_user_emails_user_id created.")
+
+        for name in REPLACED_INDEXES:
+            if name in existing:
+                print(f"Dropping {name}...")
+                conn.execute(text(f"DROP INDEX {concurrently}{name}"))
+
+if __name__ == "__main__":
+    print(f"Database: {DATABASE_URL}")
+    add_feed_indexes()
@@ -31,7 +31,8 @@ from starlette.middleware.sessions import SessionMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
 from starlette.responses import Response
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 # Configure logging
@@ -69,6 +70,27 @@ try:
 except Exception as e:
     logger.error(f"Failed to create database tables: {e}")
 
+# Create the full-text search index (FTS5 on SQLite, GIN on PostgreSQL)
+try:
+    from utils.search import ensure_search_index
+    ensure_search_index(engine)
+except Exception as e:
+    logger.error(f"Failed to create search index: {e}")
+
+# Install the change-log triggers behind /api/feed/changes
+try:
+    from utils.changes import ensure_change_log
+    ensure_change_log(engine)
+except Exception as e:
+    logger.error(f"Failed to install change log triggers: {e}")
+
+# Install the rollup triggers behind /api/feed/facets
+try:
+    from utils.facets import ensure_facet_rollups
+    ensure_facet_rollups(engine)
+except Exception as e:
+    logger.error(f"Failed to install facet rollups: {e}")
+
 app = FastAPI(
     title="Busyplates API",
     description="Save it for later - email feed aggregator API",
@@ -113,6 +135,34 @@ app.add_middleware(
 )
 logger.info(f"Session: production={is_production}, same_site={'none' if is_production else 'lax'}")
 
+# Per-request SQL counts and timings (Server-Timing header, slow-query and N+1 logs)
+from utils.database import async_engine, route_engine, replica_engines, remember_user_write
+from utils.query_stats import install_query_instrumentation, start_request, finish_request, QueryBudgetExceeded
+install_query_instrumentation(engine, route_engine or async_engine.sync_engine,
+                              *(replica.sync_engine for replica in replica_engines))
+
+@app.middleware("http")
+async def instrument_queries(request: Request, call_next):
+    stats = start_request()
+    response = await call_next(request)
+    finish_request(stats, request.method, request.url.path)
+    response.headers["Server-Timing"] = stats.server_timing()
+    return response
+
+if replica_engines:
+    # Read-your-writes across a user's clients, recorded before the response goes out
+    @app.middleware("http")
+    async def pin_reads_after_write(request: Request, call_next):
+        response = await call_next(request)
+        await remember_user_write(request)
+        return response
+
+@app.exception_handler(QueryBudgetExceeded)
+async def query_budget_exceeded(request: Request, exc: QueryBudgetExceeded):
+    # Raised before the statement ran, so nothing the request wrote was committed
+    from fastapi.responses import JSONResponse
+    return JSONResponse(status_code=500, content={"detail": str(exc)})
+
 # Request logging
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -155,12 +205,26 @@ def health():
 
 @app.on_event("startup")
 async def startup_event():
+    from utils.feed_events import broker
+    try:
+        await broker.start()
+    except Exception as e:
+        logger.error(f"Failed to start feed event broker: {e}")
     logger.info("Application ready")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    from utils.feed_events import broker
+    from utils.database import async_engine, replica_engines
+    await broker.stop()
+    for async_db_engine in (async_engine, *replica_engines):
+        if async_db_engine is not None:
+            await async_db_engine.dispose()
+
 @app.get("/debug/db")
 def debug_db():
     """Debug endpoint to see which database is being used"""
-    from utils.database import DATABASE_URL, USE_POSTGRES
+    from utils.database import DATABASE_URL, USE_POSTGRES, describe_engine
     
     db_type = "PostgreSQL" if USE_POSTGRES and not DATABASE_URL.startswith('sqlite') else "SQLite"
     # Hide password in URL for security
@@ -173,7 +237,8 @@ def debug_db():
     return {
         "database_type": db_type,
         "database_url": safe_url,
-        "using_postgres": USE_POSTGRES and not DATABASE_URL.startswith('sqlite')
+        "using_postgres": USE_POSTGRES and not DATABASE_URL.startswith('sqlite'),
+        "engine": describe_engine()
     }
 
 @app.get("/debug/cors")
@@ -189,10 +254,10 @@ def debug_cors(request: Request):
     }
 
 @app.get("/debug/users")
-def debug_users(db: Session = Depends(get_db)):
+async def debug_users(db: AsyncSession = Depends(get_db)):
     """Debug endpoint to list all users (email only for security)"""
     from models import User
-    users = db.query(User).all()
+    users = (await db.scalars(select(User))).all()
     return {
         "total_users": len(users),
         "users": [
@@ -207,19 +272,19 @@ def debug_users(db: Session = Depends(get_db)):
     }
 
 @app.delete("/debug/users/{email}")
-def delete_user_by_email(email: str, db: Session = Depends(get_db)):
+async def delete_user_by_email(email: str, db: AsyncSession = Depends(get_db)):
     """Debug endpoint to delete a user by email (for testing only)"""
     from models import User
     import logging
     logger = logging.getLogger(__name__)
     
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.scalars(select(User).where(User.email == email))).first()
     if not user:
         return {"message": f"User with email {email} not found"}
     
     user_id = user.id
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     logger.info(f"Deleted user {user_id} with email {email}")
     return {"message": f"User {user_id} with email {email} deleted successfully"}
 
@@ -0,0 +1,106 @@
+"""Anonymise saved newsletters (.eml) for the url_extraction.py corpus
+
+Usage:
+    python benchmarks/anonymise_newsletter.py MESSAGE.eml [...] --recipient you@example.com
+        [--name "Your Name"] [--out benchmarks/newsletters]
+
+Keeps what the benchmark measures (markup, size, encodings, link layout)
+and drops what identifies the recipient:
+- headers other than From, Subject, Date and the MIME ones; To becomes
+  reader@example.com
+- every --recipient address, plain or URL-encoded, and every --name, in
+  the subject and the text and HTML parts
+- opaque tokens in URLs (tracking ids, per-recipient hashes) are replaced
+  with random strings of the same length and alphabet
+
+Read the output before committing it: anything personal that isn't one of
+the above (a greeting by nickname, an order number in the text) stays.
+"""
+import argparse
+import random
+import re
+import sys
+from email import message_from_bytes
+from email.policy import SMTP, default
+from pathlib import Path
+from urllib.parse import quote
+
+KEPT_HEADERS = {'from', 'subject', 'date', 'mime-version', 'content-type', 'content-transfer-encoding'}
+ANONYMOUS_RECIPIENT = 'reader@example.com'
+
+URL_PATTERN = re.compile(r'https?://[^\s"\'<>]+')
+# Hex ids (Mailchimp's e=, ESP message ids) and long base64-ish tokens; slugs like
+# "notes-on-write-amplification" are left alone
+TOKEN_PATTERN = re.compile(r'[0-9a-fA-F]{8,}|[A-Za-z0-9_-]{20,}')
+SLUG_PATTERN = re.compile(r'[a-z]+(?:-[a-z0-9]+)*')
+
+def scramble(token: str, rng: random.Random) -> str:
+    """A random string shaped like token: digits for digits, letters for letters, same case"""
+    letters = 'abcdef' if re.fullmatch(r'[0-9a-fA-F]+', token) else 'abcdefghijklmnopqrstuvwxyz'
+    def replace(char):
+        if char.isdigit():
+            return rng.choice('0123456789')
+        if char.isalpha():
+            letter = rng.choice(letters)
+            return letter.upper() if char.isupper() else letter
+        return char
+    return ''.join(replace(char) for char in token)
+
+def replace_recipient(text: str, recipients, names) -> str:
+    """text with each recipient address (kept URL-encoded where it was) and name replaced"""
+    for address in recipients:
+        for quoting in (lambda value: value, lambda value: quote(value, safe='')):
+            text = re.sub(re.escape(quoting(address)), quoting(ANONYMOUS_RECIPIENT), text, flags=re.IGNORECASE)
+    for name in names:
+        text = re.sub(re.escape(name), 'Reader', text, flags=re.IGNORECASE)
+    return text
+
+def anonymise_text(text: str, recipients, names, rng: random.Random) -> str:
+    text = replace_recipient(text, recipients, names)
+
+    def scramble_url(match):
+        def scramble_token(token_match):
+            token = token_match.group(0)
+            if SLUG_PATTERN.fullmatch(token) or not re.search(r'\d', token):
+                return token
+            return scramble(token, rng)
+        return TOKEN_PATTERN.sub(scramble_token, match.group(0))
+    return URL_PATTERN.sub(scramble_url, text)
+
+def anonymise(raw: bytes, recipients, names, rng: random.Random) -> bytes:
+    message = message_from_bytes(raw, policy=default)
+    for header in set(message.keys()):
+        if header.lower() not in KEPT_HEADERS:
+            del message[header]
+    message['To'] = ANONYMOUS_RECIPIENT
+    if message['Subject']:
+        subject = replace_recipient(str(message['Subject']), recipients, names)
+        del message['Subject']
+        message['Subject'] = subject
+
+    for part in message.walk():
+        if part.get_content_maintype() != 'text':
+            continue
+        encoding = part.get('Content-Transfer-Encoding', '7bit').lower()
+        text = anonymise_text(part.get_content(), recipients, names, rng)
+        part.set_content(text, subtype=part.get_content_subtype(),
+                         cte='8bit' if encoding in ('7bit', '8bit', 'binary') else encoding)
+        if part is not message:
+            del part['MIME-Version']  # set_content adds one to every part
+    return message.as_bytes(policy=SMTP)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("messages", type=Path, nargs="+")
+    parser.add_argument("--recipient", action="append", default=[], help="address to remove (repeatable)")
+    parser.add_argument("--name", action="append", default=[], help="name to remove (repeatable)")
+    parser.add_argument("--out", type=Path, default=Path(__file__).parent / "newsletters")
+    args = parser.parse_args()
+
+    if not args.recipient:
+        sys.exit("--recipient is required: the address the newsletters were sent to")
+    args.out.mkdir(exist_ok=True)
+    for path in args.messages:
+        rng = random.Random(path.name)  # Same input, same output
+        (args.out / path.name).write_bytes(anonymise(path.read_bytes(), args.recipient, args.name, rng))
+        print(f"  {path.name} -> {args.out / path.name}")
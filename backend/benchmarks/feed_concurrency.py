@@ -0,0 +1,174 @@
+"""Load test: feed listing under many concurrent clients, sync route vs /api/feed
+
+Usage:
+    python benchmarks/feed_concurrency.py [--clients 500] [--requests 10] [--items 2000] [--rounds 2]
+    python benchmarks/feed_concurrency.py --database-url URL   # an EMPTY scratch PostgreSQL database
+
+Serves the API from a forked process (against a throwaway SQLite database
+unless --database-url is given) and keeps --clients requests in flight at once from asyncio clients. The sync
+route runs /api/feed's queries (feed_page_rows) on a blocking session in
+Starlette's threadpool; /api/feed is the route itself, on the async engine
+(PostgreSQL) or a ThreadedSession (SQLite). Each round runs both, the
+first one alternating. Page 2 is requested so the first-page cache doesn't
+answer for either. Failed requests (usually pool checkouts that waited
+DB_POOL_TIMEOUT) are counted, not timed.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend to path and point the app at a scratch database before importing it
+backend_dir = Path(__file__).parent.parent.resolve()
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--database-url", default=None)
+parser.add_argument("--clients", type=int, default=500)
+parser.add_argument("--requests", type=int, default=10)
+parser.add_argument("--items", type=int, default=2000)
+parser.add_argument("--rounds", type=int, default=2)
+args = parser.parse_args()
+
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='feed-bench-')}/bench.db"
+
+import httpx
+import uvicorn
+from fastapi import Depends, Query
+from sqlalchemy.orm import Session
+
+from app import app
+from models import FeedItem, User
+from routes.auth import get_current_user
+from schemas import FeedResponse
+from utils.auth import get_password_hash
+from utils.database import SessionLocal, engine, get_sync_db
+from utils.fast_json import RenderedJSONResponse, dumps
+from routes.feed import feed_page_rows
+from utils.feed_items import get_linked_emails, feed_item_dict
+
+@app.get("/bench/sync-feed", response_model=FeedResponse)
+def sync_get_feed(
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_sync_db),
+    current_user: User = Depends(get_current_user)
+):
+    """/api/feed as a plain sync route: the same queries on a blocking session, run in the threadpool"""
+    linked_email_list = get_linked_emails(db, current_user)
+    total, rows = feed_page_rows(db, linked_email_list, page, limit, None, False)
+    return RenderedJSONResponse(dumps({
+        "items": [feed_item_dict(row) for row in rows],
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "has_more": (page * limit) < total,
+    }))
+
+def seed(item_count: int):
+    """One user with item_count feed items"""
+    db = SessionLocal()
+    db.add(User(username="bench", email="bench@example.com",
+                password_hash=get_password_hash("bench"), email_verified=True))
+    start = datetime(2020, 1, 1)
+    db.add_all([
+        FeedItem(sender_email="bench@example.com", core_link=f"https://example.com/articles/{i}",
+                 received_date=start + timedelta(minutes=i), processed_date=start)
+        for i in range(item_count)
+    ])
+    db.commit()
+    db.close()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def serve(port: int):
+    logging.disable(logging.INFO)  # Per-request access logging would dominate the profile
+    uvicorn.run(app, port=port, log_level="warning", backlog=4096, timeout_keep_alive=120)
+
+async def fetch(reader, writer, request: bytes) -> int:
+    """Send one keep-alive request and read the whole response; returns the status code"""
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    await reader.readexactly(length)
+    return status
+
+async def run(port: int, path: str, cookie: str, clients: int, requests: int) -> tuple:
+    """Latencies (ms) of the successful requests, failure count and wall time, with `clients`
+    connections each sending `requests` GETs
+
+    Raw keep-alive sockets rather than an HTTP client library: with one
+    connection per client, a full client's per-request overhead would be what
+    the benchmark measures.
+    """
+    request = (f"GET {path}?page=2&limit=20 HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+               f"Cookie: {cookie}\r\n\r\n").encode()
+
+    async def client_loop():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        latencies, failed = [], 0
+        for _ in range(requests):
+            started = time.perf_counter()
+            status = await fetch(reader, writer, request)
+            if status == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                failed += 1  # Usually a pool checkout that waited DB_POOL_TIMEOUT
+        writer.close()
+        return latencies, failed
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(client_loop() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return [ms for latencies, _ in results for ms in latencies], sum(failed for _, failed in results), elapsed
+
+def report(label: str, latencies: list, failed: int, elapsed: float):
+    """Throughput counts successful responses only"""
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"  {label:<16} {len(latencies) / elapsed:8.1f} req/s   "
+          f"p50 {statistics.median(latencies):7.1f} ms   p99 {p99:7.1f} ms   max {latencies[-1]:7.1f} ms   "
+          f"{failed} failed")
+
+if __name__ == "__main__":
+    seed(args.items)
+    engine.dispose()  # Don't hand pooled connections to the forked server
+    port = free_port()
+    server = multiprocessing.get_context("fork").Process(target=serve, args=(port,), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            httpx.get(f"{base_url}/health")
+            break
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+    login = httpx.post(f"{base_url}/api/auth/login", json={"email": "bench@example.com", "password": "bench"})
+    cookie = "; ".join(f"{name}={value}" for name, value in login.cookies.items())
+
+    print(f"clients={args.clients} requests/client={args.requests} items={args.items}")
+    routes = [("sync/threadpool", "/bench/sync-feed"), ("/api/feed", "/api/feed")]
+    for round_number in range(args.rounds):
+        # Alternate which route goes first, so neither always runs on a warmer server
+        for label, path in (routes if round_number % 2 == 0 else routes[::-1]):
+            latencies, failed, elapsed = asyncio.run(run(port, path, cookie, args.clients, args.requests))
+            report(label, latencies, failed, elapsed)
+    server.terminate()
@@ -0,0 +1,176 @@
+"""Microbenchmark: feed listing, Pydantic response_model rendering vs the column fast path
+
+Usage:
+    python benchmarks/feed_listing.py [--items 5000] [--limit 100] [--page 2] [--requests 300] [--rounds 4]
+
+Runs against a throwaway SQLite database; nothing touches DATABASE_URL.
+Both routes take the same session and run the same queries
+(routes.feed.feed_page_rows); they differ only in how the page is turned
+into JSON. Two measurements, each after a warm-up and with the order
+alternating between rounds:
+
+- render only: the same rows rendered in-process, no HTTP or database,
+  which isolates what the fast path saves
+- end to end: GET requests through the app on --page, which defaults to 2
+  because first pages are served from the feed cache (utils/feed_cache.py)
+"""
+import argparse
+import statistics
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend to path and point the app at a scratch database before importing it
+backend_dir = Path(__file__).parent.parent.resolve()
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+_tmp_dir = tempfile.mkdtemp(prefix="feed-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+
+from fastapi import Depends, Query
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import JSONResponse
+
+from app import app
+from models import FeedItem, User
+from routes.auth import get_current_user_for_read
+from routes.feed import feed_page_rows
+from schemas import FeedItemResponse, FeedResponse
+from utils.auth import get_password_hash
+from utils.database import SessionLocal, get_read_db
+from utils.fast_json import RenderedJSONResponse, dumps
+from utils.feed_items import get_linked_emails, feed_item_dict
+from utils.query_stats import query_budget
+
+def legacy_response(rows, total: int, page: int, limit: int) -> FeedResponse:
+    """The pre-fast-path rendering: a Pydantic model per item"""
+    return FeedResponse(
+        items=[FeedItemResponse(
+            id=row[0], sender_email=row[1], core_link=row[2], received_date=row[3],
+            processed_date=row[4], notes=row[5], preview=None
+        ) for row in rows],
+        total=total,
+        page=page,
+        limit=limit,
+        has_more=(page * limit) < total
+    )
+
+def fast_response(rows, total: int, page: int, limit: int) -> RenderedJSONResponse:
+    """What routes.feed._feed_page renders for the same rows"""
+    return RenderedJSONResponse(dumps({
+        "items": [feed_item_dict(row) for row in rows],
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "has_more": (page * limit) < total,
+    }))
+
+@app.get("/bench/legacy-feed", response_model=FeedResponse, dependencies=[Depends(query_budget(5))])
+async def legacy_get_feed(
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    """/api/feed's queries, rendered through Pydantic models and response_model"""
+    linked_email_list = await db.run_sync(get_linked_emails, current_user)
+    total, rows = await db.run_sync(feed_page_rows, linked_email_list, page, limit, None, False)
+    return legacy_response(rows, total, page, limit)
+
+def seed(item_count: int):
+    """Create one user with item_count feed items"""
+    db = SessionLocal()
+    user = User(username="bench", email="bench@example.com",
+                password_hash=get_password_hash("bench"), email_verified=True)
+    db.add(user)
+    db.commit()
+    start = datetime(2020, 1, 1)
+    db.bulk_save_objects([
+        FeedItem(
+            sender_email="bench@example.com",
+            core_link=f"https://example.com/articles/{i}?utm_source=newsletter",
+            received_date=start + timedelta(minutes=i),
+            processed_date=start + timedelta(minutes=i, seconds=5),
+            notes=f"note for item {i}" if i % 4 == 0 else None,
+        )
+        for i in range(item_count)
+    ])
+    db.commit()
+    db.close()
+
+def run(client: TestClient, path: str, requests: int) -> float:
+    """Return requests per second for GET path"""
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path)
+        assert response.status_code == 200, response.text
+    return requests / (time.perf_counter() - started)
+
+def render_rate(render, requests: int) -> float:
+    """Return renders per second of one page"""
+    started = time.perf_counter()
+    for _ in range(requests):
+        render()
+    return requests / (time.perf_counter() - started)
+
+def compare(label: str, legacy, fast, requests: int, rounds: int):
+    """Time legacy() and fast() in alternating order and print rates per round and the median ratio"""
+    ratios = []
+    print(label)
+    for round_number in range(rounds):
+        if round_number % 2 == 0:
+            legacy_rate, fast_rate = legacy(requests), fast(requests)
+        else:
+            fast_rate, legacy_rate = fast(requests), legacy(requests)
+        ratios.append(fast_rate / legacy_rate)
+        print(f"  round {round_number + 1}: Pydantic {legacy_rate:9.1f}/s   "
+              f"fast path {fast_rate:9.1f}/s   ({ratios[-1]:.2f}x)")
+    print(f"  median: {statistics.median(ratios):.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--page", type=int, default=2, help="page 1 measures cache hits on the fast path")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=4)
+    args = parser.parse_args()
+
+    seed(args.items)
+    client = TestClient(app)
+    client.post("/api/auth/login", json={"email": "bench@example.com", "password": "bench"})
+
+    # The rows both routes render, from the same query
+    db = SessionLocal()
+    user = db.query(User).filter(User.email == "bench@example.com").one()
+    total, rows = feed_page_rows(db, get_linked_emails(db, user), args.page, args.limit, None, False)
+    db.close()
+
+    # FastAPI's response_model step: validate against FeedResponse, dump to JSON types, encode
+    adapter = TypeAdapter(FeedResponse)
+    def render_legacy():
+        content = adapter.validate_python(legacy_response(rows, total, args.page, args.limit))
+        return JSONResponse(adapter.dump_python(content, mode="json"))
+    def render_fast():
+        return fast_response(rows, total, args.page, args.limit)
+
+    query = f"limit={args.limit}&page={args.page}"
+    legacy_path, fast_path = f"/bench/legacy-feed?{query}", f"/api/feed?{query}"
+    assert client.get(legacy_path).json() == client.get(fast_path).json(), "fast path output differs"
+
+    # Warm-up: imports, pools, Pydantic and orjson first calls
+    render_rate(render_legacy, 50), render_rate(render_fast, 50)
+    run(client, legacy_path, 20), run(client, fast_path, 20)
+
+    print(f"items={args.items} limit={args.limit} page={args.page} requests={args.requests} rounds={args.rounds}")
+    compare("render only (renders/s)", lambda n: render_rate(render_legacy, n * 10),
+            lambda n: render_rate(render_fast, n * 10), args.requests, args.rounds)
+    compare(f"end to end, page {args.page} (req/s)", lambda n: run(client, legacy_path, n),
+            lambda n: run(client, fast_path, n), args.requests, args.rounds)
+    print(f"cached first page: {run(client, f'/api/feed?limit={args.limit}', args.requests):9.1f} req/s")
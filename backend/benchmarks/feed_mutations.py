@@ -0,0 +1,149 @@
+"""Load test: notes PATCH latency under concurrency, multi-query path vs single statement
+
+Usage:
+    python benchmarks/feed_mutations.py [--clients 32] [--requests 50] [--rounds 2]
+
+Starts the API on a local port against a throwaway SQLite database and hits
+it from --clients concurrent threads, each sending --requests PATCHes. Both
+routes take the same get_db session and run their whole body in one
+db.run_sync, so the only difference is the queries. After a warm-up, each
+round runs both routes, alternating which goes first.
+"""
+import argparse
+import logging
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend to path and point the app at a scratch database before importing it
+backend_dir = Path(__file__).parent.parent.resolve()
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+_tmp_dir = tempfile.mkdtemp(prefix="feed-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+
+import httpx
+import uvicorn
+from fastapi import Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import app
+from models import FeedItem, User
+from routes.auth import get_current_user
+from schemas import FeedItemResponse, UpdateNotesRequest
+from utils.auth import get_password_hash
+from utils.database import SessionLocal, get_db
+from utils.feed_items import get_linked_emails
+
+def legacy_update_notes_body(db: Session, item_id: int, notes: str, current_user: User) -> FeedItemResponse:
+    """The previous implementation: load emails, load item, check, write, refresh"""
+    linked_email_list = get_linked_emails(db, current_user)
+    item = db.query(FeedItem).filter(FeedItem.id == item_id).first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Feed item not found")
+    if item.sender_email not in linked_email_list:
+        raise HTTPException(status_code=403, detail="Not authorized to update this item")
+    item.notes = notes
+    db.commit()
+    db.refresh(item)
+    return FeedItemResponse(
+        id=item.id, sender_email=item.sender_email, core_link=item.core_link,
+        received_date=item.received_date, processed_date=item.processed_date,
+        notes=item.notes, preview=None
+    )
+
+@app.patch("/bench/legacy-notes/{item_id}", response_model=FeedItemResponse)
+async def legacy_update_notes(
+    item_id: int,
+    request: UpdateNotesRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """The previous queries on the route's session, in one run_sync like /api/feed"""
+    return await db.run_sync(legacy_update_notes_body, item_id, request.notes, current_user)
+
+def seed(clients: int) -> list:
+    """One user per client, each with a few items; returns [(email, item_ids)]"""
+    db = SessionLocal()
+    accounts = []
+    start = datetime(2020, 1, 1)
+    password_hash = get_password_hash("bench")
+    for n in range(clients):
+        email = f"bench{n}@example.com"
+        db.add(User(username=f"bench{n}", email=email, password_hash=password_hash, email_verified=True))
+        items = [FeedItem(sender_email=email, core_link=f"https://example.com/{n}/{i}",
+                          received_date=start + timedelta(minutes=i), processed_date=start)
+                 for i in range(5)]
+        db.add_all(items)
+        db.commit()
+        accounts.append((email, [item.id for item in items]))
+    db.close()
+    return accounts
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def run(base_url: str, path: str, accounts: list, requests: int) -> list:
+    """Latencies (ms) of all PATCHes sent concurrently, one thread per account"""
+    def client_loop(account):
+        email, item_ids = account
+        latencies = []
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            client.post("/api/auth/login", json={"email": email, "password": "bench"})
+            for i in range(requests):
+                started = time.perf_counter()
+                response = client.patch(f"{path}/{item_ids[i % len(item_ids)]}", json={"notes": f"n{i}"})
+                latencies.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.text
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=len(accounts)) as pool:
+        return [ms for result in pool.map(client_loop, accounts) for ms in result]
+
+def report(label: str, latencies: list, elapsed: float):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"  {label:<22} {len(latencies) / elapsed:8.1f} req/s   "
+          f"p50 {statistics.median(latencies):7.1f} ms   p99 {p99:7.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    # The per-request INFO lines would be timed along with the routes
+    logging.disable(logging.INFO)
+
+    accounts = seed(args.clients)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}"
+
+    routes = [("load/check/write", "/bench/legacy-notes"), ("single statement", "/api/feed")]
+    for label, path in routes:
+        run(base_url, path, accounts, 2)  # Warm-up: pools, caches, first-request imports
+
+    print(f"clients={args.clients} requests/client={args.requests}")
+    for round_number in range(args.rounds):
+        print(f"round {round_number + 1}")
+        for label, path in (routes if round_number % 2 == 0 else routes[::-1]):
+            started = time.perf_counter()
+            latencies = run(base_url, path, accounts, args.requests)
+            report(label, latencies, time.perf_counter() - started)
+    server.should_exit = True
@@ -0,0 +1,89 @@
+"""Benchmark: primary-link accuracy and speed, first-non-junk filter vs LinkScorer
+
+Usage:
+    python benchmarks/link_scoring.py [--corpus benchmarks/link_corpus.json] [--rules rules.json] [--rounds 200] [-v]
+
+The corpus is a JSON list of labeled emails: {"name", "text", "html",
+"expected"}, where expected is the link a reader would call the email's
+point (null if it has none). Both pickers see the same extracted links;
+accuracy is the share of emails where they return expected, and speed is
+candidate URLs scored per second (extraction not included). --rules tries
+a rules file (same format as LINK_RULES_FILE) instead of the defaults; -v
+lists the emails each one gets wrong.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent.resolve()
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from utils.email_parsing import extract_links
+from utils.link_scoring import LinkScorer, load_rules
+
+def legacy_get_primary_url(urls):
+    """The pre-LinkScorer implementation: the first URL no junk pattern matches"""
+    if not urls:
+        return None
+
+    junk_patterns = [
+        r'apps\.apple\.com',
+        r'play\.google\.com',
+        r'onelink\.me',
+        r'app\.link',
+        r'/download',
+        r'cdnjs\.cloudflare\.com',
+        r'ea\.twimg\.com',
+        r'pbs\.twimg\.com/profile',
+        r'\.(png|jpg|jpeg|gif|svg|ico|css|js)(\?|$)',
+        r'/pixel',
+        r'google-analytics\.com',
+        r'doubleclick\.net',
+    ]
+
+    for url in urls:
+        is_junk = any(re.search(pattern, url, re.IGNORECASE) for pattern in junk_patterns)
+        if not is_junk:
+            return url
+
+    return urls[0] if urls else None
+
+def evaluate(pick, cases, rounds: int):
+    """(correct count, wrong case names, URLs scored per second)"""
+    wrong = [case['name'] for case in cases if pick(case['links']) != case['expected']]
+    urls = sum(len(case['links']) for case in cases)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for case in cases:
+            pick(case['links'])
+    rate = rounds * urls / (time.perf_counter() - started)
+    return len(cases) - len(wrong), wrong, rate
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, default=Path(__file__).parent / "link_corpus.json")
+    parser.add_argument("--rules", default='')
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    cases = json.loads(args.corpus.read_text())
+    for case in cases:
+        case['links'] = extract_links(case.get('text', ''), case.get('html', ''))
+    scorer = LinkScorer(load_rules(args.rules))
+    urls = sum(len(case['links']) for case in cases)
+
+    print(f"corpus={args.corpus} emails={len(cases)} candidate URLs={urls}")
+    for label, pick in (
+        ("first non-junk", lambda links: legacy_get_primary_url([link.url for link in links])),
+        ("LinkScorer", scorer.pick),
+    ):
+        correct, wrong, rate = evaluate(pick, cases, args.rounds)
+        print(f"  {label:15} accuracy {correct}/{len(cases)} ({correct / len(cases):6.1%})  {rate:10.0f} URLs/s")
+        if args.verbose:
+            for name in wrong:
+                print(f"      wrong: {name}")
@@ -20,6 +20,25 @@ class Settings:
     """Simple settings class using os.getenv"""
     # Database
     database_url: str = os.getenv('DATABASE_URL', 'sqlite:///feed.db')
+
+    # Read replicas (comma-separated PostgreSQL URLs) for read-only routes; a user who
+    # wrote within the stickiness window keeps reading from the primary (on every client)
+    database_replica_urls: str = os.getenv('DATABASE_REPLICA_URLS', '')
+    replica_stickiness_seconds: int = int(os.getenv('REPLICA_STICKINESS_SECONDS', '5'))
+    replica_retry_seconds: int = int(os.getenv('REPLICA_RETRY_SECONDS', '30'))
+
+    # Connection pool (PostgreSQL and file-based SQLite)
+    db_pool_size: int = int(os.getenv('DB_POOL_SIZE', '10'))
+    db_max_overflow: int = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    db_pool_timeout: int = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+    db_pool_recycle: int = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    db_pool_pre_ping: bool = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+    # SQLite pragmas (WAL lets API reads proceed while the worker writes)
+    sqlite_journal_mode: str = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    sqlite_synchronous: str = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    sqlite_busy_timeout_ms: int = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    sqlite_mmap_size: int = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
     
     # JWT
     jwt_secret: str = os.getenv('JWT_SECRET', 'your-secret-key-change-in-production')
@@ -40,6 +59,59 @@ class Settings:
     gmail_user: str = os.getenv('GMAIL_USER', 'addtofeed2@gmail.com')
     gmail_password: str = os.getenv('GMAIL_PASSWORD', '')
     check_interval: int = int(os.getenv('CHECK_INTERVAL', '30'))
+    # IMAP IDLE push mode (falls back to polling every check_interval when the
+    # server lacks IDLE); IDLE is renewed before the server's 29-minute timeout
+    imap_idle: bool = os.getenv('IMAP_IDLE', 'true').lower() == 'true'
+    imap_idle_timeout: int = int(os.getenv('IMAP_IDLE_TIMEOUT', '1500'))
+    # The worker keeps one IMAP connection: NOOP it before use after this many idle
+    # seconds; reconnects back off exponentially (with jitter) up to imap_backoff_max
+    imap_health_check_seconds: int = int(os.getenv('IMAP_HEALTH_CHECK_SECONDS', '20'))
+    imap_backoff_base: float = float(os.getenv('IMAP_BACKOFF_BASE', '1'))
+    imap_backoff_max: float = float(os.getenv('IMAP_BACKOFF_MAX', '300'))
+    # Prometheus textfile (node_exporter textfile collector) the worker rewrites with its
+    # IMAP session counters every rebalance; empty to only log them hourly
+    imap_metrics_file: str = os.getenv('IMAP_METRICS_FILE', '')
+    # UIDs per BODYSTRUCTURE fetch; text bytes fetched per message (the rest is cut off)
+    imap_fetch_batch_size: int = int(os.getenv('IMAP_FETCH_BATCH_SIZE', '200'))
+    imap_max_message_bytes: int = int(os.getenv('IMAP_MAX_MESSAGE_BYTES', '1000000'))
+    # Processes that parse fetched mail (0 = one per CPU, 1 = parse in the worker
+    # itself) and how many messages may be queued for them at once (0 = 4 per process)
+    parse_workers: int = int(os.getenv('PARSE_WORKERS', '0'))
+    parse_max_in_flight: int = int(os.getenv('PARSE_MAX_IN_FLIGHT', '0'))
+    # JSON file overriding the link-scoring rules (see utils/link_scoring.py DEFAULT_RULES)
+    link_rules_file: str = os.getenv('LINK_RULES_FILE', '')
+
+    # Mailboxes (the mailboxes table, see manage_mailboxes.py) are leased to worker
+    # processes; leases last mailbox_lease_seconds and are renewed and rebalanced every
+    # mailbox_rebalance_seconds, so a crashed worker's mailboxes move to the others
+    worker_id: str = os.getenv('WORKER_ID', '')
+    mailbox_lease_seconds: int = int(os.getenv('MAILBOX_LEASE_SECONDS', '90'))
+    mailbox_rebalance_seconds: int = int(os.getenv('MAILBOX_REBALANCE_SECONDS', '30'))
+
+    # Live feed stream (SSE)
+    feed_stream_heartbeat: int = int(os.getenv('FEED_STREAM_HEARTBEAT', '15'))
+    feed_stream_poll_interval: float = float(os.getenv('FEED_STREAM_POLL_INTERVAL', '2'))
+    feed_stream_replay_limit: int = int(os.getenv('FEED_STREAM_REPLAY_LIMIT', '500'))
+
+    # Storage tiers: feed items older than this many days move to the compressed
+    # feed_items_cold table (0 disables); PostgreSQL monthly partitions created ahead
+    cold_tier_after_days: int = int(os.getenv('COLD_TIER_AFTER_DAYS', '365'))
+    cold_tier_batch_size: int = int(os.getenv('COLD_TIER_BATCH_SIZE', '1000'))
+    feed_partition_months_ahead: int = int(os.getenv('FEED_PARTITION_MONTHS_AHEAD', '3'))
+
+    # Delta sync: how long change records and delete tombstones are kept
+    change_retention_days: int = int(os.getenv('CHANGE_RETENTION_DAYS', '30'))
+
+    # First-page feed cache (FEED_CACHE_URL=redis://... to share it between processes)
+    feed_cache_url: str = os.getenv('FEED_CACHE_URL', '')
+    feed_cache_size: int = int(os.getenv('FEED_CACHE_SIZE', '1000'))
+    feed_cache_ttl: int = int(os.getenv('FEED_CACHE_TTL', '60'))
+
+    # SQL instrumentation: slow-query log threshold, repeated-statement (N+1) warning,
+    # and whether exceeding a route's query budget fails the request (for test runs)
+    slow_query_ms: float = float(os.getenv('SLOW_QUERY_MS', '200'))
+    query_repeat_warn: int = int(os.getenv('QUERY_REPEAT_WARN', '10'))
+    query_budget_strict: bool = os.getenv('QUERY_BUDGET_STRICT', 'false').lower() == 'true'
 
 settings = Settings()
 
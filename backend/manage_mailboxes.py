@@ -0,0 +1,105 @@
+"""Add, list, enable, disable and remove the IMAP mailboxes the worker watches
+
+Usage:
+    python manage_mailboxes.py list
+    python manage_mailboxes.py add NAME USERNAME [--host imap.gmail.com] [--port 993] [--folder INBOX]
+                                          [--password-env VAR | --store-password]
+    python manage_mailboxes.py enable|disable|remove NAME
+
+Passwords stay out of the database by default: only the name of an
+environment variable is stored (--password-env, default
+MAILBOX_<NAME>_PASSWORD) and each worker reads the password from its own
+environment. --store-password instead prompts for it and stores it in
+plain text in the mailboxes table, for setups without per-worker secrets.
+Running workers pick changes up at their next rebalance
+(MAILBOX_REBALANCE_SECONDS).
+"""
+import argparse
+import getpass
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add current directory to path
+current_dir = Path(__file__).parent.resolve()
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import delete, insert, select, update
+
+from utils.database import engine
+from models import Mailbox
+from utils.mailbox_leases import ensure_mailbox_tables
+
+def list_mailboxes():
+    with engine.connect() as conn:
+        rows = conn.execute(select(Mailbox).order_by(Mailbox.id)).all()
+    if not rows:
+        print("No mailboxes; the worker adds GMAIL_USER as 'default' when it starts.")
+    now = datetime.utcnow()
+    for row in rows:
+        if row.lease_owner and row.lease_expires_at and row.lease_expires_at >= now:
+            lease = f"watched by {row.lease_owner}"
+        else:
+            lease = "not watched"
+        print(f"{row.name:20} {row.username}/{row.folder} on {row.host}:{row.port}  "
+              f"{'enabled' if row.enabled else 'disabled'}, {lease}")
+
+def default_password_env(name: str) -> str:
+    return f"MAILBOX_{re.sub(r'[^A-Z0-9]+', '_', name.upper()).strip('_')}_PASSWORD"
+
+def add_mailbox(args):
+    password, password_env = None, args.password_env or default_password_env(args.name)
+    if args.store_password:
+        password, password_env = getpass.getpass(f"Password for {args.username} (stored in the database): "), None
+    with engine.begin() as conn:
+        if conn.execute(select(Mailbox.id).where(Mailbox.name == args.name)).first():
+            print(f"✗ A mailbox named {args.name} already exists")
+            return
+        conn.execute(insert(Mailbox).values(
+            name=args.name, host=args.host, port=args.port, username=args.username, password=password,
+            password_env=password_env, folder=args.folder, enabled=True, created_at=datetime.utcnow(),
+        ))
+    print(f"✓ Added {args.name}")
+    if password_env:
+        print(f"  Set {password_env} in every worker's environment to its password.")
+
+def set_enabled(name: str, enabled: bool):
+    with engine.begin() as conn:
+        updated = conn.execute(update(Mailbox).where(Mailbox.name == name).values(enabled=enabled))
+    print(f"✓ {'Enabled' if enabled else 'Disabled'} {name}" if updated.rowcount else f"✗ No mailbox named {name}")
+
+def remove_mailbox(name: str):
+    # Its UID checkpoint stays in mailbox_sync_state but is keyed by the row's id:
+    # re-adding the mailbox starts a new one (the first sync picks up unseen mail)
+    with engine.begin() as conn:
+        removed = conn.execute(delete(Mailbox).where(Mailbox.name == name))
+    print(f"✓ Removed {name}" if removed.rowcount else f"✗ No mailbox named {name}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    add = commands.add_parser("add")
+    add.add_argument("name")
+    add.add_argument("username")
+    add.add_argument("--host", default="imap.gmail.com")
+    add.add_argument("--port", type=int, default=993)
+    add.add_argument("--folder", default="INBOX")
+    secret = add.add_mutually_exclusive_group()
+    secret.add_argument("--password-env", default=None)
+    secret.add_argument("--store-password", action="store_true")
+    for command in ("enable", "disable", "remove"):
+        commands.add_parser(command).add_argument("name")
+    args = parser.parse_args()
+
+    ensure_mailbox_tables(engine)
+    if args.command == "list":
+        list_mailboxes()
+    elif args.command == "add":
+        add_mailbox(args)
+    elif args.command in ("enable", "disable"):
+        set_enabled(args.name, args.command == "enable")
+    else:
+        remove_mailbox(args.name)
@@ -11,7 +11,7 @@ if str(current_dir) not in sys.path:
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Boolean, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -37,7 +37,7 @@ class UserEmail(Base):
     __tablename__ = "user_emails"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     email_address = Column(String, nullable=False, index=True)
     verified = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -49,18 +49,102 @@ class FeedItem(Base):
     __tablename__ = "feed_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    sender_email = Column(String, nullable=False, index=True)
+    sender_email = Column(String, nullable=False)
     core_link = Column(String, nullable=False)
     received_date = Column(DateTime, nullable=False)
     processed_date = Column(DateTime, nullable=False, default=datetime.utcnow)
     notes = Column(Text, nullable=True)
+    archived_at = Column(DateTime, nullable=True)
 
     # User association (nullable for backward compatibility)
+    # Indexed for deleting a user, which looks their items up by user_id
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
 
     # Relationships
     user = relationship("User", back_populates="feed_items")
 
+# Feed queries filter on sender and sort newest first; this composite index
+# lets them walk the index instead of sorting. It replaces the old
+# single-column sender_email index (add_feed_indexes.py migrates existing
+# databases). The unique index is the worker's dedupe key.
+Index("ix_feed_items_sender_received", FeedItem.sender_email, FeedItem.received_date.desc())
+Index("ix_feed_items_dedupe", FeedItem.sender_email, FeedItem.core_link, FeedItem.received_date, unique=True)
+
+class FeedItemCold(Base):
+    """Feed items older than settings.cold_tier_after_days, moved out of feed_items by the worker
+
+    Only what the feed filters and sorts on is kept as columns; the rest of
+    the row (link, notes, previews...) is zlib-compressed JSON in payload.
+    """
+    __tablename__ = "feed_items_cold"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # Same id as in feed_items
+    sender_email = Column(String, nullable=False)
+    received_date = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    moved_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    payload = Column(LargeBinary, nullable=False)
+
+Index("ix_feed_items_cold_sender_received", FeedItemCold.sender_email, FeedItemCold.received_date.desc(), FeedItemCold.id)
+
+class FeedChange(Base):
+    """Change log for delta sync; rows are written by database triggers on feed_items"""
+    __tablename__ = "feed_changes"
+    __table_args__ = (
+        Index("ix_feed_changes_sender_seq", "sender_email", "seq"),
+        {"sqlite_autoincrement": True},  # Never reuse seq values after pruning
+    )
+
+    seq = Column(Integer, primary_key=True)
+    item_id = Column(Integer, nullable=False)
+    sender_email = Column(String, nullable=False)
+    op = Column(String(10), nullable=False)  # upsert or delete
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    txid = Column(BigInteger, nullable=True, index=True)  # Writing transaction (PostgreSQL only)
+
+class FeedFacet(Base):
+    """Per-sender item counts by link domain and month, maintained by triggers on feed_items"""
+    __tablename__ = "feed_facets"
+
+    sender_email = Column(String, primary_key=True)
+    facet = Column(String(10), primary_key=True)  # domain or month
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class MailboxSyncState(Base):
+    """IMAP sync checkpoint: the mailbox's UIDVALIDITY and the highest UID the worker has processed"""
+    __tablename__ = "mailbox_sync_state"
+
+    mailbox = Column(String, primary_key=True)  # MailboxConfig.checkpoint_key
+    uid_validity = Column(BigInteger, nullable=False)
+    last_uid = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class Mailbox(Base):
+    """An IMAP mailbox the worker watches; worker processes share them out by lease (utils/mailbox_leases.py)"""
+    __tablename__ = "mailboxes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    host = Column(String, nullable=False, default="imap.gmail.com")
+    port = Column(Integer, nullable=False, default=993)
+    username = Column(String, nullable=False)
+    password = Column(String, nullable=True)
+    password_env = Column(String, nullable=True)  # Or the name of an environment variable holding it
+    folder = Column(String, nullable=False, default="INBOX")
+    enabled = Column(Boolean, nullable=False, default=True)
+    lease_owner = Column(String, nullable=True)  # worker_id of the process watching it
+    lease_expires_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class MailWorker(Base):
+    """A running worker process; live ones (recent heartbeat) split the mailboxes between them"""
+    __tablename__ = "mail_workers"
+
+    worker_id = Column(String, primary_key=True)
+    heartbeat_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
 class EmailVerificationToken(Base):
     __tablename__ = "email_verification_tokens"
 
@@ -0,0 +1,94 @@
+"""Convert feed_items into a table range-partitioned by month on received_date (PostgreSQL only)
+
+Run once, in a quiet moment: the copy happens in one transaction that holds
+an exclusive lock on feed_items. Take a backup first. With --keep-old the
+original table is kept as feed_items_unpartitioned instead of being dropped.
+"""
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add backend to path
+current_dir = Path(__file__).parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import inspect, text
+
+from utils.database import engine, DATABASE_URL
+from models import FeedItem
+from utils.partitions import (
+    add_months, create_partition_sql, is_partitioned, month_start, partition_name
+)
+from utils.search import ensure_search_index
+from utils.changes import ensure_change_log
+from utils.facets import ensure_facet_rollups
+from config import settings
+
+def partition_feed_items(keep_old: bool = False):
+    if engine.dialect.name != 'postgresql':
+        print("✗ Partitioning is PostgreSQL only; on SQLite old items go to the feed_items_cold table.")
+        return
+    if is_partitioned(engine):
+        print("✓ feed_items is already partitioned.")
+        return
+    has_user_id = 'user_id' in {c['name'] for c in inspect(engine).get_columns('feed_items')}
+
+    with engine.begin() as conn:
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence('feed_items', 'id')")).scalar()
+        if sequence is None:
+            print("✗ feed_items.id isn't backed by a serial sequence; convert it by hand.")
+            return
+        conn.execute(text("LOCK TABLE feed_items IN ACCESS EXCLUSIVE MODE"))
+        oldest, count = conn.execute(text("SELECT min(received_date), count(*) FROM feed_items")).one()
+        print(f"Partitioning {count} rows...")
+
+        # Old indexes keep their names until the table is dropped; move them aside
+        conn.execute(text("ALTER TABLE feed_items RENAME TO feed_items_unpartitioned"))
+        for (index_name,) in conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = 'feed_items_unpartitioned'"
+        )).all():
+            conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:50]}_unpartitioned"'))
+
+        # The partition key has to be part of the primary key
+        conn.execute(text(
+            "CREATE TABLE feed_items (LIKE feed_items_unpartitioned INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (received_date)"
+        ))
+        conn.execute(text("ALTER TABLE feed_items ADD PRIMARY KEY (id, received_date)"))
+        if has_user_id:
+            conn.execute(text("ALTER TABLE feed_items ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+
+        month = month_start(oldest or datetime.utcnow())
+        last = add_months(month_start(datetime.utcnow()), settings.feed_partition_months_ahead)
+        while month <= last:
+            conn.execute(text(create_partition_sql(month)))
+            month = add_months(month, 1)
+        conn.execute(text("CREATE TABLE feed_items_default PARTITION OF feed_items DEFAULT"))
+        print(f"✓ Created monthly partitions through {partition_name(last)} plus feed_items_default.")
+
+        # No triggers exist on the new table yet, so the copy doesn't touch the change log or facets
+        conn.execute(text("INSERT INTO feed_items SELECT * FROM feed_items_unpartitioned"))
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY feed_items.id"))
+        if keep_old:
+            print("✓ Kept the original table as feed_items_unpartitioned.")
+        else:
+            conn.execute(text("DROP TABLE feed_items_unpartitioned"))
+
+        for index in FeedItem.__table__.indexes:
+            index.create(conn)
+        print(f"✓ Copied {count} rows and rebuilt indexes.")
+
+    # Search index and the change-log / facet triggers live on the table itself
+    ensure_search_index(engine)
+    ensure_change_log(engine)
+    ensure_facet_rollups(engine)
+    print("✓ Reinstalled search index and triggers.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keep-old", action="store_true")
+    args = parser.parse_args()
+    print(f"Database: {DATABASE_URL}")
+    partition_feed_items(args.keep_old)
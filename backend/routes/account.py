@@ -13,7 +13,9 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import secrets
 import os
@@ -29,6 +31,7 @@ from schemas import (
 from utils.auth import verify_password, get_password_hash
 from utils.email import email_service
 from routes.auth import get_current_user
+from utils.feed_cache import feed_cache
 
 router = APIRouter(prefix="/api/account", tags=["account"])
 
@@ -37,15 +40,15 @@ def generate_token() -> str:
     return secrets.token_urlsafe(48)
 
 @router.put("/profile", response_model=UserResponse)
-def update_profile(
+async def update_profile(
     data: UpdateProfileRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update user profile"""
     # Check if username is taken (if changing)
     if data.username and data.username != current_user.username:
-        existing = db.query(User).filter(User.username == data.username).first()
+        existing = (await db.scalars(select(User).where(User.username == data.username))).first()
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -55,7 +58,7 @@ def update_profile(
 
     # Check if email is taken (if changing)
     if data.email and data.email != current_user.email:
-        existing = db.query(User).filter(User.email == data.email).first()
+        existing = (await db.scalars(select(User).where(User.email == data.email))).first()
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -74,27 +77,28 @@ def update_profile(
             expires_at=expires
         )
         db.add(verification)
-        db.commit()
+        await db.commit()
+        await feed_cache.ainvalidate_user(current_user.id)  # Own address is part of the feed
 
         base_url = os.getenv('FRONTEND_URL', 'http://localhost:3000')
-        email_service.send_verification_email(data.email, token, base_url)
+        await run_in_threadpool(email_service.send_verification_email, data.email, token, base_url)
 
     if data.display_name is not None:
         current_user.display_name = data.display_name
 
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
     return current_user
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     data: ChangePasswordRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Change password"""
     # Verify current password
-    if not verify_password(data.current_password, current_user.password_hash):
+    if not await run_in_threadpool(verify_password, data.current_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Current password is incorrect"
@@ -108,15 +112,15 @@ def change_password(
         )
 
     # Update password
-    current_user.password_hash = get_password_hash(data.new_password)
-    db.commit()
+    current_user.password_hash = await run_in_threadpool(get_password_hash, data.new_password)
+    await db.commit()
 
     return {"message": "Password changed successfully"}
 
 @router.post("/request-password-reset")
-def request_password_reset(data: RequestPasswordResetRequest, db: Session = Depends(get_db)):
+async def request_password_reset(data: RequestPasswordResetRequest, db: AsyncSession = Depends(get_db)):
     """Request password reset email"""
-    user = db.query(User).filter(User.email == data.email).first()
+    user = (await db.scalars(select(User).where(User.email == data.email))).first()
 
     # Always return success to prevent email enumeration
     if not user:
@@ -131,21 +135,21 @@ def request_password_reset(data: RequestPasswordResetRequest, db: Session = Depe
         expires_at=expires
     )
     db.add(reset_token)
-    db.commit()
+    await db.commit()
 
     # Send email
     base_url = os.getenv('FRONTEND_URL', 'http://localhost:3000')
-    email_service.send_password_reset_email(data.email, token, base_url)
+    await run_in_threadpool(email_service.send_password_reset_email, data.email, token, base_url)
 
     return {"message": "If that email exists, a reset link has been sent"}
 
 @router.post("/reset-password")
-def reset_password(data: ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(data: ResetPasswordRequest, db: AsyncSession = Depends(get_db)):
     """Reset password with token"""
-    token_record = db.query(PasswordResetToken).filter(
+    token_record = (await db.scalars(select(PasswordResetToken).where(
         PasswordResetToken.token == data.token,
         PasswordResetToken.used == False
-    ).first()
+    ))).first()
 
     if not token_record:
         raise HTTPException(
@@ -167,20 +171,20 @@ def reset_password(data: ResetPasswordRequest, db: Session = Depends(get_db)):
         )
 
     # Update password
-    user = db.query(User).filter(User.id == token_record.user_id).first()
-    user.password_hash = get_password_hash(data.new_password)
+    user = await db.get(User, token_record.user_id)
+    user.password_hash = await run_in_threadpool(get_password_hash, data.new_password)
     token_record.used = True
-    db.commit()
+    await db.commit()
 
     return {"message": "Password reset successfully"}
 
 @router.post("/verify-email")
-def verify_email(data: VerifyEmailRequest, db: Session = Depends(get_db)):
+async def verify_email(data: VerifyEmailRequest, db: AsyncSession = Depends(get_db)):
     """Verify email with token"""
-    token_record = db.query(EmailVerificationToken).filter(
+    token_record = (await db.scalars(select(EmailVerificationToken).where(
         EmailVerificationToken.token == data.token,
         EmailVerificationToken.used == False
-    ).first()
+    ))).first()
 
     if not token_record:
         raise HTTPException(
@@ -195,20 +199,20 @@ def verify_email(data: VerifyEmailRequest, db: Session = Depends(get_db)):
         )
 
     # Mark email as verified
-    user = db.query(User).filter(User.id == token_record.user_id).first()
+    user = await db.get(User, token_record.user_id)
     user.email_verified = True
     token_record.used = True
-    db.commit()
+    await db.commit()
 
     return {"message": "Email verified successfully"}
 
 @router.post("/resend-verification")
-def resend_verification(
+async def resend_verification(
     data: ResendVerificationRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Resend verification email"""
-    user = db.query(User).filter(User.email == data.email).first()
+    user = (await db.scalars(select(User).where(User.email == data.email))).first()
 
     if not user:
         return {"message": "If that email exists, a verification link has been sent"}
@@ -229,31 +233,31 @@ def resend_verification(
         expires_at=expires
     )
     db.add(verification)
-    db.commit()
+    await db.commit()
 
     base_url = os.getenv('FRONTEND_URL', 'http://localhost:3000')
-    email_service.send_verification_email(user.email, token, base_url)
+    await run_in_threadpool(email_service.send_verification_email, user.email, token, base_url)
 
     return {"message": "Verification email sent"}
 
 @router.delete("/delete")
-def delete_account(
+async def delete_account(
     data: DeleteAccountRequest,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Delete user account (requires password confirmation)"""
     # Verify password
-    if not verify_password(data.password, current_user.password_hash):
+    if not await run_in_threadpool(verify_password, data.password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Password is incorrect"
         )
 
     # Delete user (cascade will delete related records)
-    db.delete(current_user)
-    db.commit()
+    await db.delete(current_user)
+    await db.commit()
 
     # Clear session
     request.session.clear()
@@ -13,29 +13,32 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import secrets
 import os
 
 # Use direct imports (Railway runs from /backend directory)
-from utils.database import get_db
+from utils.database import get_db, get_read_db
 from models import User, EmailVerificationToken
 from schemas import UserRegister, UserLogin, UserResponse
 from utils.auth import verify_password, get_password_hash
 from utils.email import email_service
+from utils.query_stats import query_budget
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
-    """Get current authenticated user from session"""
+async def _session_user(request: Request, db: AsyncSession) -> User:
+    """Load the user named by the session cookie, or 401"""
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authenticated"
         )
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = await db.get(User, int(user_id))
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -43,14 +46,22 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
         )
     return user
 
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)) -> User:
+    """Get current authenticated user from session"""
+    return await _session_user(request, db)
+
+async def get_current_user_for_read(request: Request, db: AsyncSession = Depends(get_read_db)) -> User:
+    """Current user loaded through the read session, for read-only routes"""
+    return await _session_user(request, db)
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserRegister, request: Request, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, request: Request, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     try:
         # Check if user exists
-        existing_user = db.query(User).filter(
+        existing_user = (await db.scalars(select(User).where(
             (User.email == user_data.email) | (User.username == user_data.username)
-        ).first()
+        ))).first()
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -58,7 +69,8 @@ def register(user_data: UserRegister, request: Request, db: Session = Depends(ge
             )
 
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        # bcrypt is deliberately slow; keep it off the event loop
+        hashed_password = await run_in_threadpool(get_password_hash, user_data.password)
         new_user = User(
             username=user_data.username,
             email=user_data.email,
@@ -66,8 +78,8 @@ def register(user_data: UserRegister, request: Request, db: Session = Depends(ge
             email_verified=False
         )
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
 
         # Generate verification token
         token = secrets.token_urlsafe(48)
@@ -79,11 +91,11 @@ def register(user_data: UserRegister, request: Request, db: Session = Depends(ge
             expires_at=expires
         )
         db.add(verification)
-        db.commit()
+        await db.commit()
 
         # Send verification email
         base_url = os.getenv('FRONTEND_URL', 'http://localhost:3000')
-        email_service.send_verification_email(new_user.email, token, base_url)
+        await run_in_threadpool(email_service.send_verification_email, new_user.email, token, base_url)
 
         # Set user ID in session
         request.session["user_id"] = new_user.id
@@ -92,23 +104,23 @@ def register(user_data: UserRegister, request: Request, db: Session = Depends(ge
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred during registration"
         )
 
 @router.post("/login", response_model=UserResponse)
-def login(credentials: UserLogin, request: Request, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, request: Request, db: AsyncSession = Depends(get_db)):
     """Login and create session"""
-    user = db.query(User).filter(User.email == credentials.email).first()
+    user = (await db.scalars(select(User).where(User.email == credentials.email))).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
-    password_valid = verify_password(credentials.password, user.password_hash)
+    password_valid = await run_in_threadpool(verify_password, credentials.password, user.password_hash)
     if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -120,13 +132,13 @@ def login(credentials: UserLogin, request: Request, db: Session = Depends(get_db
     
     return user
 
-@router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+@router.get("/me", response_model=UserResponse, dependencies=[Depends(query_budget(1))])
+async def get_current_user_info(current_user: User = Depends(get_current_user_for_read)):
     """Get current user information"""
     return current_user
 
 @router.post("/logout")
-def logout(request: Request):
+async def logout(request: Request):
     """Logout and clear session"""
     request.session.clear()
     return {"message": "Logged out successfully"}
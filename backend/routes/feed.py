@@ -12,84 +12,290 @@ if str(backend_dir) not in sys.path:
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import Optional, Dict
+from sqlalchemy import select, update, delete, func, or_, union_all, cast, null, String, Text, DateTime, LargeBinary
+from datetime import datetime
+from typing import Optional, List, Tuple, Literal
+import asyncio
 
 # Use direct imports (Railway runs from /backend directory)
-from utils.database import get_db
-from models import FeedItem, User, UserEmail
-from schemas import FeedItemResponse, FeedResponse, LinkPreview, UpdateNotesRequest
-from routes.auth import get_current_user
+from utils.database import AsyncSessionLocal, get_db, get_read_db, is_replica_session
+from models import FeedItem, FeedItemCold, User
+from schemas import (
+    FeedItemResponse, FeedResponse, FeedSearchResponse, FeedChangesResponse, FeedFacetsResponse,
+    LinkPreview, UpdateNotesRequest, BulkFeedRequest, BulkFeedResponse
+)
+from routes.auth import get_current_user, get_current_user_for_read
 from utils.link_preview import fetch_link_preview
+from utils.fast_json import RenderedJSONResponse, dumps
+from utils.search import search_feed_items, SearchUnavailable
+from utils.feed_items import FEED_ITEM_COLUMNS, get_linked_emails, owned_by, feed_item_dict, feed_change_dict
+from utils.feed_events import broker, fetch_items_after
+from utils.export import EXPORT_FORMATS, stream_export
+from utils.changes import get_changes, current_token, SyncTokenExpired
+from utils.facets import get_facets
+from utils.feed_cache import feed_cache
+from utils.cold_tier import cold_feed_row, thaw_items
+from utils.query_stats import query_budget
+from config import settings
 
 router = APIRouter(prefix="/api/feed", tags=["feed"])
 
-@router.get("", response_model=FeedResponse)
-def get_feed(
+# The query helpers in utils/ are written against a plain Session; they're run
+# on the route's session via db.run_sync(helper, ...), without a second copy of
+# every query. On PostgreSQL that keeps the I/O on the event loop (asyncpg); on
+# SQLite the session is a ThreadedSession and run_sync is one threadpool hop,
+# so work that belongs together goes into one run_sync call.
+
+def feed_page_rows(db: Session, linked_email_list: List[str], page: int, limit: int, email: Optional[str],
+                   archived: bool) -> Tuple[int, List[Tuple]]:
+    """(total, FEED_ITEM_COLUMNS rows of the page) across both storage tiers, in one run_sync"""
+    # Build filters (for both storage tiers; both have the filtered columns)
+    def filters(model):
+        conditions = [model.sender_email.in_(linked_email_list)]
+        # Filter by specific email if provided
+        if email:
+            conditions.append(model.sender_email == email)
+        if archived:
+            conditions.append(model.archived_at.isnot(None))
+        else:
+            conditions.append(model.archived_at.is_(None))
+        return conditions
+
+    # Get total count, hot and cold tiers in one round-trip
+    hot_total, cold_total = db.execute(select(
+        select(func.count()).select_from(FeedItem).where(*filters(FeedItem)).scalar_subquery(),
+        select(func.count()).select_from(FeedItemCold).where(*filters(FeedItemCold)).scalar_subquery(),
+    )).one()
+    total = hot_total + cold_total
+
+    # Apply pagination, newest first with id as the tiebreak. Cold items are
+    # usually older than every hot one, but not always (an archive backfill
+    # inserts old mail into the hot table), so when both tiers have items the
+    # page is taken from their merged order in one statement
+    offset = (page - 1) * limit
+    if offset >= total:
+        return total, []
+    hot = select(*FEED_ITEM_COLUMNS, cast(null(), LargeBinary).label("payload")).where(*filters(FeedItem))
+    cold = select(
+        FeedItemCold.id, FeedItemCold.sender_email, cast(null(), String), FeedItemCold.received_date,
+        cast(null(), DateTime), cast(null(), Text), FeedItemCold.payload,
+    ).where(*filters(FeedItemCold))
+    if cold_total == 0:
+        page_query = hot.order_by(FeedItem.received_date.desc(), FeedItem.id.desc())
+    elif hot_total == 0:
+        page_query = cold.order_by(FeedItemCold.received_date.desc(), FeedItemCold.id.desc())
+    else:
+        merged = union_all(hot, cold).subquery()
+        page_query = select(merged).order_by(merged.c.received_date.desc(), merged.c.id.desc())
+    return total, [
+        tuple(row[:6]) if row[6] is None else cold_feed_row((row[0], row[1], row[3], row[6]))
+        for row in db.execute(page_query.offset(offset).limit(limit)).all()
+    ]
+
+async def _feed_page(db: AsyncSession, current_user: User, page: int, limit: int, email: Optional[str],
+                     archived: bool, cache_filters: Tuple):
+    """One page of the feed, rendered; page 1 is written to the cache"""
+    linked_email_list = await db.run_sync(get_linked_emails, current_user)
+    
+    if not linked_email_list:
+        return RenderedJSONResponse({"items": [], "total": 0, "page": page, "limit": limit, "has_more": False})
+
+    if page == 1:
+        cache_snapshot = await feed_cache.asnapshot(current_user.id, linked_email_list)
+    
+    total, rows = await db.run_sync(feed_page_rows, linked_email_list, page, limit, email, archived)
+
+    # Render directly from the column tuples; the payload matches FeedResponse
+    # so FastAPI doesn't need to build and re-validate Pydantic models per item
+    body = dumps({
+        "items": [feed_item_dict(row) for row in rows],
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "has_more": (page * limit) < total,
+    })
+    if page == 1:
+        await feed_cache.aset(current_user.id, cache_filters, cache_snapshot, body)
+    return RenderedJSONResponse(body)
+
+@router.get("", response_model=FeedResponse, dependencies=[Depends(query_budget(5))])
+async def get_feed(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     email: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    archived: bool = Query(False),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
 ):
-    """Get user's feed items"""
-    # Get all email addresses linked to this user
-    linked_emails = db.query(UserEmail.email_address).filter(
-        UserEmail.user_id == current_user.id
-    ).all()
-    linked_email_list = [email[0] for email in linked_emails]
-    
-    # Also include user's own email
-    linked_email_list.append(current_user.email)
-    
-    if not linked_email_list:
-        return FeedResponse(items=[], total=0, page=page, limit=limit, has_more=False)
-    
-    # Build query
-    query = db.query(FeedItem).filter(
-        FeedItem.sender_email.in_(linked_email_list)
+    """Get user's feed items (archived ones only when archived=true)"""
+    # First pages are served from the cache until one of their senders changes
+    cache_filters = (limit, email, archived)
+    if page == 1:
+        cached = await feed_cache.aget(current_user.id, cache_filters)
+        if cached is not None:
+            return RenderedJSONResponse(cached)
+        if is_replica_session(db):
+            # A lagging replica could return a page older than the versions it
+            # gets cached under, so first-page misses are read from the primary
+            await db.close()
+            async with AsyncSessionLocal() as primary:
+                return await _feed_page(primary, current_user, page, limit, email, archived, cache_filters)
+    return await _feed_page(db, current_user, page, limit, email, archived, cache_filters)
+
+@router.get("/search", response_model=FeedSearchResponse, dependencies=[Depends(query_budget(3))])
+async def search_feed(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    archived: bool = Query(False),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    """Full-text search over links, notes and stored preview text, best match first
+
+    Cold-tier items are searched too; archived ones only when archived=true, as in the feed.
+    """
+    linked_email_list = await db.run_sync(get_linked_emails, current_user)
+
+    try:
+        rows, next_cursor = await db.run_sync(search_feed_items, q, linked_email_list, limit, cursor, archived)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except SearchUnavailable:
+        raise HTTPException(status_code=503, detail="Search is not available")
+
+    return RenderedJSONResponse({
+        "items": [feed_item_dict(row) for row in rows],
+        "next_cursor": next_cursor,
+    })
+
+def _sse_event(row: Tuple) -> str:
+    """Format one feed row as an SSE message; the item id doubles as the event id"""
+    return f"id: {row[0]}\nevent: item\ndata: {dumps(feed_item_dict(row)).decode('utf-8')}\n\n"
+
+async def _feed_event_stream(sender_emails: List[str], resume_from: Optional[int]):
+    """Replay anything missed since resume_from, then relay live events with heartbeats"""
+    queue = broker.subscribe(sender_emails)
+    try:
+        yield "retry: 5000\n\n"
+        replayed = set()
+        if resume_from is not None:
+            missed = await run_in_threadpool(
+                fetch_items_after, resume_from, sender_emails, settings.feed_stream_replay_limit
+            )
+            for row in missed:
+                replayed.add(row[0])
+                yield _sse_event(row)
+
+        while True:
+            try:
+                row = await asyncio.wait_for(queue.get(), timeout=settings.feed_stream_heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if row is None:
+                break  # Broker dropped us for falling behind; client resumes via Last-Event-ID
+            if row[0] in replayed:
+                continue  # Already sent during replay; live ids can arrive out of order, so not "<= last"
+            yield _sse_event(row)
+    finally:
+        broker.unsubscribe(queue, sender_emails)
+
+@router.get("/stream", dependencies=[Depends(query_budget(2))])
+async def stream_feed(
+    request: Request,
+    last_event_id: Optional[int] = Query(None, description="Fallback for clients that can't send Last-Event-ID"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    """Server-Sent Events stream of newly ingested feed items"""
+    linked_email_list = await db.run_sync(get_linked_emails, current_user)
+    await db.close()  # Don't hold a pooled connection for the life of the stream
+
+    resume_from = last_event_id
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        resume_from = int(header)
+
+    return StreamingResponse(
+        _feed_event_stream(linked_email_list, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    
-    # Filter by specific email if provided
-    if email:
-        query = query.filter(FeedItem.sender_email == email)
-    
-    # Get total count
-    total = query.count()
-    
-    # Apply pagination
-    items = query.order_by(FeedItem.received_date.desc()).offset((page - 1) * limit).limit(limit).all()
-    
-    # Return items immediately without fetching previews (previews will be fetched async on frontend)
-    items_with_previews = []
-    for item in items:
-        item_dict = FeedItemResponse(
-            id=item.id,
-            sender_email=item.sender_email,
-            core_link=item.core_link,
-            received_date=item.received_date,
-            processed_date=item.processed_date,
-            notes=item.notes,
-            preview=None  # Previews will be fetched asynchronously
-        )
-        items_with_previews.append(item_dict)
-    
-    has_more = (page * limit) < total
-    
-    return FeedResponse(
-        items=items_with_previews,
-        total=total,
-        page=page,
-        limit=limit,
-        has_more=has_more
+
+@router.get("/export", dependencies=[Depends(query_budget(2))])
+async def export_feed(
+    request: Request,
+    format: Literal["ndjson", "csv", "netscape"] = Query("ndjson"),
+    include_notes: bool = Query(True),
+    include_previews: bool = Query(False),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    """Stream the user's whole feed as a download (gzip when the client accepts it)"""
+    linked_email_list = await db.run_sync(get_linked_emails, current_user)
+    await db.close()  # The export opens its own session for the server-side cursor
+
+    media_type, extension = EXPORT_FORMATS[format]
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="busyplates-feed.{extension}"',
+        "Vary": "Accept-Encoding",
+    }
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        stream_export(format, linked_email_list, include_notes, include_previews, use_gzip),
+        media_type=media_type,
+        headers=headers,
     )
 
+@router.get("/changes", response_model=FeedChangesResponse, dependencies=[Depends(query_budget(7))])
+async def get_feed_changes(
+    since: Optional[str] = Query(None, description="next_token from the previous call; omit to get a starting token"),
+    limit: int = Query(500, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    """Items inserted, updated or deleted since a sync token (410 means reload the whole feed)"""
+    if since is None:
+        return RenderedJSONResponse({"items": [], "deleted": [], "next_token": await db.run_sync(current_token), "has_more": False})
+
+    linked_email_list = await db.run_sync(get_linked_emails, current_user)
+    try:
+        rows, tombstones, next_token, has_more = await db.run_sync(get_changes, since, linked_email_list, limit)
+    except SyncTokenExpired:
+        raise HTTPException(status_code=410, detail="Sync token expired, reload the feed")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+    return RenderedJSONResponse({
+        "items": [feed_change_dict(row) for row in rows],
+        "deleted": tombstones,
+        "next_token": next_token,
+        "has_more": has_more,
+    })
+
+@router.get("/facets", response_model=FeedFacetsResponse, dependencies=[Depends(query_budget(4))])
+async def get_feed_facets(
+    domain_limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
+):
+    """Item counts per linked sender, link domain and month (from rollups, not GROUP BY)"""
+    linked_email_list = await db.run_sync(get_linked_emails, current_user)
+    return RenderedJSONResponse(await db.run_sync(get_facets, linked_email_list, domain_limit))
+
 @router.get("/preview", response_model=LinkPreview)
 def get_preview(
     url: str = Query(..., description="URL to fetch preview for"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_for_read)
 ):
     """Fetch preview for a single URL (called asynchronously by frontend)"""
     preview_data = fetch_link_preview(url)
@@ -99,71 +305,144 @@ def get_preview(
         # Return empty preview if fetch failed
         return LinkPreview()
 
-@router.delete("/{item_id}")
-def delete_feed_item(
-    item_id: int,
-    db: Session = Depends(get_db),
+# Budgets for the mutations below include thawing cold items (select, insert, delete, retry)
+@router.post("/bulk", response_model=BulkFeedResponse, dependencies=[Depends(query_budget(7))])
+async def bulk_feed_operation(
+    request: BulkFeedRequest,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Delete a feed item"""
-    # Get all email addresses linked to this user
-    linked_emails = db.query(UserEmail.email_address).filter(
-        UserEmail.user_id == current_user.id
-    ).all()
-    linked_email_list = [email[0] for email in linked_emails]
-    linked_email_list.append(current_user.email)
+    """Delete, annotate or archive many feed items in one set-based statement"""
+    if request.operation == "set_notes" and request.notes is None:
+        raise HTTPException(status_code=400, detail="notes is required for set_notes")
+
+    ids = list(dict.fromkeys(request.ids))  # Dedupe, keep request order
+
+    if request.operation == "delete":
+        done = "deleted"
+    elif request.operation == "set_notes":
+        values, done = {"notes": request.notes}, "updated"
+    elif request.operation == "archive":
+        values, done = {"archived_at": datetime.utcnow()}, "archived"
+    else:
+        values, done = {"archived_at": None}, "unarchived"
 
-    # Find the feed item
-    item = db.query(FeedItem).filter(FeedItem.id == item_id).first()
+    def statement_for(item_ids):
+        target = (FeedItem.id.in_(item_ids), owned_by(current_user))
+        if request.operation == "delete":
+            statement = delete(FeedItem).where(*target)
+        else:
+            statement = update(FeedItem).where(*target).values(**values)
+        return statement.returning(FeedItem.id, FeedItem.sender_email).execution_options(synchronize_session=False)
 
-    if not item:
-        raise HTTPException(status_code=404, detail="Feed item not found")
+    def apply(session: Session):
+        returned = session.execute(statement_for(ids)).all()
 
-    # Check if user owns this item
-    if item.sender_email not in linked_email_list:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this item")
+        # Only the leftovers need a lookup: they're in the cold tier, don't exist or belong to someone else
+        affected = {row[0] for row in returned}
+        missing = [item_id for item_id in ids if item_id not in affected]
+        existing = set()
+        if missing:
+            thawed = thaw_items(session, missing, current_user)
+            if thawed:
+                retried = session.execute(statement_for(list(thawed))).all()
+                returned += retried
+                affected.update(row[0] for row in retried)
+                missing = [item_id for item_id in missing if item_id not in thawed]
+        if missing:
+            existing = set(session.scalars(
+                select(FeedItem.id).where(FeedItem.id.in_(missing))
+                .union(select(FeedItemCold.id).where(FeedItemCold.id.in_(missing)))
+            ).all())
 
-    db.delete(item)
+        session.commit()
+        return returned, affected, existing
+
+    # Statements, thaw and commit in one run_sync, so the write transaction
+    # never waits on the event loop between them
+    returned, affected, existing = await db.run_sync(apply)
+    await feed_cache.ainvalidate_senders(row[1] for row in returned)
+
+    results = []
+    for item_id in ids:
+        if item_id in affected:
+            status = done
+        elif item_id in existing:
+            status = "forbidden"
+        else:
+            status = "not_found"
+        results.append({"id": item_id, "status": status})
+
+    return RenderedJSONResponse({
+        "results": results,
+        "succeeded": len(affected),
+        "failed": len(ids) - len(affected),
+    })
+
+def _not_found_or_forbidden(db: Session, item_id: int, action: str) -> HTTPException:
+    """After an ownership-constrained statement matched nothing, tell 404 from 403"""
+    exists = db.scalar(select(or_(
+        select(FeedItem.id).where(FeedItem.id == item_id).exists(),
+        select(FeedItemCold.id).where(FeedItemCold.id == item_id).exists(),
+    )))
+    if not exists:
+        return HTTPException(status_code=404, detail="Feed item not found")
+    return HTTPException(status_code=403, detail=f"Not authorized to {action} this item")
+
+def _write_item(db: Session, statement, item_id: int, current_user: User, action: str) -> Tuple:
+    """Run an ownership-constrained statement on one item and commit; returns its first row
+
+    Run with db.run_sync, so the statement, the cold-tier retry and the
+    commit are one trip to the database and the write lock is never held
+    across an await. Items in the cold tier are moved back first, then the
+    statement retried; when nothing matches, rolls back and raises 404 or 403.
+    """
+    row = db.execute(statement).first()
+    if row is None and thaw_items(db, [item_id], current_user):
+        row = db.execute(statement).first()
+    if row is None:
+        error = _not_found_or_forbidden(db, item_id, action)
+        db.rollback()
+        raise error
     db.commit()
+    return row
+
+@router.delete("/{item_id}", dependencies=[Depends(query_budget(6))])
+async def delete_feed_item(
+    item_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete a feed item"""
+    # One conditional DELETE; ownership is checked inside the statement
+    statement = (
+        delete(FeedItem)
+        .where(FeedItem.id == item_id, owned_by(current_user))
+        .returning(FeedItem.sender_email)
+        .execution_options(synchronize_session=False)
+    )
+    row = await db.run_sync(_write_item, statement, item_id, current_user, "delete")
+    await feed_cache.ainvalidate_senders([row[0]])
 
     return {"message": "Feed item deleted successfully"}
 
-@router.patch("/{item_id}", response_model=FeedItemResponse)
-def update_feed_item_notes(
+@router.patch("/{item_id}", response_model=FeedItemResponse, dependencies=[Depends(query_budget(6))])
+async def update_feed_item_notes(
     item_id: int,
     request: UpdateNotesRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update notes for a feed item"""
-    # Get all email addresses linked to this user
-    linked_emails = db.query(UserEmail.email_address).filter(
-        UserEmail.user_id == current_user.id
-    ).all()
-    linked_email_list = [email[0] for email in linked_emails]
-    linked_email_list.append(current_user.email)
-
-    # Find the feed item
-    item = db.query(FeedItem).filter(FeedItem.id == item_id).first()
-
-    if not item:
-        raise HTTPException(status_code=404, detail="Feed item not found")
-
-    # Check if user owns this item
-    if item.sender_email not in linked_email_list:
-        raise HTTPException(status_code=403, detail="Not authorized to update this item")
-
-    item.notes = request.notes
-    db.commit()
-    db.refresh(item)
-
-    return FeedItemResponse(
-        id=item.id,
-        sender_email=item.sender_email,
-        core_link=item.core_link,
-        received_date=item.received_date,
-        processed_date=item.processed_date,
-        notes=item.notes,
-        preview=None
+    # One conditional UPDATE ... RETURNING; no load, no refresh
+    statement = (
+        update(FeedItem)
+        .where(FeedItem.id == item_id, owned_by(current_user))
+        .values(notes=request.notes)
+        .returning(*FEED_ITEM_COLUMNS)
+        .execution_options(synchronize_session=False)
     )
+    row = await db.run_sync(_write_item, statement, item_id, current_user, "update")
+    await feed_cache.ainvalidate_senders([row[1]])
 
+    return RenderedJSONResponse(feed_item_dict(row))
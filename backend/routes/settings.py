@@ -13,37 +13,40 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Use direct imports (Railway runs from /backend directory)
-from utils.database import get_db
+from utils.database import get_db, get_read_db
 from models import User, UserEmail, FeedItem
 from schemas import UserEmailResponse, AddEmailRequest
-from routes.auth import get_current_user
+from routes.auth import get_current_user, get_current_user_for_read
+from utils.feed_cache import feed_cache
+from utils.query_stats import query_budget
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
-@router.get("/emails", response_model=list[UserEmailResponse])
-def get_linked_emails(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+@router.get("/emails", response_model=list[UserEmailResponse], dependencies=[Depends(query_budget(2))])
+async def get_linked_emails(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_for_read)
 ):
     """Get all email addresses linked to user"""
-    emails = db.query(UserEmail).filter(UserEmail.user_id == current_user.id).all()
+    emails = (await db.scalars(select(UserEmail).where(UserEmail.user_id == current_user.id))).all()
     return emails
 
-@router.post("/emails", response_model=UserEmailResponse, status_code=status.HTTP_201_CREATED)
-def add_linked_email(
+@router.post("/emails", response_model=UserEmailResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(query_budget(5))])
+async def add_linked_email(
     email_data: AddEmailRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Add an email address to user's linked emails"""
     # Check if already linked
-    existing = db.query(UserEmail).filter(
+    existing = (await db.scalars(select(UserEmail).where(
         UserEmail.user_id == current_user.id,
         UserEmail.email_address == email_data.email_address
-    ).first()
+    ))).first()
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -56,29 +59,32 @@ def add_linked_email(
         verified=False  # Could add email verification later
     )
     db.add(new_email)
-    db.commit()
-    db.refresh(new_email)
+    await db.commit()
+    await db.refresh(new_email)
     
     # Auto-link existing feed items from this email
-    db.query(FeedItem).filter(
-        FeedItem.sender_email == email_data.email_address,
-        FeedItem.user_id.is_(None)
-    ).update({"user_id": current_user.id})
-    db.commit()
+    await db.execute(
+        update(FeedItem)
+        .where(FeedItem.sender_email == email_data.email_address, FeedItem.user_id.is_(None))
+        .values(user_id=current_user.id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    await feed_cache.ainvalidate_user(current_user.id)
     
     return new_email
 
-@router.delete("/emails/{email_id}", status_code=status.HTTP_204_NO_CONTENT)
-def remove_linked_email(
+@router.delete("/emails/{email_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(query_budget(3))])
+async def remove_linked_email(
     email_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Remove a linked email address"""
-    email = db.query(UserEmail).filter(
+    email = (await db.scalars(select(UserEmail).where(
         UserEmail.id == email_id,
         UserEmail.user_id == current_user.id
-    ).first()
+    ))).first()
     
     if not email:
         raise HTTPException(
@@ -86,7 +92,8 @@ def remove_linked_email(
             detail="Email not found"
         )
     
-    db.delete(email)
-    db.commit()
+    await db.delete(email)
+    await db.commit()
+    await feed_cache.ainvalidate_user(current_user.id)
     return None
 
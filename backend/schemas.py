@@ -1,6 +1,6 @@
 """Pydantic schemas for request/response validation"""
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Dict
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Dict, Literal
 from datetime import datetime
 
 # Auth schemas
@@ -63,6 +63,33 @@ class FeedResponse(BaseModel):
     limit: int
     has_more: bool
 
+class FeedSearchResponse(BaseModel):
+    items: List[FeedItemResponse]
+    next_cursor: Optional[str] = None
+
+class FeedTombstone(BaseModel):
+    id: int
+    deleted_at: datetime
+
+class FeedChangedItem(FeedItemResponse):
+    # Set when the item was archived; the default feed view drops it then
+    archived_at: Optional[datetime] = None
+
+class FeedChangesResponse(BaseModel):
+    items: List[FeedChangedItem]  # Inserted, updated, archived or unarchived since the token
+    deleted: List[FeedTombstone]
+    next_token: str
+    has_more: bool
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class FeedFacetsResponse(BaseModel):
+    senders: List[FacetCount]
+    domains: List[FacetCount]
+    months: List[FacetCount]  # YYYY-MM, newest first
+
 # Settings schemas
 class UserEmailResponse(BaseModel):
     id: int
@@ -79,6 +106,20 @@ class AddEmailRequest(BaseModel):
 class UpdateNotesRequest(BaseModel):
     notes: str
 
+class BulkFeedRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+    operation: Literal["delete", "set_notes", "archive", "unarchive"]
+    notes: Optional[str] = None  # Required for set_notes
+
+class BulkFeedItemResult(BaseModel):
+    id: int
+    status: str  # deleted, updated, archived, unarchived, not_found or forbidden
+
+class BulkFeedResponse(BaseModel):
+    results: List[BulkFeedItemResult]
+    succeeded: int
+    failed: int
+
 # Account management schemas
 class UpdateProfileRequest(BaseModel):
     username: Optional[str] = None
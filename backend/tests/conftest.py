@@ -0,0 +1,66 @@
+"""Shared test setup: a scratch database, backend/ on sys.path, a seeded API client
+
+DATABASE_URL has to be set before config and utils.database are imported,
+so it happens at module level here rather than in a fixture. It defaults to
+a throwaway SQLite file; point DATABASE_URL at an EMPTY scratch PostgreSQL
+database to run the same tests there.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+backend_dir = Path(__file__).parent.parent.resolve()
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+_db_dir = tempfile.mkdtemp(prefix="feed-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/feed.db")
+
+SEED_ITEMS = 200
+
+@pytest.fixture(scope="session")
+def seeded():
+    """One user with an alias address, items from both, and a stranger's item
+
+    Returns {"ids": the user's item ids, "stranger_id": the stranger's}.
+    """
+    from app import app  # noqa: F401  Creates the tables, search index and triggers
+    from models import FeedItem, User, UserEmail
+    from utils.auth import get_password_hash
+    from utils.database import SessionLocal
+
+    db = SessionLocal()
+    user = User(username="seeded", email="seeded@example.com",
+                password_hash=get_password_hash("seeded"), email_verified=True)
+    db.add(user)
+    db.flush()
+    db.add(UserEmail(user_id=user.id, email_address="alias@example.com", verified=True))
+    start = datetime(2020, 1, 1)
+    items = [
+        FeedItem(sender_email="seeded@example.com" if i % 2 else "alias@example.com",
+                 core_link=f"https://site{i % 7}.example/{i}", received_date=start + timedelta(hours=i),
+                 processed_date=start, notes=f"note {i}" if i % 3 == 0 else None)
+        for i in range(SEED_ITEMS)
+    ]
+    stranger = FeedItem(sender_email="stranger@example.com", core_link="https://elsewhere.example/",
+                        received_date=start, processed_date=start)
+    db.add_all(items + [stranger])
+    db.commit()
+    seeded = {"ids": sorted(item.id for item in items), "stranger_id": stranger.id}
+    db.close()
+    return seeded
+
+@pytest.fixture
+def client(seeded):
+    """TestClient logged in as the seeded user"""
+    from fastapi.testclient import TestClient
+    from app import app
+
+    client = TestClient(app)
+    response = client.post("/api/auth/login", json={"email": "seeded@example.com", "password": "seeded"})
+    assert response.status_code == 200, response.text
+    return client
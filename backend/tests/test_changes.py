@@ -0,0 +1,118 @@
+"""Delta sync tokens and change pages (utils/changes.py) on SQLite"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, insert, text, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from models import Base, FeedChange, FeedItem
+from utils.cold_tier import freeze_old_items
+from utils.feed_items import feed_change_dict
+from utils.changes import (
+    SyncPosition, _decode_token, _encode_token, current_token, ensure_change_log, get_changes, postgres_triggers
+)
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/changes.db")
+    Base.metadata.create_all(engine)
+    ensure_change_log(engine)
+    with Session(engine) as session:
+        yield session
+
+def add_item(db, link, sender="a@example.com"):
+    db.execute(insert(FeedItem).values(
+        sender_email=sender, core_link=link, received_date=datetime(2024, 1, 1), processed_date=datetime(2024, 1, 1)
+    ))
+    db.commit()
+
+def test_token_round_trip_and_legacy_tokens():
+    for position in (SyncPosition(12), SyncPosition(12, 345), SyncPosition(12, 345, 350, (345, 348), 7),
+                     SyncPosition(12, 345, 350)):
+        assert _decode_token(_encode_token(position)) == position
+    assert _encode_token(SyncPosition(12)).count('-') == 2  # SQLite tokens stay short
+    legacy = f"12-{_encode_token(SyncPosition(0)).split('-')[-1]}"
+    assert _decode_token(legacy) == SyncPosition(12)
+    with pytest.raises(ValueError):
+        _decode_token("12-x")
+
+def test_pages_collapse_and_advance(db):
+    token = current_token(db)
+    for n in range(3):
+        add_item(db, f"https://example.com/{n}")
+    add_item(db, "https://example.com/other", sender="b@example.com")
+    db.execute(update(FeedItem).where(FeedItem.core_link == "https://example.com/0").values(notes="hi"))
+    db.commit()
+
+    rows, tombstones, token, has_more = get_changes(db, token, ["a@example.com"], limit=2)
+    assert [row[2] for row in rows] == ["https://example.com/0", "https://example.com/1"]
+    assert has_more and not tombstones
+
+    rows, tombstones, token, has_more = get_changes(db, token, ["a@example.com"], limit=10)
+    # The notes edit lands on this page as the latest state of item 0
+    assert sorted(row[2] for row in rows) == ["https://example.com/0", "https://example.com/2"]
+    assert not has_more
+
+    rows, tombstones, token, has_more = get_changes(db, token, ["a@example.com"], limit=10)
+    assert (rows, tombstones, has_more) == ([], [], False)
+
+def test_changes_uncommitted_at_the_token_are_resent(db):
+    # As on PostgreSQL: seq 1 was still uncommitted (txid 100, at or after the
+    # token's xmin) when a reader saw seq 2 and got a token past it
+    add_item(db, "https://example.com/late")
+    add_item(db, "https://example.com/early")
+    db.execute(update(FeedChange).where(FeedChange.seq == 1).values(txid=100))
+    db.execute(update(FeedChange).where(FeedChange.seq == 2).values(txid=99))
+    db.commit()
+
+    rows, _, _, _ = get_changes(db, _encode_token(SyncPosition(2, 100)), ["a@example.com"], limit=10)
+    assert [row[2] for row in rows] == ["https://example.com/late"]
+
+def test_only_changes_of_transactions_running_at_the_token_are_resent(db):
+    # txid 100 was running when the token was issued, 101 had committed and
+    # 99 is older than the snapshot: only 100's change is late
+    for n, txid in enumerate((100, 101, 99), start=1):
+        add_item(db, f"https://example.com/{txid}")
+        db.execute(update(FeedChange).where(FeedChange.seq == n).values(txid=txid))
+    db.commit()
+
+    rows, _, _, _ = get_changes(db, _encode_token(SyncPosition(3, 100, 102, (100,))), ["a@example.com"], limit=10)
+    assert [row[2] for row in rows] == ["https://example.com/100"]
+
+def test_late_changes_are_paged(db):
+    for n in range(1, 6):
+        add_item(db, f"https://example.com/{n}")
+    db.execute(update(FeedChange).values(txid=100))
+    db.commit()
+    token = _encode_token(SyncPosition(3, 100, 101, (100,)))
+
+    rows, _, token, has_more = get_changes(db, token, ["a@example.com"], limit=2)
+    assert [row[2] for row in rows] == ["https://example.com/1", "https://example.com/2"] and has_more
+    # The rest of the late changes, then the ones after the token's seq
+    rows, _, token, has_more = get_changes(db, token, ["a@example.com"], limit=2)
+    assert [row[2] for row in rows] == ["https://example.com/3", "https://example.com/4"] and has_more
+    rows, _, token, has_more = get_changes(db, token, ["a@example.com"], limit=2)
+    assert [row[2] for row in rows] == ["https://example.com/5"] and not has_more
+
+def test_pg_triggers_have_no_bind_params():
+    for statement in postgres_triggers(postgresql.dialect()):
+        assert text(statement).compile(dialect=postgresql.dialect()).params == {}
+        assert "{" not in statement
+
+def test_archiving_comes_through_with_archived_at(db):
+    add_item(db, "https://example.com/0")
+    token = current_token(db)
+    db.execute(update(FeedItem).values(archived_at=datetime(2024, 2, 1)))
+    db.commit()
+
+    rows, _, _, _ = get_changes(db, token, ["a@example.com"], limit=10)
+    assert feed_change_dict(rows[0])["archived_at"] == datetime(2024, 2, 1)
+
+def test_changed_items_since_moved_to_the_cold_tier(db):
+    token = current_token(db)
+    add_item(db, "https://example.com/old")
+    freeze_old_items(db.get_bind(), older_than_days=1)
+
+    rows, tombstones, _, _ = get_changes(db, token, ["a@example.com"], limit=10)
+    assert [row[2] for row in rows] == ["https://example.com/old"] and not tombstones
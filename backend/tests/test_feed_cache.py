@@ -0,0 +1,44 @@
+"""Version bookkeeping of the in-process feed cache backend"""
+import asyncio
+
+from utils.feed_cache import FeedPageCache, InMemoryBackend
+
+def test_versions_are_bounded():
+    backend = InMemoryBackend(max_entries=2, max_versions=3)
+    backend.bump(f"sender:{n}" for n in range(10))
+    assert len(backend._versions) == 3
+
+def test_an_evicted_key_never_comes_back_at_a_cached_version():
+    backend = InMemoryBackend(max_entries=2, max_versions=1)
+    backend.bump(["sender:a"])
+    cached = backend.versions(["sender:a"])
+
+    backend.bump(["sender:b"])  # Evicts sender:a
+    backend.bump(["sender:a"])  # Changes again after coming back
+    assert backend.versions(["sender:a"]) != cached
+
+    backend.bump(["sender:b"])  # Evicts sender:a without a change
+    assert backend.versions(["sender:a"]) >= cached
+
+def test_async_methods_round_trip():
+    cache = FeedPageCache(InMemoryBackend(max_entries=4), ttl=60)
+
+    async def scenario():
+        snapshot = await cache.asnapshot(1, ["a@example.com"])
+        await cache.aset(1, (20, None, False), snapshot, b'{"items": []}')
+        hit = await cache.aget(1, (20, None, False))
+        await cache.ainvalidate_senders(["a@example.com"])
+        return hit, await cache.aget(1, (20, None, False))
+
+    assert asyncio.run(scenario()) == (b'{"items": []}', None)
+
+def test_write_marks_expire():
+    cache = FeedPageCache(InMemoryBackend(max_entries=4), ttl=60)
+
+    async def scenario():
+        await cache.amark_write(7, 0)
+        expired = await cache.awrote_recently(7)
+        await cache.amark_write(7, 60)
+        return expired, await cache.awrote_recently(7), await cache.awrote_recently(8)
+
+    assert asyncio.run(scenario()) == (False, True, False)
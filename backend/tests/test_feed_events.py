@@ -0,0 +1,24 @@
+"""The SSE broker's fetch catches inserts that commit after higher ids"""
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models import Base, FeedItem
+from utils.database import engine
+from utils.feed_events import fetch_unseen_items
+
+def test_fetch_unseen_items_skips_published_ids_only():
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        ids = conn.execute(insert(FeedItem).returning(FeedItem.id), [
+            {"sender_email": "events@example.com", "core_link": f"https://example.com/events/{n}",
+             "received_date": datetime(2024, 1, 1), "processed_date": datetime(2024, 1, 1)}
+            for n in range(4)
+        ]).scalars().all()
+    ids.sort()
+
+    # The first and third were published; the second committed late, the fourth is new
+    published = {ids[0], ids[2]}
+    rows = fetch_unseen_items(ids[0] - 1, published)
+    assert [row[0] for row in rows] == [ids[1], ids[3]]
+    assert [row[0] for row in fetch_unseen_items(ids[0] - 1, published, limit=1)] == [ids[1]]
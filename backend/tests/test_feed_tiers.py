@@ -0,0 +1,31 @@
+"""Feed pages merge the hot and cold tiers by date, whichever tier is newer"""
+from datetime import datetime
+
+from models import FeedItem, FeedItemCold, User, UserEmail
+from utils.cold_tier import _compress
+from utils.database import SessionLocal
+
+def test_cold_items_newer_than_hot_ones_sort_between_them(client):
+    db = SessionLocal()
+    user = db.query(User).filter(User.email == "seeded@example.com").one()
+    db.add(UserEmail(user_id=user.id, email_address="tiers@example.com", verified=True))
+    for n, day in enumerate((1, 3, 3)):
+        db.add(FeedItem(sender_email="tiers@example.com", core_link=f"https://hot.example/{n}",
+                        received_date=datetime(2030, 1, day), processed_date=datetime(2030, 1, day)))
+    # As if frozen earlier, then older mail was backfilled into the hot table
+    db.add(FeedItemCold(id=10 ** 6, sender_email="tiers@example.com", received_date=datetime(2030, 1, 2),
+                        moved_at=datetime(2030, 1, 4),
+                        payload=_compress({"core_link": "https://cold.example/2", "processed_date": None})))
+    db.commit()
+    db.close()
+
+    feed = client.get("/api/feed", params={"email": "tiers@example.com"}).json()
+    assert feed["total"] == 4
+    dates = [item["received_date"][:10] for item in feed["items"]]
+    assert dates == ["2030-01-03", "2030-01-03", "2030-01-02", "2030-01-01"]
+    assert feed["items"][2]["core_link"] == "https://cold.example/2"
+    # Same-date items come newest id first
+    assert feed["items"][0]["id"] > feed["items"][1]["id"]
+
+    second = client.get("/api/feed", params={"email": "tiers@example.com", "limit": 2, "page": 2}).json()
+    assert [item["received_date"][:10] for item in second["items"]] == ["2030-01-02", "2030-01-01"]
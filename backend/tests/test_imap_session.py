@@ -0,0 +1,25 @@
+"""Prometheus export of the IMAP session counters"""
+import imaplib
+
+from utils.imap_session import ImapSession, prometheus_metrics, write_metrics_file
+
+def failing_connect():
+    raise imaplib.IMAP4.abort("connection refused")
+
+def test_counters_are_labeled_by_mailbox(tmp_path):
+    down = ImapSession(failing_connect, backoff_base=0, backoff_max=0)
+    down._open()
+    down._open()
+    sessions = {'down': down, 'say "hi"': ImapSession(failing_connect)}
+
+    text = prometheus_metrics(sessions)
+    assert '# TYPE imap_session_failures_total counter' in text
+    assert 'imap_session_failures_total{mailbox="down"} 2' in text
+    assert 'imap_session_consecutive_failures{mailbox="down"} 2' in text
+    assert 'imap_session_connected{mailbox="down"} 0' in text
+    assert 'imap_session_failures_total{mailbox="say \\"hi\\""} 0' in text
+
+    path = tmp_path / "imap.prom"
+    write_metrics_file(str(path), sessions)
+    assert path.read_text() == text
+    assert [p.name for p in tmp_path.iterdir()] == ["imap.prom"]
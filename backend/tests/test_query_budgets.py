@@ -0,0 +1,66 @@
+"""Every route that declares Depends(query_budget(n)) stays within n statements
+
+Runs with strict budgets, so a route that tries to go over is refused with
+a 500 instead of just logging.
+"""
+import re
+
+import pytest
+
+from config import settings
+
+@pytest.fixture(autouse=True)
+def strict_budgets(monkeypatch):
+    monkeypatch.setattr(settings, "query_budget_strict", True)
+
+def query_count(response) -> int:
+    return int(re.search(r'desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+def assert_within_budget(response, expected_status: int = 200):
+    assert response.status_code == expected_status, response.text
+    assert "Query budget" not in response.text
+
+def test_feed_page(client):
+    assert_within_budget(client.get("/api/feed", params={"page": 2}))
+
+def test_feed_first_page_miss_then_hit(client):
+    assert_within_budget(client.get("/api/feed", params={"limit": 7}))
+    hit = client.get("/api/feed", params={"limit": 7})
+    assert_within_budget(hit)
+    assert query_count(hit) <= 1  # Just the session user
+
+def test_search(client):
+    assert_within_budget(client.get("/api/feed/search", params={"q": "note"}))
+
+def test_changes(client):
+    token = client.get("/api/feed/changes").json()["next_token"]
+    client.patch(f"/api/feed/{client.get('/api/feed').json()['items'][0]['id']}", json={"notes": "changed"})
+    assert_within_budget(client.get("/api/feed/changes", params={"since": token}))
+
+def test_facets(client):
+    assert_within_budget(client.get("/api/feed/facets"))
+
+def test_update_notes(client, seeded):
+    assert_within_budget(client.patch(f"/api/feed/{seeded['ids'][0]}", json={"notes": "budget"}))
+
+def test_update_notes_forbidden(client, seeded):
+    assert_within_budget(client.patch(f"/api/feed/{seeded['stranger_id']}", json={"notes": "budget"}), 403)
+
+def test_delete(client, seeded):
+    assert_within_budget(client.delete(f"/api/feed/{seeded['ids'][1]}"))
+
+def test_bulk_archive(client, seeded):
+    ids = seeded["ids"][2:50] + [seeded["stranger_id"], 10 ** 9]
+    assert_within_budget(client.post("/api/feed/bulk", json={"ids": ids, "operation": "archive"}))
+
+def test_export(client):
+    assert_within_budget(client.get("/api/feed/export"))
+
+def test_linked_emails(client):
+    assert_within_budget(client.get("/api/settings/emails"))
+
+def test_add_linked_email(client):
+    assert_within_budget(client.post("/api/settings/emails", json={"email_address": "budget@example.com"}), 201)
+
+def test_me(client):
+    assert_within_budget(client.get("/api/auth/me"))
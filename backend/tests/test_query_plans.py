@@ -0,0 +1,102 @@
+"""The statements the feed routes actually run all use an index
+
+Each route is called through the TestClient with statement capture turned
+on in the query instrumentation (utils/query_stats.py), and every captured
+statement is EXPLAINed with its real parameters. On SQLite a plain
+"SCAN <table>" is a full scan; on PostgreSQL seq scans are disabled for the
+check, so a Seq Scan in the plan means no usable index exists.
+"""
+import asyncio
+import json
+import sys
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from utils.database import DATABASE_URL, to_async_url
+
+# Tables whose full scans count as a regression
+WATCHED_TABLES = {"feed_items", "feed_items_cold", "feed_changes", "feed_facets", "user_emails"}
+
+@pytest.fixture
+def captured(monkeypatch):
+    """Every QueryStats the app starts while the test runs, with statements kept"""
+    app_module = sys.modules["app"]
+    original = app_module.start_request
+    started = []
+
+    def start_request():
+        stats = original(keep_statements=True)
+        started.append(stats)
+        return stats
+
+    monkeypatch.setattr(app_module, "start_request", start_request)
+    return started
+
+def full_scans(statements):
+    """(statement, plan detail) for each statement that full-scans a watched table"""
+    async def explain_all():
+        engine = create_async_engine(to_async_url(DATABASE_URL), poolclass=NullPool)
+        found = []
+        async with engine.connect() as conn:
+            is_sqlite = engine.dialect.name == "sqlite"
+            if not is_sqlite:
+                await conn.exec_driver_sql("SET enable_seqscan = off")
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+                    continue
+                params = tuple(parameters or ())
+                if is_sqlite:
+                    plan = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params)).all()
+                    for row in plan:
+                        words = row[-1].split()
+                        # "SCAN t" is a full scan; "SCAN t USING [COVERING] INDEX" walks an index
+                        if len(words) >= 2 and words[0] == "SCAN" and words[1] in WATCHED_TABLES \
+                                and "INDEX" not in row[-1]:
+                            found.append((statement, row[-1]))
+                else:
+                    plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", params)).scalar()
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    nodes = [plan[0]["Plan"]]
+                    while nodes:
+                        node = nodes.pop()
+                        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in WATCHED_TABLES:
+                            found.append((statement, f"Seq Scan on {node['Relation Name']}"))
+                        nodes.extend(node.get("Plans", []))
+            await conn.rollback()
+        await engine.dispose()
+        return found
+
+    return asyncio.run(explain_all())
+
+def route_calls(seeded, token):
+    ids = seeded["ids"]
+    return [
+        ("GET", "/api/feed", {"params": {"page": 2}}),
+        ("GET", "/api/feed", {"params": {"email": "alias@example.com", "limit": 5}}),
+        ("GET", "/api/feed", {"params": {"archived": True}}),
+        ("GET", "/api/feed/search", {"params": {"q": "note"}}),
+        ("GET", "/api/feed/changes", {"params": {"since": token}}),
+        ("GET", "/api/feed/facets", {}),
+        ("PATCH", f"/api/feed/{ids[-1]}", {"json": {"notes": "plans"}}),
+        ("PATCH", f"/api/feed/{seeded['stranger_id']}", {"json": {"notes": "plans"}}),
+        ("POST", "/api/feed/bulk", {"json": {"ids": ids[-10:-2] + [10 ** 9], "operation": "unarchive"}}),
+        ("DELETE", f"/api/feed/{ids[-2]}", {}),
+        ("GET", "/api/feed/export", {}),
+        ("GET", "/api/settings/emails", {}),
+    ]
+
+def test_route_statements_use_indexes(client, seeded, captured):
+    token = client.get("/api/feed/changes").json()["next_token"]
+    for method, path, kwargs in route_calls(seeded, token):
+        assert client.request(method, path, **kwargs).status_code < 500
+
+    statements = [pair for stats in captured for pair in stats.executed]
+    assert any("FROM feed_items" in statement for statement, _ in statements)
+    assert full_scans(statements) == []
+
+def test_full_scans_are_caught(seeded):
+    placeholder = "?" if DATABASE_URL.startswith("sqlite") else "$1"
+    assert full_scans([(f"SELECT id FROM feed_items WHERE notes = {placeholder}", ("x",))])
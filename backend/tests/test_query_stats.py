@@ -0,0 +1,44 @@
+"""Per-request statement accounting (utils/query_stats.py) on a scratch engine"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from config import settings
+from utils.query_stats import QueryBudgetExceeded, install_query_instrumentation, start_request
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/stats.db")
+    install_query_instrumentation(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+    return engine
+
+def test_strict_budget_refuses_the_statement_before_commit(engine, monkeypatch):
+    monkeypatch.setattr(settings, "query_budget_strict", True)
+    stats = start_request()
+    stats.budget = 1
+    with pytest.raises(QueryBudgetExceeded):
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO t VALUES (1)"))
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+    start_request()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 0
+
+def test_strict_budget_only_logs_after_commit(engine, monkeypatch):
+    monkeypatch.setattr(settings, "query_budget_strict", True)
+    stats = start_request()
+    stats.budget = 1
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 1
+    assert stats.count == 2
+
+def test_failed_statements_dont_leak_start_times(engine):
+    start_request()
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing"))
+        assert not conn.info.get("query_started")
@@ -0,0 +1,28 @@
+"""The worker's batch insert on SQLite reports only the senders it actually added rows for"""
+import sqlite3
+
+import worker
+
+def test_only_senders_with_new_rows_are_invalidated(monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(worker, "USE_POSTGRES", False)
+    monkeypatch.setattr(worker.feed_cache, "invalidate_senders", invalidated.extend)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE feed_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, sender_email TEXT NOT NULL, core_link TEXT NOT NULL,
+            received_date TEXT NOT NULL, processed_date TEXT NOT NULL,
+            UNIQUE(sender_email, core_link, received_date)
+        )
+    """)
+    old = ("old@example.com", "https://example.com/old", "2026-01-01T00:00:00")
+    assert worker.save_items(conn, [old]) == (1, 0)
+    invalidated.clear()
+
+    new = ("new@example.com", "https://example.com/new", "2026-01-02T00:00:00")
+    assert worker.save_items(conn, [old, new, new]) == (1, 2)
+    assert invalidated == ["new@example.com"]
+
+    invalidated.clear()
+    assert worker.save_items(conn, [old, new]) == (0, 2)
+    assert invalidated == []
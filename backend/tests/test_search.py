@@ -0,0 +1,82 @@
+"""Search leaves archived items out like the feed does, and covers the cold tier"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from models import FeedItem, FeedItemCold, User, UserEmail
+from utils.cold_tier import _compress, thaw_items
+from utils.database import SessionLocal, engine
+from utils.search import FTS_TABLE, ensure_search_index
+
+def add_item(db, link, archived=False):
+    item = FeedItem(sender_email="search@example.com", core_link=link, received_date=datetime(2021, 5, 1),
+                    processed_date=datetime(2021, 5, 1), archived_at=datetime(2021, 6, 1) if archived else None)
+    db.add(item)
+    db.flush()
+    return item.id
+
+def freeze(db, item_id):
+    """What freeze_old_items does to one row: cold copy first, then the hot delete"""
+    item = db.get(FeedItem, item_id)
+    db.add(FeedItemCold(id=item.id, sender_email=item.sender_email, received_date=item.received_date,
+                        moved_at=datetime.utcnow(), payload=_compress({
+                            "core_link": item.core_link, "processed_date": item.processed_date,
+                            "notes": item.notes})))
+    db.flush()
+    db.delete(item)
+    db.flush()
+
+def search(client, q, **params):
+    response = client.get("/api/feed/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return sorted(item["core_link"] for item in response.json()["items"])
+
+@pytest.fixture
+def items(client):
+    db = SessionLocal()
+    user = db.query(User).filter(User.email == "seeded@example.com").one()
+    if not db.query(UserEmail).filter(UserEmail.email_address == "search@example.com").first():
+        db.add(UserEmail(user_id=user.id, email_address="search@example.com", verified=True))
+    ids = {
+        "hot": add_item(db, "https://zebrafish.example/hot"),
+        "archived": add_item(db, "https://zebrafish.example/archived", archived=True),
+        "cold": add_item(db, "https://zebrafish.example/cold"),
+    }
+    freeze(db, ids["cold"])
+    db.commit()
+    yield db, user, ids
+    db.execute(text("DELETE FROM feed_items WHERE sender_email = 'search@example.com'"))
+    db.execute(text("DELETE FROM feed_items_cold WHERE sender_email = 'search@example.com'"))
+    db.commit()
+    db.close()
+
+def test_archived_items_only_when_asked_for(client, items):
+    assert search(client, "zebrafish") == ["https://zebrafish.example/cold", "https://zebrafish.example/hot"]
+    assert search(client, "zebrafish", archived=True) == ["https://zebrafish.example/archived"]
+
+def test_thawed_and_deleted_cold_items(client, items):
+    db, user, ids = items
+    thaw_items(db, [ids["cold"]], user)
+    db.commit()
+    assert db.get(FeedItem, ids["cold"]) is not None
+    assert search(client, "zebrafish") == ["https://zebrafish.example/cold", "https://zebrafish.example/hot"]
+
+    freeze(db, ids["cold"])
+    db.execute(text("DELETE FROM feed_items_cold WHERE id = :id"), {"id": ids["cold"]})
+    db.commit()
+    assert search(client, "zebrafish") == ["https://zebrafish.example/hot"]
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="FTS5 triggers are SQLite's")
+def test_items_frozen_under_the_old_triggers_are_indexed_on_startup(client, items):
+    db, _, ids = items
+    # As the index was before cold items stayed in it
+    db.execute(text(f"DROP TRIGGER {FTS_TABLE}_ad"))
+    db.execute(text(f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON feed_items BEGIN "
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id; END"))
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": ids["cold"]})
+    db.commit()
+    assert search(client, "zebrafish") == ["https://zebrafish.example/hot"]
+
+    ensure_search_index(engine)
+    assert search(client, "zebrafish") == ["https://zebrafish.example/cold", "https://zebrafish.example/hot"]
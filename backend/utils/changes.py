@@ -0,0 +1,280 @@
+"""Change log for delta sync (GET /api/feed/changes)
+
+Every insert, update and delete on feed_items appends a row to feed_changes
+through a database trigger, so worker inserts, notes edits, bulk operations
+and deletes are all captured without touching each write path. Deletes are
+kept as tombstones (except a move to the cold tier, see utils/cold_tier.py);
+everything older than settings.change_retention_days is pruned, after
+which older sync tokens are rejected and clients must reload.
+
+Sync tokens are "<seq>-<xmin>-<issued unix time>", plus
+"-<xmax>-<late seq>-<running txids>" on PostgreSQL. A token issued inside
+the retention window can't point past pruned records, since every change
+after its seq happened after it was issued.
+
+seq is handed out when a change is written, not when it commits, so on
+PostgreSQL a reader can see seq 11 while seq 10 is still uncommitted; a
+plain "seq > last seen" would skip 10 for good. Each change records the
+transaction that wrote it (txid), and the token also carries the snapshot
+its read was taken under: the transactions still running then (xip) and
+the first one not yet started (xmax). The next read takes everything after
+the token's seq, plus what those transactions wrote at or below it ("late"
+changes): everything else at or below it was visible to the earlier read.
+Late changes are paged like the rest, with the late seq as their cursor. A
+snapshot with more than MAX_TOKEN_XIP running transactions only keeps its
+xmin, and then everything at or after it counts as late, re-sending
+changes that were already delivered (harmless: an upsert or tombstone
+applied twice leaves the same state) but never skipping one. SQLite has a
+single writer, so there seq order is commit order and xmin is always 0.
+
+pg_current_xact_id() and pg_current_snapshot() are PostgreSQL 13+; older
+servers get txid_current() and txid_current_snapshot(), which return the
+same numbers.
+"""
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import delete, func, inspect, literal_column, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import FeedChange, FeedItem, FeedItemCold
+from utils.cold_tier import cold_feed_row
+from utils.feed_items import FEED_ITEM_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Running transactions a token lists; past this it keeps only the snapshot's xmin
+MAX_TOKEN_XIP = 50
+
+class SyncTokenExpired(Exception):
+    """The token points at changes that have already been pruned"""
+
+class SyncPosition(NamedTuple):
+    """What a sync token stands for"""
+    seq: int  # Changes after this seq are next
+    xmin: int = 0  # Oldest transaction running at the read; 0: no late changes (SQLite)
+    xmax: int = 0  # First transaction not yet started; 0: only xmin is known
+    xip: Tuple[int, ...] = ()  # Transactions running at the read
+    late_seq: int = 0  # Late changes up to this seq have been sent
+
+SQLITE_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS feed_changes_ai AFTER INSERT ON feed_items BEGIN
+        INSERT INTO feed_changes(item_id, sender_email, op, changed_at)
+        VALUES (NEW.id, NEW.sender_email, 'upsert', CURRENT_TIMESTAMP);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS feed_changes_au AFTER UPDATE ON feed_items BEGIN
+        INSERT INTO feed_changes(item_id, sender_email, op, changed_at)
+        VALUES (NEW.id, NEW.sender_email, 'upsert', CURRENT_TIMESTAMP);
+    END
+    ''',
+    'DROP TRIGGER IF EXISTS feed_changes_ad',
+    '''
+    CREATE TRIGGER feed_changes_ad AFTER DELETE ON feed_items
+    WHEN NOT EXISTS (SELECT 1 FROM feed_items_cold WHERE id = OLD.id) BEGIN
+        INSERT INTO feed_changes(item_id, sender_email, op, changed_at)
+        VALUES (OLD.id, OLD.sender_email, 'delete', CURRENT_TIMESTAMP);
+    END
+    ''',
+]
+
+POSTGRES_TRIGGERS = [
+    '''
+    CREATE OR REPLACE FUNCTION record_feed_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            IF EXISTS (SELECT 1 FROM feed_items_cold WHERE id = OLD.id) THEN
+                RETURN OLD;  -- Moved to the cold tier, still in the feed
+            END IF;
+            INSERT INTO feed_changes(item_id, sender_email, op, changed_at, txid)
+            VALUES (OLD.id, OLD.sender_email, 'delete', now() at time zone 'utc', {current_txid});
+            RETURN OLD;
+        END IF;
+        INSERT INTO feed_changes(item_id, sender_email, op, changed_at, txid)
+        VALUES (NEW.id, NEW.sender_email, 'upsert', now() at time zone 'utc', {current_txid});
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    ''',
+    'ALTER TABLE feed_changes ADD COLUMN IF NOT EXISTS txid bigint',
+    'CREATE INDEX IF NOT EXISTS ix_feed_changes_txid ON feed_changes (txid)',
+    'DROP TRIGGER IF EXISTS feed_changes_trg ON feed_items',
+    '''
+    CREATE TRIGGER feed_changes_trg AFTER INSERT OR UPDATE OR DELETE ON feed_items
+    FOR EACH ROW EXECUTE PROCEDURE record_feed_change()
+    ''',
+]
+
+def _pg_txid_functions(dialect) -> Tuple[str, str]:
+    """SQL for the current transaction id (bigint) and snapshot (text) on this server"""
+    if (dialect.server_version_info or (13,)) >= (13,):
+        return ("CAST(CAST(pg_current_xact_id() AS text) AS bigint)",
+                "CAST(pg_current_snapshot() AS text)")
+    return "txid_current()", "CAST(txid_current_snapshot() AS text)"
+
+def postgres_triggers(dialect) -> List[str]:
+    current_txid, _ = _pg_txid_functions(dialect)
+    return [statement.format(current_txid=current_txid) for statement in POSTGRES_TRIGGERS]
+
+def ensure_change_log(engine: Engine):
+    """Install the feed_items triggers that populate feed_changes"""
+    if not inspect(engine).has_table('feed_items'):
+        return
+    with engine.begin() as conn:
+        statements = SQLITE_TRIGGERS if engine.dialect.name == 'sqlite' else postgres_triggers(conn.dialect)
+        for statement in statements:
+            conn.execute(text(statement))
+
+def prune_change_log(engine: Engine) -> int:
+    """Drop change records (and tombstones) older than the retention window"""
+    cutoff = datetime.utcnow() - timedelta(days=settings.change_retention_days)
+    with engine.begin() as conn:
+        result = conn.execute(delete(FeedChange).where(FeedChange.changed_at < cutoff))
+    return result.rowcount
+
+def _encode_token(position: SyncPosition) -> str:
+    token = f"{position.seq}-{position.xmin}-{int(time.time())}"
+    if position.xmax or position.late_seq:
+        token += f"-{position.xmax}-{position.late_seq}-{'.'.join(str(txid) for txid in position.xip)}"
+    return token
+
+def _decode_token(token: str) -> SyncPosition:
+    """The position a sync token stands for; raises SyncTokenExpired past the retention window"""
+    parts = token.split('-')
+    try:
+        if len(parts) == 6:
+            xip = tuple(int(txid) for txid in parts[5].split('.') if txid)
+            parts = parts[:5]
+        else:
+            xip = ()
+        parts = [int(part) for part in parts]
+    except ValueError:
+        raise ValueError("Invalid sync token")
+    if len(parts) == 2:
+        parts.insert(1, 0)  # Issued before tokens carried an xmin
+    if len(parts) not in (3, 5):
+        raise ValueError("Invalid sync token")
+    seq, xmin, issued, *rest = parts
+    if issued < time.time() - settings.change_retention_days * 86400:
+        raise SyncTokenExpired()
+    xmax, late_seq = rest or (0, 0)
+    return SyncPosition(seq, xmin, xmax, xip, late_seq)
+
+def _head(db: Session) -> SyncPosition:
+    """Latest seq and the snapshot of transactions, read in one statement"""
+    dialect = db.get_bind().dialect
+    if dialect.name == 'sqlite':
+        return SyncPosition(_head_seq(db))
+    _, current_snapshot = _pg_txid_functions(dialect)
+    seq, snapshot = db.execute(select(func.max(FeedChange.seq), literal_column(current_snapshot))).one()
+    # "xmin:xmax:xip,xip,..."
+    xmin, xmax, xip = snapshot.split(':')
+    xip = tuple(int(txid) for txid in xip.split(',') if txid)
+    if len(xip) > MAX_TOKEN_XIP:
+        return SyncPosition(seq or 0, int(xmin))
+    return SyncPosition(seq or 0, int(xmin), int(xmax), xip)
+
+def _head_seq(db: Session) -> int:
+    return db.execute(select(func.max(FeedChange.seq))).scalar() or 0
+
+def current_token(db: Session) -> str:
+    """Token for "now": a client holding it has seen every committed change so far"""
+    return _encode_token(_head(db))
+
+def get_changes(
+    db: Session,
+    since: str,
+    sender_emails: List[str],
+    limit: int
+) -> Tuple[List[Tuple], List[Dict], str, bool]:
+    """Changes after the token for these senders
+
+    Returns (upserted_rows, tombstones, next_token, has_more); upserted rows
+    are FEED_ITEM_COLUMNS plus archived_at. Several changes to the same item
+    inside the page collapse into its latest state.
+    """
+    since = _decode_token(since)
+    # Taken before reading: whatever the reads below can't see yet was
+    # written by a transaction running then or started later
+    head = _head(db)
+
+    columns = (FeedChange.seq, FeedChange.item_id, FeedChange.op, FeedChange.changed_at)
+    late = []
+    if since.xmin:
+        # Changes at or below the token's seq that were still uncommitted when it was issued
+        if since.xmax:
+            uncommitted = or_(FeedChange.txid.in_(since.xip), FeedChange.txid >= since.xmax)
+        else:
+            uncommitted = FeedChange.txid >= since.xmin
+        late = db.execute(
+            select(*columns)
+            .where(FeedChange.seq <= since.seq, FeedChange.seq > since.late_seq, uncommitted,
+                   FeedChange.sender_email.in_(sender_emails))
+            .order_by(FeedChange.seq)
+            .limit(limit + 1)
+        ).all()
+    if len(late) > limit:
+        # More late changes than a page: send those first, under the same snapshot
+        changes, has_more = late[:limit], True
+        next_position = since._replace(late_seq=late[limit - 1].seq)
+    else:
+        room = limit - len(late)
+        changes = db.execute(
+            select(*columns)
+            .where(FeedChange.seq > since.seq, FeedChange.sender_email.in_(sender_emails))
+            .order_by(FeedChange.seq)
+            .limit(room + 1)
+        ).all()
+        has_more = len(changes) > room
+        changes = changes[:room]
+        if changes:
+            next_seq = changes[-1].seq
+        else:
+            next_seq = since.seq if has_more else max(since.seq, head.seq)
+        next_position = head._replace(seq=next_seq)
+        changes = late + changes
+
+    if not changes:
+        return [], [], _encode_token(next_position), has_more
+
+    latest: Dict[int, Tuple] = {}
+    for change in changes:
+        latest[change.item_id] = change
+
+    upsert_ids = [item_id for item_id, change in latest.items() if change.op == 'upsert']
+    tombstones = [
+        {"id": item_id, "deleted_at": change.changed_at}
+        for item_id, change in latest.items() if change.op == 'delete'
+    ]
+    rows = []
+    if upsert_ids:
+        # Items deleted after this page are simply absent here; their tombstone follows
+        rows = db.execute(
+            select(*FEED_ITEM_COLUMNS, FeedItem.archived_at).where(FeedItem.id.in_(upsert_ids)).order_by(FeedItem.id)
+        ).all()
+        # Items moved to the cold tier since they changed (the move itself isn't logged)
+        frozen_ids = set(upsert_ids) - {row[0] for row in rows}
+        if frozen_ids:
+            cold_rows = db.execute(
+                select(FeedItemCold.id, FeedItemCold.sender_email, FeedItemCold.received_date,
+                       FeedItemCold.payload, FeedItemCold.archived_at)
+                .where(FeedItemCold.id.in_(frozen_ids)).order_by(FeedItemCold.id)
+            ).all()
+            rows = sorted(rows + [cold_feed_row(row) + (row[4],) for row in cold_rows], key=lambda row: row[0])
+
+    return rows, tombstones, _encode_token(next_position), has_more
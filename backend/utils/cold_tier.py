@@ -0,0 +1,137 @@
+"""Cold storage tier for old feed items
+
+Items whose received_date is older than settings.cold_tier_after_days are
+moved by the worker from feed_items into feed_items_cold, one compressed row
+each, which keeps the hot table and its indexes small. Cold items are
+usually older than every hot one, but not always (`worker.py ingest`
+backfills old mail into the hot table), so feed pages merge the two tiers
+by date. Cold items are moved back ("thawed") before they're edited or
+deleted.
+
+Moving a row between tiers is not an insert or delete as far as the change
+log and facet rollups are concerned: their triggers skip rows whose id is
+present in feed_items_cold at that moment (freeze inserts the cold row
+before deleting the hot one, thaw inserts the hot row before deleting the
+cold one).
+"""
+import json
+import logging
+import sys
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import DateTime, MetaData, Table, delete, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import FeedItemCold, User
+from utils.feed_items import owned_by
+
+logger = logging.getLogger(__name__)
+
+# Stored as real columns on feed_items_cold; everything else goes in payload
+COLD_COLUMNS = ('id', 'sender_email', 'received_date', 'archived_at', 'user_id')
+
+_hot_table: Optional[Table] = None
+
+def _feed_items_table(bind) -> Table:
+    """feed_items as it exists in this database, preview columns included (cached)"""
+    global _hot_table
+    if _hot_table is None:
+        _hot_table = Table('feed_items', MetaData(), autoload_with=bind)
+    return _hot_table
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+def _compress(values: Dict) -> bytes:
+    return zlib.compress(json.dumps(values, default=lambda v: v.isoformat()).encode('utf-8'))
+
+def _decompress(payload: bytes) -> Dict:
+    return json.loads(zlib.decompress(payload))
+
+def freeze_old_items(engine: Engine, older_than_days: int = None, batch_size: int = None) -> int:
+    """Move feed items older than the cutoff into the cold tier, in batches; returns the count moved"""
+    older_than_days = settings.cold_tier_after_days if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.cold_tier_batch_size
+    if older_than_days <= 0:
+        return 0
+
+    hot = _feed_items_table(engine)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(hot).where(hot.c.received_date < cutoff).order_by(hot.c.received_date).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            conn.execute(insert(FeedItemCold), [
+                {
+                    **{name: row.get(name) for name in COLD_COLUMNS},
+                    'received_date': _as_datetime(row['received_date']),
+                    'archived_at': _as_datetime(row.get('archived_at')),
+                    'moved_at': datetime.utcnow(),
+                    'payload': _compress({k: v for k, v in row.items() if k not in COLD_COLUMNS}),
+                }
+                for row in rows
+            ])
+            conn.execute(delete(hot).where(hot.c.id.in_([row['id'] for row in rows])))
+        moved += len(rows)
+    return moved
+
+def thaw_items(db: Session, item_ids: List[int], current_user: User) -> Set[int]:
+    """Move this user's cold items with these ids back into feed_items; returns the ids moved
+
+    Flushed in the caller's transaction, so the caller's statement can run
+    against the restored rows before committing.
+    """
+    cold_rows = db.execute(
+        select(FeedItemCold).where(
+            FeedItemCold.id.in_(item_ids), owned_by(current_user, FeedItemCold.sender_email)
+        )
+    ).scalars().all()
+    if not cold_rows:
+        return set()
+
+    hot = _feed_items_table(db.get_bind())
+    restored = []
+    for cold in cold_rows:
+        values = {name: getattr(cold, name) for name in COLD_COLUMNS}
+        for name, value in _decompress(cold.payload).items():
+            if name in hot.c:
+                values[name] = _as_datetime(value) if isinstance(hot.c[name].type, DateTime) else value
+        restored.append({name: value for name, value in values.items() if name in hot.c})
+
+    # Hot rows first: the tier triggers check feed_items_cold while it still holds them
+    db.execute(insert(hot), restored)
+    db.execute(delete(FeedItemCold).where(FeedItemCold.id.in_([cold.id for cold in cold_rows])))
+    return {cold.id for cold in cold_rows}
+
+def cold_feed_row(row) -> Tuple:
+    """(id, sender_email, received_date, payload) -> a FEED_ITEM_COLUMNS-shaped tuple"""
+    values = _decompress(row[3])
+    return (row[0], row[1], values.get('core_link'), row[2],
+            _as_datetime(values.get('processed_date')), values.get('notes'))
+
+def cold_export_row(row, names: List[str]) -> Dict:
+    """A cold item as an export dict with the given column names"""
+    values = {**_decompress(row.payload), 'id': row.id, 'sender_email': row.sender_email,
+              'received_date': row.received_date, 'archived_at': row.archived_at}
+    for name in ('processed_date', 'preview_fetched_at'):
+        if name in values:
+            values[name] = _as_datetime(values[name])
+    return {name: values.get(name) for name in names}
@@ -1,12 +1,20 @@
 """Database connection utilities"""
+import asyncio
+import itertools
+import logging
 import os
 import sys
 import sqlite3
+import time
 from pathlib import Path
+from typing import Dict, List, Optional
 
 # Add project root to path for imports
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
+backend_dir = Path(__file__).parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
 
 # Load .env file if it exists
 try:
@@ -17,10 +25,20 @@ try:
 except ImportError:
     pass  # python-dotenv not installed, that's okay
 
-from sqlalchemy import create_engine
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import CursorResult, FrozenResult
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.orm import declarative_base
 
+from config import settings
+from utils.feed_cache import feed_cache
+
+logger = logging.getLogger(__name__)
+
 # Try PostgreSQL, fallback to SQLite
 try:
     import psycopg2
@@ -30,21 +48,261 @@ except ImportError:
 
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///feed.db')
 
+def apply_sqlite_pragmas(dbapi_connection):
+    """Per-connection SQLite tuning from settings (WAL, synchronous, busy timeout, mmap)"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.close()
+
+# SQLite connections are local file handles that can't go stale, so they're never
+# pinged: a ping would be one more statement per checkout
+POOL_PRE_PING = settings.db_pool_pre_ping and not DATABASE_URL.startswith('sqlite')
+
+def _pool_options() -> Dict:
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
 # For SQLite, use file path
 if DATABASE_URL.startswith('sqlite'):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    # In-memory databases use a single-connection pool that takes no sizing options
+    pool_options = {} if ':memory:' in DATABASE_URL else _pool_options()
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, **pool_options)
+
+    @event.listens_for(engine, "connect")
+    def _on_sqlite_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection)
 else:
     # PostgreSQL
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **_pool_options())
+
+def to_async_url(url: str) -> str:
+    """Same database through an asyncio driver (aiosqlite / asyncpg)"""
+    if url.startswith('sqlite:'):
+        return 'sqlite+aiosqlite:' + url[len('sqlite:'):]
+    for prefix in ('postgresql+psycopg2://', 'postgresql://', 'postgres://'):
+        if url.startswith(prefix):
+            return 'postgresql+asyncpg://' + url[len(prefix):]
+    return url
+
+# Engine the API routes use: on PostgreSQL an async one (asyncpg); on SQLite a
+# second blocking engine whose sessions run in the threadpool (ThreadedSession).
+# Either way the routes get a pool of their own. The sync engine above stays for
+# the worker, migration scripts, create_all and work done in threads.
+if DATABASE_URL.startswith('sqlite'):
+    async_engine = None
+    route_engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, **pool_options)
+    event.listen(route_engine, "connect", _on_sqlite_connect)
+else:
+    async_engine = create_async_engine(to_async_url(DATABASE_URL), **_pool_options())
+    route_engine = None
+
+# Optional PostgreSQL read replicas for the read-only routes (get_read_db)
+REPLICA_URLS: List[str] = [
+    url.strip() for url in settings.database_replica_urls.split(',') if url.strip()
+] if not DATABASE_URL.startswith('sqlite') else []
+replica_engines = [create_async_engine(to_async_url(url), **_pool_options()) for url in REPLICA_URLS]
 
 # Export these for debugging (used in app.py)
-__all__ = ['engine', 'Base', 'SessionLocal', 'get_db', 'get_raw_connection', 'DATABASE_URL', 'USE_POSTGRES']
+__all__ = ['engine', 'async_engine', 'route_engine', 'replica_engines', 'Base', 'SessionLocal', 'AsyncSessionLocal', 'ThreadedSession',
+           'get_db', 'get_read_db', 'remember_user_write', 'is_replica_session', 'get_sync_db', 'get_raw_connection', 'describe_engine',
+           'DATABASE_URL', 'USE_POSTGRES']
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Route sessions (ThreadedSession) that may hold a connection at once, and the
+# event loop's semaphore that enforces it; created on first use
+ROUTE_CONNECTIONS = settings.db_pool_size + settings.db_max_overflow
+_route_connections: Optional[asyncio.Semaphore] = None
+
+class ThreadedSession:
+    """The AsyncSession methods the routes use, over a blocking Session run in the threadpool
+
+    Route sessions on SQLite. aiosqlite hands every DBAPI call (cursor,
+    execute, fetch, close) to the connection's thread and waits on the event
+    loop for each result, and a write transaction keeps SQLite's one write
+    lock through all of those waits; under load that is slower than the sync
+    routes were, for reads and much more for writes. Here each awaited call
+    is one threadpool hop on a plain sqlite3 connection, and work passed to
+    run_sync(), commit included, runs start to finish in one thread, as it
+    would in a sync route.
+
+    A session keeps its connection between hops, so it first takes one of
+    ROUTE_CONNECTIONS slots on the event loop. Otherwise threadpool threads
+    would block in the pool's checkout while the sessions holding every
+    connection wait for a free thread to finish, until DB_POOL_TIMEOUT.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+        self.bind = session.bind
+        self._has_slot = False
+
+    async def __aenter__(self) -> "ThreadedSession":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _run(self, fn, *args, **kwargs):
+        global _route_connections
+        if not self._has_slot:
+            if _route_connections is None:
+                _route_connections = asyncio.Semaphore(ROUTE_CONNECTIONS)
+            try:
+                await asyncio.wait_for(_route_connections.acquire(), settings.db_pool_timeout)
+            except asyncio.TimeoutError:
+                raise PoolTimeoutError(f"No route connection free after {settings.db_pool_timeout}s")
+            self._has_slot = True
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await self._run(fn, self.sync_session, *args, **kwargs)
+
+    def _execute(self, statement, params, kwargs):
+        result = self.sync_session.execute(statement, params, **kwargs)
+        if isinstance(result, CursorResult) and not result.returns_rows:
+            return result  # A plain UPDATE/DELETE: only rowcount to read
+        # Buffered like AsyncSession's results, so reading them does no I/O on the event loop
+        return result.freeze()
+
+    async def execute(self, statement, params=None, **kwargs):
+        result = await self._run(self._execute, statement, params, kwargs)
+        return result() if isinstance(result, FrozenResult) else result
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await self._run(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return (await self.execute(statement, params, **kwargs)).scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.sync_session.get, entity, ident, **kwargs)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def delete(self, instance):
+        await self._run(self.sync_session.delete, instance)
+
+    async def refresh(self, instance, attribute_names=None):
+        await self._run(self.sync_session.refresh, instance, attribute_names)
+
+    async def flush(self):
+        await self._run(self.sync_session.flush)
+
+    async def commit(self):
+        await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._run(self.sync_session.rollback)
+
+    async def close(self):
+        if not self._has_slot:
+            self.sync_session.close()  # Never checked out a connection: nothing to do I/O on
+            return
+        try:
+            await run_in_threadpool(self.sync_session.close)
+        finally:
+            self._has_slot = False
+            _route_connections.release()
+
+# expire_on_commit=False: routes return ORM objects after committing, and
+# reloading expired attributes lazily isn't possible on an async session
+if DATABASE_URL.startswith('sqlite'):
+    _route_sessions = sessionmaker(route_engine, autoflush=False, expire_on_commit=False)
+
+    def AsyncSessionLocal() -> ThreadedSession:
+        return ThreadedSession(_route_sessions())
+else:
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+_replica_sessions = [
+    async_sessionmaker(replica, autoflush=False, expire_on_commit=False) for replica in replica_engines
+]
+_replica_down_until = [0.0] * len(replica_engines)
+_replica_turn = itertools.count()
 Base = declarative_base()
 
-def get_db() -> Session:
-    """Dependency for FastAPI to get database session"""
+def _remember_write(request: Request):
+    """after_commit hook: pin this client's reads to the primary for a while (read-your-writes)
+
+    The session cookie only covers this client; the user's other clients
+    are pinned by remember_user_write() once the route returns.
+    """
+    def on_commit(session):
+        if "session" in request.scope:
+            request.session["last_write_at"] = int(time.time())
+            request.state.wrote_as_user = request.session.get("user_id")
+    return on_commit
+
+async def remember_user_write(request: Request):
+    """Pin the reads of a user who just wrote to the primary, from any client
+
+    Called by app middleware before the response goes out (dependency
+    teardown would be too late: the client may read first). The mark lives
+    in the feed cache backend, so with FEED_CACHE_URL it reaches every API
+    process; with the in-process cache, only this one.
+    """
+    user_id = getattr(request.state, "wrote_as_user", None)
+    if user_id:
+        await feed_cache.amark_write(int(user_id), settings.replica_stickiness_seconds)
+
+async def get_db(request: Request) -> AsyncSession:
+    """Dependency for FastAPI to get an async database session (primary)"""
+    async with AsyncSessionLocal() as db:
+        if replica_engines:
+            event.listen(db.sync_session, "after_commit", _remember_write(request))
+        yield db
+
+async def _open_replica_session() -> Optional[AsyncSession]:
+    """Session on the next healthy replica with a connection checked out, or None"""
+    now = time.monotonic()
+    start = next(_replica_turn)
+    for offset in range(len(replica_engines)):
+        index = (start + offset) % len(replica_engines)
+        if _replica_down_until[index] > now:
+            continue
+        db = _replica_sessions[index]()
+        try:
+            await db.connection()
+            return db
+        except (DBAPIError, OSError) as e:
+            await db.close()
+            _replica_down_until[index] = now + settings.replica_retry_seconds
+            logger.warning(f"Read replica {index} unavailable, skipping for "
+                           f"{settings.replica_retry_seconds}s: {e}")
+    return None
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """Session for read-only routes: a replica, unless none is healthy or this client or user just wrote"""
+    db = None
+    if replica_engines:
+        session = request.session if "session" in request.scope else {}
+        user_id = session.get("user_id")
+        if time.time() - session.get("last_write_at", 0) >= settings.replica_stickiness_seconds and \
+                not (user_id and await feed_cache.awrote_recently(int(user_id))):
+            db = await _open_replica_session()
+    if db is None:
+        db = AsyncSessionLocal()
+    async with db:
+        yield db
+
+def is_replica_session(db: AsyncSession) -> bool:
+    """Whether get_read_db handed out a replica session (which may lag the primary)"""
+    return any(db.bind is replica for replica in replica_engines)
+
+def get_sync_db() -> Session:
+    """Blocking-session dependency, for code that must run in a thread"""
     db = SessionLocal()
     try:
         yield db
@@ -56,5 +314,39 @@ def get_raw_connection():
     if USE_POSTGRES and DATABASE_URL and not DATABASE_URL.startswith('sqlite'):
         return psycopg2.connect(DATABASE_URL)
     else:
-        return sqlite3.connect('feed.db')
+        path = DATABASE_URL[len('sqlite:///'):] if DATABASE_URL.startswith('sqlite:///') else 'feed.db'
+        conn = sqlite3.connect(path, timeout=settings.sqlite_busy_timeout_ms / 1000)
+        apply_sqlite_pragmas(conn)
+        return conn
 
+def describe_engine() -> Dict:
+    """Pool state and effective connection settings, for /debug/db"""
+    pool = engine.pool
+    info = {
+        "pool_class": type(pool).__name__,
+        "pool_status": pool.status(),
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+    if hasattr(pool, 'size'):
+        info.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle,
+        })
+    # The API routes run on a pool of their own, the worker and scripts on the one above
+    info["route_sessions"] = "threadpool" if route_engine is not None else async_engine.dialect.driver
+    info["route_pool_status"] = (route_engine or async_engine).pool.status()
+    info["replicas"] = [
+        {"pool_status": replica.pool.status(), "healthy": _replica_down_until[index] <= time.monotonic()}
+        for index, replica in enumerate(replica_engines)
+    ]
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            info["sqlite_pragmas"] = {
+                name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size')
+            }
+    return info
@@ -0,0 +1,179 @@
+"""Link extraction from emails
+
+Pure functions with no database or IMAP access, so the worker can run
+parse_fetched_message() (IMAP) and parse_raw_message() (local archives)
+in its process pool (utils/parse_pool.py).
+"""
+import email
+import re
+import sys
+from datetime import datetime
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from utils.imap_fetch import FetchedMessage, message_content
+from utils.link_scoring import pick_primary_link
+
+class ParsedEmail(NamedTuple):
+    uid: int  # Or the message's position in a local archive
+    sender_email: str
+    received_date: str
+    core_link: Optional[str]
+    error: Optional[str] = None
+
+def extract_sender_email(from_field):
+    """Extract clean email address from From field"""
+    match = re.search(r'<(.+?)>', from_field)
+    return match.group(1) if match else from_field.strip()
+
+def message_text(message):
+    """(text/plain content, text/html content) of a parsed email message, attachments skipped"""
+    text_content = ""
+    html_content = ""
+    
+    if message.is_multipart():
+        for part in message.walk():
+            content_type = part.get_content_type()
+            content_disposition = str(part.get("Content-Disposition"))
+            
+            if "attachment" not in content_disposition:
+                if content_type == "text/plain":
+                    text_content = part.get_payload(decode=True).decode(errors='ignore')
+                elif content_type == "text/html":
+                    html_content = part.get_payload(decode=True).decode(errors='ignore')
+    else:
+        content = message.get_payload(decode=True).decode(errors='ignore')
+        if message.get_content_type() == "text/html":
+            html_content = content
+        else:
+            text_content = content
+    
+    return text_content, html_content
+
+def extract_urls_from_email(message):
+    """Extract all URLs from a parsed email message"""
+    return extract_urls(*message_text(message))
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+
+class Link(NamedTuple):
+    url: str
+    source: str  # text (text/plain part), href (<a href>) or bare (anywhere else in the HTML)
+    anchor_text: str = ''
+
+class LinkExtractor(HTMLParser):
+    """One streaming pass over HTML collecting <a href> values and bare URLs, without building a tree
+
+    Bare URLs are those in text, comments and any attribute value, with
+    entities already decoded. Each href keeps its anchor text (including
+    the alt text of images inside the link).
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs: List[List] = []  # [url, [anchor text pieces]]
+        self.bare_urls: List[str] = []
+        self._anchor: Optional[List[str]] = None
+
+    def _scan(self, value):
+        if value and 'http' in value:
+            self.bare_urls.extend(URL_PATTERN.findall(value))
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if tag == 'a' and name == 'href' and value:
+                self._anchor = []
+                self.hrefs.append([value, self._anchor])
+            elif tag == 'img' and name == 'alt' and value and self._anchor is not None:
+                self._anchor.append(value)
+            self._scan(value)
+
+    def handle_endtag(self, tag):
+        if tag == 'a':
+            self._anchor = None
+
+    def handle_data(self, data):
+        if self._anchor is not None:
+            self._anchor.append(data)
+        self._scan(data)
+
+    def handle_comment(self, data):
+        self._scan(data)
+
+    def links(self) -> List[Link]:
+        """<a href> links in document order, then every other URL in the HTML"""
+        return [Link(url, 'href', ' '.join(' '.join(text).split())) for url, text in self.hrefs] + \
+               [Link(url, 'bare') for url in self.bare_urls]
+
+def extract_links(text_content, html_content) -> List[Link]:
+    """Unique http(s) links from an email's text/plain and text/html content, in order
+
+    A URL seen more than once keeps its first position; later <a href>
+    occurrences add their anchor text to it.
+    """
+    links = []
+    
+    if text_content:
+        links.extend(Link(url, 'text') for url in URL_PATTERN.findall(text_content))
+    
+    if html_content:
+        extractor = LinkExtractor()
+        extractor.feed(html_content)
+        extractor.close()
+        links.extend(extractor.links())
+    
+    # Deduplicate
+    positions = {}
+    unique_links = []
+    for link in links:
+        clean_url = link.url.rstrip('>')
+        if not clean_url.startswith('http'):
+            continue
+        if clean_url not in positions:
+            positions[clean_url] = len(unique_links)
+            unique_links.append(link._replace(url=clean_url))
+        elif link.source == 'href':
+            first = unique_links[positions[clean_url]]
+            unique_links[positions[clean_url]] = first._replace(
+                source='href', anchor_text=' '.join(filter(None, (first.anchor_text, link.anchor_text)))
+            )
+    
+    return unique_links
+
+def extract_urls(text_content, html_content):
+    """Extract all URLs from an email's text/plain and text/html content"""
+    return [link.url for link in extract_links(text_content, html_content)]
+
+def get_primary_url(urls):
+    """Pick the link the email is about (see utils/link_scoring.py); takes URLs or Links"""
+    return pick_primary_link([Link(url, 'href') if isinstance(url, str) else url for url in urls or []])
+
+def parse_fetched_message(message: FetchedMessage) -> ParsedEmail:
+    """Decode a fetched message and pick its link; errors are returned, not raised"""
+    try:
+        headers, text_content, html_content = message_content(message)
+        sender_email = extract_sender_email(headers.get('From', ''))
+        received_date = headers.get('Date', datetime.now().isoformat())
+        core_link = pick_primary_link(extract_links(text_content, html_content))
+        return ParsedEmail(message.uid, sender_email, received_date, core_link)
+    except Exception as e:
+        return ParsedEmail(message.uid, '', '', None, str(e))
+
+def parse_raw_message(item: Tuple[int, bytes]) -> ParsedEmail:
+    """parse_fetched_message() for a whole RFC 822 message, e.g. from a local archive: (number, bytes)"""
+    number, raw = item
+    try:
+        message = email.message_from_bytes(raw)
+        sender_email = extract_sender_email(message.get('From', ''))
+        received_date = message.get('Date', datetime.now().isoformat())
+        core_link = pick_primary_link(extract_links(*message_text(message)))
+        return ParsedEmail(number, sender_email, received_date, core_link)
+    except Exception as e:
+        return ParsedEmail(number, '', '', None, str(e))
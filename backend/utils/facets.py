@@ -0,0 +1,202 @@
+"""Facet rollups: feed item counts per sender, link domain and month
+
+feed_facets holds one row per (sender_email, facet, value) with a running
+count. Triggers on feed_items bump it on insert and decrement it on delete,
+so /api/feed/facets reads a handful of small rows instead of running
+GROUP BY over every feed item on each request. Rows moving to or from the
+cold tier (utils/cold_tier.py) keep their counts.
+"""
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models import FeedFacet, FeedItemCold
+from utils.cold_tier import cold_feed_row
+
+def _sqlite_domain(link: str) -> str:
+    """The value _pg_domain gives, without regex functions (SQLite has none)
+
+    The host ends at the first '/', '?', '#' or ':' (port); the last three
+    are turned into '/' so one instr() finds it. A leading "www." is dropped
+    unless nothing would be left, and links without a scheme are 'unknown'.
+    """
+    rest = f"substr({link}, instr({link}, '://') + 3)"
+    rest = (f"substr({rest}, CASE WHEN substr({rest}, 1, 4) = 'www.' "
+            f"AND instr('/?#:', substr({rest}, 5, 1)) = 0 THEN 5 ELSE 1 END)")
+    ends = f"replace(replace(replace({rest}, '?', '/'), '#', '/'), ':', '/')"
+    host = f"substr({rest}, 1, instr({ends} || '/', '/') - 1)"
+    return f"(CASE WHEN instr({link}, '://') < 2 THEN 'unknown' ELSE coalesce(nullif(lower({host}), ''), 'unknown') END)"
+
+def _sqlite_month(date: str) -> str:
+    return f"coalesce(strftime('%Y-%m', {date}), 'unknown')"
+
+def _pg_domain(link: str) -> str:
+    # "(?\:" keeps text() from reading ":www" as a bind parameter; PostgreSQL gets "(?:"
+    return f"coalesce(lower(substring({link} from '^[A-Za-z][A-Za-z0-9+.-]*://(?\\:www\\.)?([^/?#:]+)')), 'unknown')"
+
+def _pg_month(date: str) -> str:
+    return f"coalesce(to_char({date}, 'YYYY-MM'), 'unknown')"
+
+def _sqlite_statements() -> List[str]:
+    def bump(row: str, delta: str) -> str:
+        return ''.join(
+            f'''
+            INSERT INTO feed_facets(sender_email, facet, value, count)
+            VALUES ({row}.sender_email, '{facet}', {expression}, {delta})
+            ON CONFLICT(sender_email, facet, value) DO UPDATE SET count = count + {delta};'''
+            for facet, expression in (
+                ('domain', _sqlite_domain(f'{row}.core_link')),
+                ('month', _sqlite_month(f'{row}.received_date')),
+            )
+        )
+
+    cleanup = "DELETE FROM feed_facets WHERE sender_email = OLD.sender_email AND count <= 0;"
+    def not_cold(row: str) -> str:
+        return f"WHEN NOT EXISTS (SELECT 1 FROM feed_items_cold WHERE id = {row}.id)"
+
+    return [
+        "DROP TRIGGER IF EXISTS feed_facets_ai",
+        f"CREATE TRIGGER feed_facets_ai AFTER INSERT ON feed_items {not_cold('NEW')} BEGIN {bump('NEW', '1')} END",
+        "DROP TRIGGER IF EXISTS feed_facets_ad",
+        f"CREATE TRIGGER feed_facets_ad AFTER DELETE ON feed_items {not_cold('OLD')} BEGIN {bump('OLD', '-1')} {cleanup} END",
+        "DROP TRIGGER IF EXISTS feed_facets_au",
+        f'''CREATE TRIGGER feed_facets_au
+            AFTER UPDATE OF sender_email, core_link, received_date ON feed_items
+            BEGIN {bump('OLD', '-1')} {cleanup} {bump('NEW', '1')} END''',
+    ]
+
+def _pg_statements() -> List[str]:
+    def bump(row: str, delta: str) -> str:
+        return ''.join(
+            f'''
+            INSERT INTO feed_facets(sender_email, facet, value, count)
+            VALUES ({row}.sender_email, '{facet}', {expression}, {delta})
+            ON CONFLICT (sender_email, facet, value) DO UPDATE SET count = feed_facets.count + {delta};'''
+            for facet, expression in (
+                ('domain', _pg_domain(f'{row}.core_link')),
+                ('month', _pg_month(f'{row}.received_date')),
+            )
+        )
+
+    cleanup = "DELETE FROM feed_facets WHERE sender_email = OLD.sender_email AND count <= 0;"
+    return [
+        f'''
+        CREATE OR REPLACE FUNCTION maintain_feed_facets() RETURNS trigger AS $$
+        BEGIN
+            -- Rows moving between storage tiers keep their counts
+            IF TG_OP = 'INSERT' THEN
+                IF EXISTS (SELECT 1 FROM feed_items_cold WHERE id = NEW.id) THEN
+                    RETURN NULL;
+                END IF;
+            ELSIF TG_OP = 'DELETE' THEN
+                IF EXISTS (SELECT 1 FROM feed_items_cold WHERE id = OLD.id) THEN
+                    RETURN NULL;
+                END IF;
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                IF TG_OP = 'DELETE'
+                   OR OLD.sender_email IS DISTINCT FROM NEW.sender_email
+                   OR OLD.core_link IS DISTINCT FROM NEW.core_link
+                   OR OLD.received_date IS DISTINCT FROM NEW.received_date THEN
+                    {bump('OLD', '-1')}
+                    {cleanup}
+                    IF TG_OP = 'UPDATE' THEN
+                        {bump('NEW', '1')}
+                    END IF;
+                END IF;
+                RETURN NULL;
+            END IF;
+            {bump('NEW', '1')}
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        'DROP TRIGGER IF EXISTS feed_facets_trg ON feed_items',
+        '''
+        CREATE TRIGGER feed_facets_trg AFTER INSERT OR UPDATE OR DELETE ON feed_items
+        FOR EACH ROW EXECUTE PROCEDURE maintain_feed_facets()
+        ''',
+    ]
+
+def _recount(conn, facets: Dict[str, str]):
+    """Rebuild the counts of these facets ({facet: SQL expression}) from both storage tiers"""
+    conn.execute(text("CREATE TEMP TABLE facet_cold_items (sender_email TEXT, core_link TEXT, received_date TIMESTAMP)"))
+    cold = conn.execute(select(FeedItemCold.id, FeedItemCold.sender_email, FeedItemCold.received_date,
+                               FeedItemCold.payload))
+    while True:
+        rows = cold.fetchmany(1000)
+        if not rows:
+            break
+        # The link is only in the compressed payload
+        conn.execute(text("INSERT INTO facet_cold_items VALUES (:sender_email, :core_link, :received_date)"), [
+            {"sender_email": row[1], "core_link": cold_feed_row(row)[2], "received_date": row[2]}
+            for row in rows
+        ])
+    for facet, expression in facets.items():
+        conn.execute(text("DELETE FROM feed_facets WHERE facet = :facet"), {"facet": facet})
+        conn.execute(text(f'''
+            INSERT INTO feed_facets(sender_email, facet, value, count)
+            SELECT sender_email, '{facet}', value, count(*) FROM (
+                SELECT sender_email, {expression} AS value FROM feed_items
+                UNION ALL
+                SELECT sender_email, {expression} AS value FROM facet_cold_items
+            ) items GROUP BY sender_email, value
+        '''))
+    conn.execute(text("DROP TABLE facet_cold_items"))
+
+def ensure_facet_rollups(engine: Engine):
+    """Install the rollup triggers, rebuilding the counts if the table is empty
+
+    On SQLite the domain counts are also rebuilt when the installed triggers
+    computed domains differently (older versions cut the host only at '/').
+    """
+    if not inspect(engine).has_table('feed_items'):
+        return
+    is_sqlite = engine.dialect.name == 'sqlite'
+    statements = _sqlite_statements() if is_sqlite else _pg_statements()
+    with engine.begin() as conn:
+        domain_changed = False
+        if is_sqlite:
+            installed = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'feed_facets_ai'")).scalar()
+            domain_changed = installed is not None and _sqlite_domain('NEW.core_link') not in installed
+        for statement in statements:
+            conn.execute(text(statement))
+
+        domain = _sqlite_domain('core_link') if is_sqlite else _pg_domain('core_link')
+        month = _sqlite_month('received_date') if is_sqlite else _pg_month('received_date')
+        if conn.execute(select(FeedFacet.sender_email).limit(1)).first() is None:
+            _recount(conn, {'domain': domain, 'month': month})
+        elif domain_changed:
+            _recount(conn, {'domain': domain})
+
+def get_facets(db: Session, sender_emails: List[str], domain_limit: int) -> Dict[str, List[Dict]]:
+    """Counts per sender, domain (top domain_limit) and month for these senders"""
+    rows = db.execute(
+        select(FeedFacet.facet, FeedFacet.value, func.sum(FeedFacet.count).label('total'))
+        .where(FeedFacet.sender_email.in_(sender_emails))
+        .group_by(FeedFacet.facet, FeedFacet.value)
+    ).all()
+    senders = db.execute(
+        select(FeedFacet.sender_email, func.sum(FeedFacet.count))
+        .where(FeedFacet.sender_email.in_(sender_emails), FeedFacet.facet == 'month')
+        .group_by(FeedFacet.sender_email)
+    ).all()
+
+    domains = sorted((r for r in rows if r.facet == 'domain'), key=lambda r: (-r.total, r.value))
+    months = sorted((r for r in rows if r.facet == 'month'), key=lambda r: r.value, reverse=True)
+    return {
+        "senders": [{"value": s, "count": c} for s, c in sorted(senders, key=lambda r: -r[1]) if c > 0],
+        "domains": [{"value": r.value, "count": r.total} for r in domains[:domain_limit] if r.total > 0],
+        "months": [{"value": r.value, "count": r.total} for r in months if r.total > 0],
+    }
@@ -0,0 +1,34 @@
+"""Fast JSON rendering for hot read paths"""
+import json
+from datetime import date, datetime
+from typing import Any
+
+from starlette.responses import Response
+
+# Use orjson when available, fallback to the stdlib encoder
+try:
+    import orjson
+    USE_ORJSON = True
+except ImportError:
+    USE_ORJSON = False
+
+def _default(obj: Any) -> Any:
+    """Encode values the stdlib encoder doesn't know (matches Pydantic's output)"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj: Any) -> bytes:
+    """Serialize plain dicts/lists/datetimes to JSON bytes"""
+    if USE_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), default=_default).encode('utf-8')
+
+class RenderedJSONResponse(Response):
+    """JSON response built from plain Python data, skipping response_model validation"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
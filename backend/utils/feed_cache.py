@@ -0,0 +1,253 @@
+"""First-page feed cache with version-based invalidation
+
+Rendered first pages of /api/feed are cached per user and filter set. Each
+entry remembers the versions of the keys it depends on: "user:<id>" (bumped
+when the user's linked addresses change) and "sender:<email>" for every
+address it covers (bumped when an item from that sender is inserted,
+updated or deleted). A hit is served only if none of those versions moved,
+so invalidation is exact rather than TTL-based; the TTL just bounds memory
+and any bump a process never heard about.
+
+The default backend is an in-process LRU. Set FEED_CACHE_URL=redis://... to
+share entries and versions between API processes and the worker.
+
+The same backend holds short-lived per-user write marks, which keep a
+user's reads on the primary database for a few seconds after a write
+(read replicas, utils/database.py).
+
+The Redis client is the blocking one, since the worker shares it, so async
+routes use the a-prefixed methods (aget, asnapshot, ...), which run Redis
+calls in the threadpool and in-process ones inline.
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import settings
+
+# Redis is optional; only needed for a shared cache
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def sender_key(sender_email: str) -> str:
+    return f"sender:{sender_email}"
+
+def write_key(user_id: int) -> str:
+    return f"write:{user_id}"
+
+class InMemoryBackend:
+    """LRU of rendered pages plus version counters, local to this process
+
+    Versions are bounded too, in their own LRU. A bump sets a key to the next
+    value of one process-wide counter rather than adding one to it, and a
+    key that's been evicted reads as the highest version evicted so far; so
+    an evicted key can never come back at a version some cached page still
+    holds, it can only cause a spurious miss.
+    """
+    blocking = False
+
+    def __init__(self, max_entries: int, max_versions: int = None):
+        self.max_entries = max_entries
+        self.max_versions = max_versions or max_entries * 8
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._clock = 0
+        self._evicted_version = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            found = self._entries.get(key)
+            if found is None:
+                return None
+            expires_at, entry = found
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, keys: List[str]) -> List[int]:
+        with self._lock:
+            found = []
+            for key in keys:
+                version = self._versions.get(key)
+                if version is None:
+                    version = self._evicted_version
+                else:
+                    self._versions.move_to_end(key)
+                found.append(version)
+            return found
+
+    def bump(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._clock += 1
+                self._versions[key] = self._clock
+                self._versions.move_to_end(key)
+            while len(self._versions) > self.max_versions:
+                _, version = self._versions.popitem(last=False)
+                self._evicted_version = max(self._evicted_version, version)
+
+class RedisBackend:
+    """Same interface as InMemoryBackend, shared by every process using the URL"""
+
+    PREFIX = "feedcache:"
+    blocking = True
+
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Dict]:
+        raw = self._client.get(f"{self.PREFIX}page:{key}")
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, entry: Dict, ttl: int):
+        self._client.setex(f"{self.PREFIX}page:{key}", ttl, json.dumps(entry))
+
+    def versions(self, keys: List[str]) -> List[int]:
+        values = self._client.mget([f"{self.PREFIX}ver:{key}" for key in keys])
+        return [int(value) if value else 0 for value in values]
+
+    def bump(self, keys: Iterable[str]):
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(f"{self.PREFIX}ver:{key}")
+        pipe.execute()
+
+class FeedPageCache:
+    """Rendered first pages keyed by user + filters, validated against key versions"""
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def _entry_key(user_id: int, filters: Tuple) -> str:
+        return f"{user_id}:{json.dumps(filters)}"
+
+    def snapshot(self, user_id: int, sender_emails: List[str]) -> Dict:
+        """Versions to store with a page; take it *before* querying the page"""
+        keys = [user_key(user_id)] + [sender_key(s) for s in sender_emails]
+        try:
+            return {"keys": keys, "versions": self.backend.versions(keys)}
+        except Exception as e:
+            logger.warning(f"Feed cache unavailable: {e}")
+            return {}
+
+    def get(self, user_id: int, filters: Tuple) -> Optional[bytes]:
+        """Cached body if present and nothing it depends on has changed"""
+        try:
+            entry = self.backend.get(self._entry_key(user_id, filters))
+            if entry is None or self.backend.versions(entry["keys"]) != entry["versions"]:
+                return None
+            return entry["body"].encode("utf-8")
+        except Exception as e:
+            logger.warning(f"Feed cache read failed: {e}")
+            return None
+
+    def set(self, user_id: int, filters: Tuple, snapshot: Dict, body: bytes):
+        if not snapshot:
+            return
+        try:
+            self.backend.set(
+                self._entry_key(user_id, filters),
+                {"keys": snapshot["keys"], "versions": snapshot["versions"], "body": body.decode("utf-8")},
+                self.ttl,
+            )
+        except Exception as e:
+            logger.warning(f"Feed cache write failed: {e}")
+
+    def invalidate_senders(self, sender_emails: Iterable[str]):
+        self._bump(sender_key(s) for s in set(sender_emails))
+
+    def invalidate_user(self, user_id: int):
+        self._bump([user_key(user_id)])
+
+    def _bump(self, keys: Iterable[str]):
+        try:
+            self.backend.bump(list(keys))
+        except Exception as e:
+            logger.warning(f"Feed cache invalidation failed: {e}")
+
+    # Read-your-writes marks for utils/database.py: a user who committed a write
+    # reads from the primary until the mark expires, in every process sharing the backend
+
+    def mark_write(self, user_id: int, seconds: int):
+        try:
+            self.backend.set(write_key(user_id), {"at": time.time()}, seconds)
+        except Exception as e:
+            logger.warning(f"Feed cache write failed: {e}")
+
+    def wrote_recently(self, user_id: int) -> bool:
+        try:
+            return self.backend.get(write_key(user_id)) is not None
+        except Exception as e:
+            logger.warning(f"Feed cache read failed: {e}")
+            return False
+
+    # For async routes: the same calls, kept off the event loop when the backend blocks
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    async def aget(self, user_id: int, filters: Tuple) -> Optional[bytes]:
+        return await self._call(self.get, user_id, filters)
+
+    async def asnapshot(self, user_id: int, sender_emails: List[str]) -> Dict:
+        return await self._call(self.snapshot, user_id, sender_emails)
+
+    async def aset(self, user_id: int, filters: Tuple, snapshot: Dict, body: bytes):
+        await self._call(self.set, user_id, filters, snapshot, body)
+
+    async def ainvalidate_senders(self, sender_emails: Iterable[str]):
+        await self._call(self.invalidate_senders, list(sender_emails))
+
+    async def ainvalidate_user(self, user_id: int):
+        await self._call(self.invalidate_user, user_id)
+
+    async def amark_write(self, user_id: int, seconds: int):
+        await self._call(self.mark_write, user_id, seconds)
+
+    async def awrote_recently(self, user_id: int) -> bool:
+        return await self._call(self.wrote_recently, user_id)
+
+def _create_cache() -> FeedPageCache:
+    if settings.feed_cache_url:
+        if redis is None:
+            logger.error("FEED_CACHE_URL is set but the redis package is not installed; using in-process cache")
+        else:
+            return FeedPageCache(RedisBackend(settings.feed_cache_url), settings.feed_cache_ttl)
+    return FeedPageCache(InMemoryBackend(settings.feed_cache_size), settings.feed_cache_ttl)
+
+feed_cache = _create_cache()
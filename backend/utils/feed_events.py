@@ -0,0 +1,215 @@
+"""Live feed events: fans newly ingested items out to SSE subscribers
+
+The worker announces inserts on the FEED_NOTIFY_CHANNEL Postgres channel
+(pg_notify). One broker per API process LISTENs on that channel and, when
+woken, fetches every item it hasn't seen yet and pushes it to the queues of
+subscribers watching that sender address. On SQLite (or if
+LISTEN fails) the broker falls back to polling for new ids, so subscribers
+get the same events either way, just with a little more latency.
+
+Ids are taken from the sequence at insert time, not at commit, so on
+PostgreSQL id 10 can become visible after id 11 has been published. "Seen"
+is therefore not just "id <= highest published": each wake-up re-scans the
+last RESCAN_ID_WINDOW ids and publishes whichever it hasn't yet. An insert
+that commits after more than that many newer ids still reaches clients
+through /api/feed/changes, just not live.
+
+Each subscriber costs one bounded asyncio.Queue; no DB connection is held
+while a client sits idle.
+"""
+import asyncio
+import logging
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import func, select
+
+from config import settings
+from models import FeedItem
+from utils.database import DATABASE_URL, USE_POSTGRES, SessionLocal
+from utils.feed_items import FEED_ITEM_COLUMNS
+from utils.feed_cache import feed_cache
+
+logger = logging.getLogger(__name__)
+
+FEED_NOTIFY_CHANNEL = 'feed_items'
+
+# Safety net poll while LISTENing, in case a notification is ever missed
+LISTEN_FALLBACK_POLL_SECONDS = 60
+
+# Max events buffered per subscriber before it is disconnected (it can resume
+# with Last-Event-ID)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Max rows fetched per wake-up
+FETCH_BATCH_SIZE = 500
+
+# How far behind the highest published id a late-committing insert is still caught
+RESCAN_ID_WINDOW = 1000
+
+def fetch_items_after(last_id: int, sender_emails: Optional[List[str]] = None,
+                      limit: int = FETCH_BATCH_SIZE) -> List[Tuple]:
+    """Items with id > last_id in id order (blocking; run it in a thread)"""
+    db = SessionLocal()
+    try:
+        query = select(*FEED_ITEM_COLUMNS).where(FeedItem.id > last_id)
+        if sender_emails is not None:
+            query = query.where(FeedItem.sender_email.in_(sender_emails))
+        return [tuple(row) for row in db.execute(query.order_by(FeedItem.id).limit(limit)).all()]
+    finally:
+        db.close()
+
+def fetch_unseen_items(after_id: int, seen: Set[int], limit: int = FETCH_BATCH_SIZE) -> List[Tuple]:
+    """Items with id > after_id that aren't in seen, in id order (blocking; run it in a thread)
+
+    seen should only hold ids above after_id, so the id scan can be bounded.
+    """
+    db = SessionLocal()
+    try:
+        ids = db.execute(
+            select(FeedItem.id).where(FeedItem.id > after_id).order_by(FeedItem.id).limit(len(seen) + limit)
+        ).scalars().all()
+        unseen = [item_id for item_id in ids if item_id not in seen][:limit]
+        if not unseen:
+            return []
+        query = select(*FEED_ITEM_COLUMNS).where(FeedItem.id.in_(unseen)).order_by(FeedItem.id)
+        return [tuple(row) for row in db.execute(query).all()]
+    finally:
+        db.close()
+
+def _recent_item_ids() -> Tuple[int, Set[int]]:
+    """(max id, ids inside the rescan window below it): what counts as already seen at startup"""
+    db = SessionLocal()
+    try:
+        max_id = db.execute(select(func.max(FeedItem.id))).scalar() or 0
+        recent = db.execute(select(FeedItem.id).where(FeedItem.id > max_id - RESCAN_ID_WINDOW)).scalars().all()
+        return max_id, set(recent)
+    finally:
+        db.close()
+
+class FeedEventBroker:
+    """Single listener per process that dispatches new feed rows by sender address"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._last_id = 0
+        self._seen: Set[int] = set()  # Published ids within RESCAN_ID_WINDOW of _last_id
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pg_conn = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({id(q) for queues in self._subscribers.values() for q in queues})
+
+    def subscribe(self, sender_emails: Iterable[str]) -> asyncio.Queue:
+        """Register a queue that receives FEED_ITEM_COLUMNS rows for these senders"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        for sender in set(sender_emails):
+            self._subscribers[sender].add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, sender_emails: Iterable[str]):
+        for sender in set(sender_emails):
+            queues = self._subscribers.get(sender)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[sender]
+
+    def publish(self, row: Tuple):
+        """Deliver one row to everyone watching its sender"""
+        for queue in list(self._subscribers.get(row[1], ())):
+            try:
+                queue.put_nowait(row)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and tell it to reconnect
+                logger.warning("Feed stream subscriber fell behind, disconnecting it")
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._last_id, self._seen = await loop.run_in_executor(None, _recent_item_ids)
+        if USE_POSTGRES and DATABASE_URL and not DATABASE_URL.startswith('sqlite'):
+            try:
+                self._listen_postgres(loop)
+            except Exception as e:
+                logger.error(f"LISTEN {FEED_NOTIFY_CHANNEL} failed, polling instead: {e}")
+                self._pg_conn = None
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Feed event broker started ({'LISTEN/NOTIFY' if self._pg_conn else 'polling'})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._pg_conn is not None:
+            asyncio.get_running_loop().remove_reader(self._pg_conn.fileno())
+            self._pg_conn.close()
+            self._pg_conn = None
+
+    def _listen_postgres(self, loop: asyncio.AbstractEventLoop):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        conn = psycopg2.connect(DATABASE_URL)
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        conn.cursor().execute(f"LISTEN {FEED_NOTIFY_CHANNEL}")
+        loop.add_reader(conn.fileno(), self._on_notify)
+        self._pg_conn = conn
+
+    def _on_notify(self):
+        try:
+            self._pg_conn.poll()
+        except Exception as e:
+            logger.error(f"Feed LISTEN connection lost, polling instead: {e}")
+            asyncio.get_running_loop().remove_reader(self._pg_conn.fileno())
+            self._pg_conn = None
+        else:
+            self._pg_conn.notifies.clear()
+        self._wake.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            interval = LISTEN_FALLBACK_POLL_SECONDS if self._pg_conn else settings.feed_stream_poll_interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            rescan_from = max(self._last_id - RESCAN_ID_WINDOW, 0)
+            try:
+                rows = await loop.run_in_executor(None, fetch_unseen_items, rescan_from, self._seen)
+            except Exception as e:
+                logger.error(f"Feed event fetch failed: {e}")
+                continue
+            if rows:
+                # Worker inserts reach this process's first-page cache through here
+                await feed_cache.ainvalidate_senders(row[1] for row in rows)
+            for row in rows:
+                self._last_id = max(self._last_id, row[0])
+                self._seen.add(row[0])
+                self.publish(row)
+            if rows:
+                floor = self._last_id - RESCAN_ID_WINDOW
+                self._seen = {item_id for item_id in self._seen if item_id > floor}
+            if len(rows) == FETCH_BATCH_SIZE:
+                self._wake.set()  # More to catch up on
+
+broker = FeedEventBroker()
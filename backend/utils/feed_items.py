@@ -0,0 +1,73 @@
+"""Shared feed item queries and rendering"""
+import sys
+from pathlib import Path
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import inspect, or_, select
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+
+from models import FeedItem, User, UserEmail
+
+# Columns needed to render a feed item (selected as plain tuples, no ORM instances)
+FEED_ITEM_COLUMNS = (
+    FeedItem.id,
+    FeedItem.sender_email,
+    FeedItem.core_link,
+    FeedItem.received_date,
+    FeedItem.processed_date,
+    FeedItem.notes,
+)
+
+# Preview columns only exist on tables created by the worker or migrate_db.py
+PREVIEW_COLUMNS = ['preview_title', 'preview_description', 'preview_image_url', 'preview_site_name']
+
+_stored_preview_columns: Optional[List[str]] = None
+
+def stored_preview_columns(bind) -> List[str]:
+    """Which PREVIEW_COLUMNS this database's feed_items table actually has (cached)"""
+    global _stored_preview_columns
+    if _stored_preview_columns is None:
+        existing = {col['name'] for col in inspect(bind).get_columns('feed_items')}
+        _stored_preview_columns = [c for c in PREVIEW_COLUMNS if c in existing]
+    return _stored_preview_columns
+
+def get_linked_emails(db: Session, current_user: User) -> List[str]:
+    """All sender addresses whose items belong to this user (linked emails + own email)"""
+    linked_emails = db.query(UserEmail.email_address).filter(
+        UserEmail.user_id == current_user.id
+    ).all()
+    linked_email_list = [email[0] for email in linked_emails]
+    linked_email_list.append(current_user.email)
+    return linked_email_list
+
+def owned_by(current_user: User, sender_column=FeedItem.sender_email):
+    """SQL condition matching feed items that belong to this user, usable in a single statement"""
+    return or_(
+        sender_column == current_user.email,
+        sender_column.in_(
+            select(UserEmail.email_address).where(UserEmail.user_id == current_user.id)
+        )
+    )
+
+def feed_item_dict(row) -> Dict:
+    """Convert a FEED_ITEM_COLUMNS row into the FeedItemResponse JSON shape"""
+    return {
+        "id": row[0],
+        "sender_email": row[1],
+        "core_link": row[2],
+        "received_date": row[3],
+        "processed_date": row[4],
+        "notes": row[5],
+        "preview": None,  # Previews are fetched asynchronously by the frontend
+    }
+
+def feed_change_dict(row) -> Dict:
+    """A FEED_ITEM_COLUMNS row plus archived_at into the FeedChangedItem JSON shape"""
+    return {**feed_item_dict(row), "archived_at": row[6]}
@@ -0,0 +1,215 @@
+"""Batched IMAP fetching of just the text parts of messages
+
+One UID FETCH per batch returns every message's BODYSTRUCTURE and its From
+and Date headers. The text/plain and text/html parts that aren't
+attachments are then fetched with BODY.PEEK[<section>], one UID FETCH per
+group of messages that need the same sections, so a backlog costs a few
+round-trips and never downloads attachments. Each message's parts share a
+byte budget; larger parts are fetched as a partial <0.n> prefix.
+
+Parts are returned still transfer-encoded; message_content() decodes them,
+which the worker does in its parse pool (utils/parse_pool.py).
+"""
+import base64
+import email
+import quopri
+import re
+from email.message import Message
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+HEADER_FIELDS = 'BODY.PEEK[HEADER.FIELDS (FROM DATE)]'
+
+class TextPart(NamedTuple):
+    section: str  # e.g. "1", "2.1"
+    subtype: str  # PLAIN or HTML
+    encoding: str
+    charset: str
+    size: int
+
+class FetchedMessage(NamedTuple):
+    uid: int
+    header: bytes  # From and Date
+    parts: List[Tuple[TextPart, bytes]]
+
+# Tokens of a FETCH response: parens, "quoted strings", and atoms, where an
+# atom may contain a [...] section like BODY[HEADER.FIELDS (FROM DATE)]<0>
+_TOKEN = re.compile(
+    rb'\s*(?:(?P<open>\()|(?P<close>\))|"(?P<quoted>(?:[^"\\]|\\.)*)"'
+    rb'|(?P<atom>[^\s()"\[\]]*(?:\[[^\]]*\][^\s()"\[\]]*)+|[^\s()"\[\]]+))'
+)
+_LITERAL = re.compile(rb'\{\d+\}\s*$')
+_OPEN, _CLOSE = object(), object()
+
+def _tokens(data: Iterable) -> Iterator:
+    """imaplib splits responses at literals into (line, literal) tuples; put them back in order"""
+    for chunk in data:
+        literal = None
+        if isinstance(chunk, tuple):
+            chunk, literal = chunk
+            chunk = _LITERAL.sub(b'', chunk)
+        for match in _TOKEN.finditer(chunk):
+            if match.group('open'):
+                yield _OPEN
+            elif match.group('close'):
+                yield _CLOSE
+            elif match.group('quoted') is not None:
+                yield re.sub(rb'\\(.)', rb'\1', match.group('quoted')).decode('utf-8', errors='replace')
+            elif match.group('atom'):
+                atom = match.group('atom').decode('ascii', errors='replace')
+                yield None if atom.upper() == 'NIL' else atom
+        if literal is not None:
+            yield literal
+
+def _parse_list(tokens: Iterator) -> List:
+    items = []
+    for token in tokens:
+        if token is _CLOSE:
+            return items
+        items.append(_parse_list(tokens) if token is _OPEN else token)
+    return items
+
+def parse_fetch_response(data: Iterable) -> Dict[int, Dict[str, object]]:
+    """UID -> {item name: value} for the FETCH responses imaplib returned
+
+    Section names keep their brackets but drop a partial's <origin>, so a
+    BODY.PEEK[1]<0.100> request shows up as "BODY[1]".
+    """
+    messages = {}
+    tokens = _tokens(item for item in data if item is not None)
+    for token in tokens:
+        if token is not _OPEN:
+            continue  # The message sequence number
+        items = _parse_list(tokens)
+        values = {}
+        for name, value in zip(items[::2], items[1::2]):
+            values[re.sub(r'<\d+>$', '', name.upper())] = value
+        if 'UID' in values:
+            messages[int(values['UID'])] = values
+    return messages
+
+def _is_multipart(structure) -> bool:
+    return bool(structure) and isinstance(structure[0], list)
+
+def _is_attachment(disposition) -> bool:
+    return isinstance(disposition, list) and bool(disposition) and str(disposition[0]).upper() == 'ATTACHMENT'
+
+def _param(params, name: str) -> Optional[str]:
+    if isinstance(params, list):
+        for key, value in zip(params[::2], params[1::2]):
+            if str(key).upper() == name:
+                return value
+    return None
+
+def _walk(structure, section: str, leaf_section: str) -> Iterator[TextPart]:
+    if _is_multipart(structure):
+        # (part)(part)... "SUBTYPE" params disposition ...: the parts are the leading lists
+        children = []
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            children.append(child)
+        for index, child in enumerate(children, 1):
+            child_section = f"{section}.{index}" if section else str(index)
+            yield from _walk(child, child_section, child_section)
+        return
+
+    body_type, subtype = str(structure[0]).upper(), str(structure[1]).upper()
+    if body_type == 'TEXT' and subtype in ('PLAIN', 'HTML'):
+        # type subtype params id description encoding size lines md5 disposition ...
+        disposition = structure[9] if len(structure) > 9 else None
+        if not _is_attachment(disposition):
+            yield TextPart(leaf_section, subtype, str(structure[5] or '7BIT').upper(),
+                           _param(structure[2], 'CHARSET') or 'utf-8', int(structure[6] or 0))
+    elif body_type == 'MESSAGE' and subtype == 'RFC822' and len(structure) > 8:
+        # ... size envelope body lines md5 disposition: a forwarded message's own parts
+        disposition = structure[11] if len(structure) > 11 else None
+        if not _is_attachment(disposition):
+            yield from _walk(structure[8], leaf_section, f"{leaf_section}.1")
+
+def text_parts(bodystructure) -> List[TextPart]:
+    """The text/plain and text/html parts of a message that aren't attachments"""
+    if not isinstance(bodystructure, list):
+        return []
+    return list(_walk(bodystructure, '', '1'))
+
+def part_budgets(parts: List[TextPart], max_bytes: int) -> List[Tuple[TextPart, Optional[int]]]:
+    """Split max_bytes over the parts, smallest first; None means fetch the whole part"""
+    budgets = {}
+    remaining = max_bytes
+    ordered = sorted(parts, key=lambda part: part.size)
+    for index, part in enumerate(ordered):
+        share = remaining // (len(ordered) - index)
+        budgets[part.section] = None if part.size <= share else share
+        remaining -= min(part.size, share)
+    return [(part, budgets[part.section]) for part in parts]
+
+def fetch_items(budgets: List[Tuple[TextPart, Optional[int]]]) -> str:
+    return ' '.join(
+        f"BODY.PEEK[{part.section}]" + (f"<0.{limit}>" if limit is not None else '')
+        for part, limit in budgets
+    )
+
+def decode_part(raw: bytes, encoding: str, charset: str) -> str:
+    if encoding == 'BASE64':
+        compact = re.sub(rb'[^A-Za-z0-9+/=]', b'', raw)
+        # A partial fetch can end mid-quantum
+        compact = compact[:len(compact) - len(compact) % 4]
+        raw = base64.b64decode(compact)
+    elif encoding == 'QUOTED-PRINTABLE':
+        raw = quopri.decodestring(raw)
+    try:
+        return raw.decode(charset, errors='ignore')
+    except LookupError:
+        return raw.decode('utf-8', errors='ignore')
+
+def uid_set(uids: Iterable[int]) -> str:
+    """1,2,3,7,9,10 -> '1:3,7,9:10'"""
+    ranges = []
+    for uid in sorted(uids):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ','.join(str(start) if start == end else f"{start}:{end}" for start, end in ranges)
+
+def fetch_text_messages(imap, uids: List[int], max_message_bytes: int) -> List[FetchedMessage]:
+    """Fetch headers and text parts for these UIDs, in a few round-trips; ordered by UID"""
+    _, data = imap.uid('FETCH', uid_set(uids), f"(UID BODYSTRUCTURE {HEADER_FIELDS})")
+    structures = parse_fetch_response(data)
+
+    # Messages whose parts and budgets match share one FETCH
+    plans = {}
+    groups: Dict[str, List[int]] = {}
+    for uid, values in structures.items():
+        budgets = part_budgets(text_parts(values.get('BODYSTRUCTURE')), max_message_bytes)
+        plans[uid] = budgets
+        if budgets:
+            groups.setdefault(fetch_items(budgets), []).append(uid)
+
+    bodies: Dict[int, Dict[str, object]] = {}
+    for items, group in groups.items():
+        _, data = imap.uid('FETCH', uid_set(group), f"(UID {items})")
+        bodies.update(parse_fetch_response(data))
+
+    messages = []
+    for uid in sorted(structures):
+        values = structures[uid]
+        header = next((value for name, value in values.items() if name.startswith('BODY[HEADER')), None) or b''
+        parts = []
+        for part, _ in plans[uid]:
+            raw = bodies.get(uid, {}).get(f"BODY[{part.section}]")
+            if raw:
+                parts.append((part, raw))
+        messages.append(FetchedMessage(uid, _as_bytes(header), [(part, _as_bytes(raw)) for part, raw in parts]))
+    return messages
+
+def _as_bytes(value) -> bytes:
+    # Short values can come back as quoted strings instead of literals
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+def message_content(message: FetchedMessage) -> Tuple[Message, str, str]:
+    """(headers, text/plain content, text/html content) of a fetched message"""
+    content = {'PLAIN': [], 'HTML': []}
+    for part, raw in message.parts:
+        content[part.subtype].append(decode_part(raw, part.encoding, part.charset))
+    return email.message_from_bytes(message.header), '\n'.join(content['PLAIN']), '\n'.join(content['HTML'])
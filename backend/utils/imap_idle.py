@@ -0,0 +1,92 @@
+"""IMAP IDLE (RFC 2177) on an imaplib connection
+
+imaplib (before Python 3.14) has no IDLE command, so wait_for_new_mail()
+speaks it over the connection's socket itself. This is the only place
+that goes around imaplib, and it does so in two ways:
+
+- It writes and reads imap.socket() directly instead of going through
+  imap.file, imaplib's buffered reader, which would hide lines that
+  arrived in the same packet from select(). Nothing may be waiting in
+  that buffer when IDLE starts, which holds between commands on a
+  selected mailbox.
+- It tags the command itself (IDLE1, IDLE2...) rather than with
+  imaplib's private _new_tag(), and reads the tagged reply itself, so
+  imaplib's tagged_commands and untagged_responses never see it.
+
+Untagged responses the server sends during IDLE (EXISTS, EXPUNGE, FETCH)
+are therefore not recorded anywhere; the only thing reported back is
+whether any of them announced new mail. Callers must rescan the mailbox
+(UID SEARCH UID <last+1>:*) after every call, whatever it returns.
+"""
+import imaplib
+import itertools
+import select
+import time
+
+# Servers drop IDLE connections after 30 minutes; never wait longer than this
+MAX_IDLE_SECONDS = 29 * 60
+
+# Seconds to wait for the continuation after IDLE and the tagged reply after DONE
+RESPONSE_TIMEOUT = 60
+
+_tags = itertools.count(1)
+
+def supports_idle(imap: imaplib.IMAP4) -> bool:
+    """Whether the server advertises the IDLE extension"""
+    return 'IDLE' in imap.capabilities
+
+def wait_for_new_mail(imap: imaplib.IMAP4, timeout: float) -> bool:
+    """IDLE on the selected mailbox until the server announces new mail or timeout passes
+
+    Returns True if new mail was announced, including in the lines between
+    DONE and the tagged reply. Ends the IDLE with DONE either way, so the
+    connection can be used for normal commands afterwards.
+    """
+    sock = imap.socket()
+    buffer = b''
+
+    def read_line(deadline):
+        nonlocal buffer
+        while b'\r\n' not in buffer:
+            remaining = deadline - time.monotonic()
+            # TLS may already hold decrypted bytes that select() can't see
+            pending = getattr(sock, 'pending', lambda: 0)()
+            if not pending and (remaining <= 0 or not select.select([sock], [], [], remaining)[0]):
+                return None
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            buffer += chunk
+        line, buffer = buffer.split(b'\r\n', 1)
+        return line
+
+    def check(line):
+        if line.startswith(b'* BYE'):
+            raise imaplib.IMAP4.abort(line.decode(errors='ignore'))
+        # "* 12 EXISTS" / "* 1 RECENT"; EXPUNGE and FETCH flag updates don't matter here
+        return line.startswith(b'* ') and line.endswith((b'EXISTS', b'RECENT'))
+
+    tag = b'IDLE%d' % next(_tags)
+    sock.sendall(tag + b' IDLE\r\n')
+    response = read_line(time.monotonic() + RESPONSE_TIMEOUT)
+    if response is None or not response.startswith(b'+'):
+        raise imaplib.IMAP4.error(f"IDLE rejected: {response!r}")
+
+    deadline = time.monotonic() + min(timeout, MAX_IDLE_SECONDS)
+    new_mail = False
+    while not new_mail:
+        line = read_line(deadline)
+        if line is None:
+            break
+        new_mail = check(line)
+
+    sock.sendall(b'DONE\r\n')
+    while True:
+        line = read_line(time.monotonic() + RESPONSE_TIMEOUT)
+        if line is None:
+            raise imaplib.IMAP4.abort("no response to DONE")
+        if line.startswith(tag + b' '):
+            if not line.startswith(tag + b' OK'):
+                raise imaplib.IMAP4.error(line.decode(errors='ignore'))
+            return new_mail
+        new_mail = check(line) or new_mail
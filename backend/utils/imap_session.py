@@ -0,0 +1,193 @@
+"""Long-lived IMAP connection for the email worker
+
+ImapSession keeps one authenticated connection (with the mailbox selected)
+across check cycles instead of logging in every time. A connection that
+has sat unused for a while is checked with NOOP before it's handed out;
+one that fails is dropped and reopened. Failures back off exponentially
+with full jitter until the caller reports a clean cycle with healthy().
+metrics() reports the connection state and reconnect counts, and
+write_metrics_file() exports them for every session in the Prometheus text
+format (for node_exporter's textfile collector). stop() may be called from
+another thread to end a blocking IDLE or backoff wait.
+"""
+import imaplib
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the connection itself is gone (ssl.SSLError is an OSError)
+CONNECTION_ERRORS = (imaplib.IMAP4.abort, OSError, EOFError)
+
+class ImapSession:
+    def __init__(self, connect: Callable[[], imaplib.IMAP4], mailbox: str = '"INBOX"',
+                 health_check_seconds: float = 60, backoff_base: float = 1, backoff_max: float = 300):
+        self._connect = connect
+        self.mailbox = mailbox
+        self.health_check_seconds = health_check_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._imap: Optional[imaplib.IMAP4] = None
+        self._last_used = 0.0
+        self._retry_at = 0.0
+        self.state = 'disconnected'  # disconnected, connected or backoff
+        self.connects = 0
+        self.reconnects = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.health_check_failures = 0
+        self.connected_since: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._stopped = threading.Event()
+
+    def connection(self) -> imaplib.IMAP4:
+        """A connection that just passed a health check or was just opened; blocks while backing off"""
+        if self._stopped.is_set():
+            raise imaplib.IMAP4.abort("IMAP session stopped")
+        if self._imap is not None and time.monotonic() - self._last_used >= self.health_check_seconds:
+            try:
+                self._imap.noop()
+            except CONNECTION_ERRORS + (imaplib.IMAP4.error,) as e:
+                self.health_check_failures += 1
+                self.invalidate(e)
+        while self._imap is None:
+            delay = self._retry_at - time.monotonic()
+            if delay > 0:
+                logger.warning(f"IMAP reconnect in {delay:.1f}s (attempt {self.consecutive_failures + 1})")
+                if self._stopped.wait(delay):
+                    raise imaplib.IMAP4.abort("IMAP session stopped")
+            self._open()
+        self._last_used = time.monotonic()
+        return self._imap
+
+    def _open(self):
+        imap = None
+        try:
+            imap = self._connect()
+            typ, data = imap.select(self.mailbox)
+            if typ != 'OK':
+                raise imaplib.IMAP4.error(f"SELECT {self.mailbox} failed: {data}")
+        except CONNECTION_ERRORS + (imaplib.IMAP4.error,) as e:
+            logger.error(f"IMAP connect failed: {e}")
+            if imap is not None:
+                imap.shutdown()
+            self._record_failure(e)
+            return
+        if self.connects:
+            self.reconnects += 1
+        self.connects += 1
+        self.state = 'connected'
+        self.connected_since = datetime.utcnow()
+        self._imap = imap
+
+    def backoff_delay(self, failures: int) -> float:
+        """Full jitter: uniform between 0 and base * 2^(failures-1), capped at backoff_max"""
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+        return random.uniform(0, ceiling)
+
+    def _record_failure(self, error: Exception):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error)
+        self.state = 'backoff'
+        self._retry_at = time.monotonic() + self.backoff_delay(self.consecutive_failures)
+
+    def healthy(self):
+        """The last cycle completed; the next failure starts backing off from the beginning"""
+        self.consecutive_failures = 0
+
+    def invalidate(self, error: Exception = None):
+        """Drop the current connection; the next connection() call opens a new one
+
+        With an error, it counts as a failure and the reconnect backs off.
+        """
+        if self._imap is not None:
+            try:
+                self._imap.shutdown()
+            except Exception:
+                pass
+        self._imap = None
+        self.connected_since = None
+        self.state = 'disconnected'
+        if error is not None:
+            logger.warning(f"IMAP connection dropped: {error}")
+            self._record_failure(error)
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def sleep(self, seconds: float):
+        """time.sleep that stop() cuts short"""
+        self._stopped.wait(seconds)
+
+    def stop(self):
+        """Make the thread using this session give up: a blocking read fails and connection() raises"""
+        self._stopped.set()
+        imap = self._imap
+        if imap is not None:
+            try:
+                imap.socket().shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def close(self):
+        if self._imap is not None:
+            try:
+                self._imap.logout()
+            except Exception:
+                pass
+        self._imap = None
+        self.state = 'disconnected'
+
+    def metrics(self) -> Dict:
+        return {
+            'state': self.state,
+            'connected_since': self.connected_since.isoformat() if self.connected_since else None,
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'health_check_failures': self.health_check_failures,
+            'last_error': self.last_error,
+        }
+
+# (metric name, type, help, ImapSession.metrics() key)
+PROMETHEUS_METRICS = (
+    ('imap_session_connects_total', 'counter', 'Connections opened', 'connects'),
+    ('imap_session_reconnects_total', 'counter', 'Connections opened after the first', 'reconnects'),
+    ('imap_session_failures_total', 'counter', 'Failed connects and dropped connections', 'failures'),
+    ('imap_session_health_check_failures_total', 'counter', 'NOOP health checks that failed', 'health_check_failures'),
+    ('imap_session_consecutive_failures', 'gauge', 'Failures since the last clean cycle', 'consecutive_failures'),
+)
+
+def prometheus_metrics(sessions: Dict[str, ImapSession]) -> str:
+    """Metrics for each session, labeled by mailbox name, in the Prometheus text format"""
+    metrics = {name: session.metrics() for name, session in sessions.items()}
+
+    def label(name):
+        return name.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    lines = []
+    for metric, kind, help_text, key in PROMETHEUS_METRICS:
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+        lines += [f'{metric}{{mailbox="{label(name)}"}} {values[key]}' for name, values in metrics.items()]
+    lines += ['# HELP imap_session_connected Whether the session has a connection open',
+              '# TYPE imap_session_connected gauge']
+    lines += [f'imap_session_connected{{mailbox="{label(name)}"}} {int(values["state"] == "connected")}'
+              for name, values in metrics.items()]
+    return '\n'.join(lines) + '\n'
+
+def write_metrics_file(path: str, sessions: Dict[str, ImapSession]):
+    """Replace the file at path with prometheus_metrics(), atomically so a scrape never sees half of it"""
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(prometheus_metrics(sessions))
+    os.replace(temp_path, path)
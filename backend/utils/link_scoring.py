@@ -0,0 +1,250 @@
+"""Scoring the links in an email to pick the one it is about
+
+Every unique link gets a score from weighted signals and the highest wins:
+
+- where it came from: an <a href>, the text/plain part, or a bare URL
+  found elsewhere in the HTML (image sources, comments, attributes)
+- its anchor text ("Read more" up, "View in browser" down)
+- its position: earlier is better, and the last links are usually footer
+- the reputation of its domain (parent domains count: x.twitter.com)
+- junk: app stores, images, pixels, unsubscribe and share links, all
+  matched by one compiled alternation instead of a regex per pattern
+
+Tracking redirects that carry their destination in the query string
+(?url=, ?q=, ?redirect=...) are unwrapped, and the destination is what's
+scored and returned. If every link is junk the first one is returned, as
+before.
+
+The rules are DEFAULT_RULES, optionally overridden by the JSON file at
+settings.link_rules_file: dict values are merged key by key, anything
+else (lists, numbers) replaces the default. Patterns are matched against
+lowercased URLs and anchor text, so write them in lowercase: that is
+several times faster than re.IGNORECASE over a long alternation.
+"""
+import json
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES: Dict = {
+    # Regexes; any match makes a link junk
+    'junk_patterns': [
+        r'apps\.apple\.com',
+        r'play\.google\.com',
+        r'onelink\.me',
+        r'app\.link',
+        r'/download',
+        r'cdnjs\.cloudflare\.com',
+        r'ea\.twimg\.com',
+        r'pbs\.twimg\.com/profile',
+        r'\.(png|jpg|jpeg|gif|svg|ico|css|js|woff2?)(\?|$)',
+        r'/pixel',
+        r'/track/open',
+        r'google-analytics\.com',
+        r'doubleclick\.net',
+        r'unsubscribe',
+        r'/(preferences|manage-subscription|email-settings)',
+        r'list-manage\.com/(profile|unsubscribe|vcard)',
+        r'twitter\.com/intent/',
+        r'x\.com/intent/',
+        r'facebook\.com/sharer',
+        r'linkedin\.com/share',
+        r'w3\.org/',
+        r'schemas\.microsoft\.com',
+    ],
+    # Query parameters a tracking redirect keeps its destination in
+    'redirect_params': ['url', 'u', 'q', 'redirect', 'redirect_url', 'redirect_to', 'target',
+                        'dest', 'destination', 'link', 'r', 'to', 'goto'],
+    # Hosts and paths of click trackers whose destination can't be unwrapped
+    'tracking_patterns': [
+        r'//(click|clicks|links?|trk|track|email|mail|e|go)\.',
+        r'\.ct\.sendgrid\.net',
+        r'list-manage\.com/track/click',
+        r'/ls/click',
+        r'/redirect/',
+        r'/c/[A-Za-z0-9_-]{20,}',
+    ],
+    # Added to links on these domains or their subdomains
+    'domain_weights': {
+        'twitter.com': -3,
+        'x.com': -3,
+        'facebook.com': -3,
+        'instagram.com': -3,
+        'linkedin.com': -2,
+        'tiktok.com': -3,
+        'youtube.com': -1,
+        'mailchi.mp': -3,
+        'substack.com': -1,
+        'medium.com': 1,
+        'github.com': 1,
+    },
+    # Anchor text regexes and what a match adds. They're
+    # tried in this order at each position, so specific phrases go first
+    'anchor_weights': {
+        r'\b(view|read) (this )?(email |it |newsletter )?(in (your |a )?browser|online|as a web ?page)\b': -6,
+        r'\bweb version\b': -6,
+        r'\b(download|get) (the|our) app\b': -4,
+        r'\b(privacy|terms|contact us|help center|support|manage)\b': -4,
+        r'\b(sponsor(ed)?|advertis\w*|presented by|partner)\b': -3,
+        r'\b(follow|share|tweet|like) (us|on|this)\b': -3,
+        r'\b(read (more|the|this|on|full)|continue reading|keep reading|full (story|article|post)|learn more)\b': 3,
+        r'\b(watch|listen|view the (post|article|story|video))\b': 2,
+    },
+    'weights': {
+        'href': 2,         # an <a href>
+        'text': 1,         # a URL in the text/plain part
+        'bare': -2,        # any other URL in the HTML
+        'tracking': -1,    # a click tracker that couldn't be unwrapped
+        'unwrapped': 1,    # a tracking redirect whose destination was recovered
+        'position': 3,     # scaled from this (first link) down to 0 (last link)
+        'footer': -3,      # among the last footer_fraction of the links
+        'no_path': -2,     # a bare homepage like https://example.com/
+        'anchor_text': 1,  # any non-empty anchor text
+        'junk': -100,
+    },
+    'footer_fraction': 0.2,
+    'footer_min_links': 5,  # Shorter emails don't have a footer to speak of
+}
+
+MAX_UNWRAP_DEPTH = 3
+
+def _merge(defaults: Dict, overrides: Dict) -> Dict:
+    rules = dict(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(rules.get(key), dict):
+            rules[key] = {**rules[key], **value}
+        else:
+            rules[key] = value
+    return rules
+
+def load_rules(path: str = '') -> Dict:
+    """DEFAULT_RULES with the JSON file at path (if any) merged over them"""
+    if not path:
+        return DEFAULT_RULES
+    with open(path) as f:
+        return _merge(DEFAULT_RULES, json.load(f))
+
+def _alternation(patterns: Iterable[str]) -> Optional[re.Pattern]:
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+class LinkScorer:
+    """Rules compiled once; pick() takes links with url, source and anchor_text (see email_parsing.Link)"""
+    def __init__(self, rules: Dict = None):
+        rules = rules or DEFAULT_RULES
+        self.weights = {**DEFAULT_RULES['weights'], **rules.get('weights', {})}
+        self.junk = _alternation(rules.get('junk_patterns', []))
+        self.tracking = _alternation(rules.get('tracking_patterns', []))
+        self.redirect_params = {param.lower() for param in rules.get('redirect_params', [])}
+        self.domain_weights = {domain.lower(): weight for domain, weight in rules.get('domain_weights', {}).items()}
+        self.footer_fraction = rules.get('footer_fraction', 0.2)
+        self.footer_min_links = rules.get('footer_min_links', 5)
+
+        # All anchor patterns in one alternation; the named group that matched says which
+        anchor_weights = list(rules.get('anchor_weights', {}).items())
+        self.anchor_group_weights = {f'a{index}': weight for index, (_, weight) in enumerate(anchor_weights)}
+        self.anchor = re.compile(
+            '|'.join(f'(?P<a{index}>{pattern})' for index, (pattern, _) in enumerate(anchor_weights))
+        ) if anchor_weights else None
+
+    def unwrap(self, url: str) -> str:
+        """The destination of a tracking redirect that carries it in its query string, else url"""
+        for _ in range(MAX_UNWRAP_DEPTH):
+            query = urlsplit(url).query
+            # Cheap test first: the destination is in there as http... or http%3A...
+            if 'http' not in query:
+                break
+            target = next(
+                (value for name, value in parse_qsl(query) if name.lower() in self.redirect_params
+                 and value.startswith(('http://', 'https://'))),
+                None
+            )
+            if target is None:
+                break
+            url = target
+        return url
+
+    def domain_weight(self, host: str) -> float:
+        labels = host.split('.')
+        for start in range(len(labels) - 1):
+            weight = self.domain_weights.get('.'.join(labels[start:]))
+            if weight is not None:
+                return weight
+        return 0
+
+    def anchor_weight(self, anchor_text: str) -> float:
+        if not anchor_text:
+            return 0
+        matched = {match.lastgroup for match in self.anchor.finditer(anchor_text.lower())} if self.anchor else set()
+        return self.weights['anchor_text'] + sum(self.anchor_group_weights[group] for group in matched)
+
+    def score(self, link, index: int, total: int) -> Tuple[float, str, bool]:
+        """(score, URL to return, is junk) for the link at index of total"""
+        weights = self.weights
+        url = self.unwrap(link.url)
+        lowered = url.lower()
+        if self.junk is not None and self.junk.search(lowered) is not None:
+            # Junk only wins when everything is junk, and then pick() takes the first link anyway
+            return weights['junk'], url, True
+
+        score = weights.get(link.source, 0)
+        if url != link.url:
+            score += weights['unwrapped']
+        elif self.tracking is not None and self.tracking.search(lowered):
+            score += weights['tracking']
+
+        parts = urlsplit(url)
+        score += self.domain_weight((parts.hostname or '').lower())
+        if parts.path in ('', '/') and not parts.query:
+            score += weights['no_path']
+
+        score += self.anchor_weight(link.anchor_text)
+
+        relative = index / (total - 1) if total > 1 else 0
+        score += weights['position'] * (1 - relative)
+        if total >= self.footer_min_links and relative >= 1 - self.footer_fraction:
+            score += weights['footer']
+        return score, url, False
+
+    def pick(self, links: List) -> Optional[str]:
+        """The best-scoring link's URL; the first link's if they're all junk; None without links"""
+        if not links:
+            return None
+        best_score, best_url, best_junk = None, None, True
+        for index, link in enumerate(links):
+            score, url, junk = self.score(link, index, len(links))
+            if best_score is None or score > best_score:
+                best_score, best_url, best_junk = score, url, junk
+        return links[0].url if best_junk else best_url
+
+_scorer: Optional[LinkScorer] = None
+
+def default_scorer() -> LinkScorer:
+    """A LinkScorer for the configured rules, built on first use"""
+    global _scorer
+    if _scorer is None:
+        try:
+            _scorer = LinkScorer(load_rules(settings.link_rules_file))
+        except (OSError, ValueError) as e:
+            logger.error(f"Couldn't load link rules from {settings.link_rules_file}, using defaults: {e}")
+            _scorer = LinkScorer(DEFAULT_RULES)
+    return _scorer
+
+def pick_primary_link(links: List) -> Optional[str]:
+    return default_scorer().pick(links)
@@ -0,0 +1,57 @@
+"""Streaming messages out of local mbox files and Maildir directories
+
+Used by `python worker.py ingest` to backfill a user's old mail without
+going through IMAP. Messages are yielded one at a time as raw bytes
+(picklable, so they can go straight to the parse pool), with their
+1-based position in the archive.
+
+mbox files are read line by line and split on "From " separator lines,
+instead of through mailbox.mbox, which first scans the whole file to
+build a table of contents and then seeks back to each message.
+"""
+import mailbox
+import os
+from typing import Iterator, Tuple
+
+def iter_mbox(path: str) -> Iterator[Tuple[int, bytes]]:
+    """(number, raw message) for each message in an mbox file, in file order"""
+    number = 0
+    lines = []
+    previous_blank = True
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'From ') and previous_blank:
+                if lines:
+                    number += 1
+                    yield number, _mbox_message(lines)
+                lines = []
+            else:
+                lines.append(line)
+            previous_blank = line in (b'\n', b'\r\n')
+    if lines:
+        number += 1
+        yield number, _mbox_message(lines)
+
+def _mbox_message(lines) -> bytes:
+    # The blank line before the next separator belongs to the mbox format
+    if lines and lines[-1] in (b'\n', b'\r\n'):
+        lines = lines[:-1]
+    # mboxrd: ">From " (and ">>From ") in bodies were quoted on the way in
+    return b''.join(line[1:] if line.startswith(b'>') and line.lstrip(b'>').startswith(b'From ') else line
+                    for line in lines)
+
+def iter_maildir(path: str) -> Iterator[Tuple[int, bytes]]:
+    """(number, raw message) for each message in a Maildir's cur and new directories"""
+    maildir = mailbox.Maildir(path, factory=None, create=False)
+    for number, key in enumerate(maildir.iterkeys(), 1):
+        try:
+            yield number, maildir.get_bytes(key)
+        except FileNotFoundError:
+            continue  # Moved or deleted by a mail client since the directory was listed
+
+def iter_archive(path: str, kind: str) -> Iterator[Tuple[int, bytes]]:
+    if kind == 'maildir':
+        if not os.path.isdir(os.path.join(path, 'cur')):
+            raise ValueError(f"{path} isn't a Maildir (no cur/ directory)")
+        return iter_maildir(path)
+    return iter_mbox(path)
@@ -0,0 +1,43 @@
+"""UID checkpoints for incremental IMAP sync
+
+For each mailbox the worker stores the UIDVALIDITY it last saw and the
+highest UID it has processed, then asks the server only for UIDs above
+that, so a cycle costs O(new messages) and doesn't depend on the \\Seen
+flag. UIDs are only meaningful within one UIDVALIDITY; when the server
+reports a different one the worker starts a new checkpoint.
+"""
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Engine
+
+from models import MailboxSyncState
+
+def ensure_sync_state(engine: Engine):
+    MailboxSyncState.__table__.create(engine, checkfirst=True)
+
+def load_checkpoint(engine: Engine, mailbox: str) -> Optional[MailboxSyncState]:
+    """The stored checkpoint row (uid_validity, last_uid, updated_at), or None before the first sync"""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(MailboxSyncState).where(MailboxSyncState.mailbox == mailbox)
+        ).first()
+
+def save_checkpoint(engine: Engine, mailbox: str, uid_validity: int, last_uid: int):
+    values = {'uid_validity': uid_validity, 'last_uid': last_uid, 'updated_at': datetime.utcnow()}
+    with engine.begin() as conn:
+        updated = conn.execute(
+            update(MailboxSyncState).where(MailboxSyncState.mailbox == mailbox).values(**values)
+        )
+        if updated.rowcount == 0:
+            conn.execute(insert(MailboxSyncState).values(mailbox=mailbox, **values))
@@ -0,0 +1,180 @@
+"""Lease-based sharding of mailboxes between worker processes
+
+Every worker process heartbeats a mail_workers row and holds leases on
+its share of the enabled mailboxes: ceil(mailboxes / live workers). A
+lease is a (lease_owner, lease_expires_at) pair on the mailboxes row,
+taken with a compare-and-set UPDATE so two workers can't both win it, and
+renewed on every rebalance. A worker holding more than its share (because
+another one started) gives up the surplus; one that stops cleanly releases
+everything. A crashed worker stops renewing, its leases expire after
+settings.mailbox_lease_seconds, and the others pick its mailboxes up.
+
+Leases compare timestamps written by different hosts, so the TTL should be
+comfortably longer than both the rebalance interval and any clock skew.
+"""
+import math
+import os
+import socket
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.engine import Engine
+
+from models import Mailbox, MailWorker
+
+# Name of the mailbox seeded from GMAIL_USER
+DEFAULT_MAILBOX = 'default'
+
+class MailboxConfig(NamedTuple):
+    """What a worker needs to watch one mailbox; a changed row means a changed config"""
+    id: int
+    name: str
+    host: str
+    port: int
+    username: str
+    password: str
+    folder: str
+
+    @property
+    def checkpoint_key(self) -> str:
+        """Its UID checkpoint in mailbox_sync_state (utils/mail_sync.py)
+
+        UIDs only mean something on one server, so the key names the host and
+        the mailbox row. The seeded 'default' mailbox keeps the single-inbox
+        worker's "<username>/<folder>", so its checkpoint carries over.
+        """
+        if self.name == DEFAULT_MAILBOX:
+            return f"{self.username}/{self.folder}"
+        return f"{self.id}:{self.username}@{self.host}:{self.port}/{self.folder}"
+
+def ensure_mailbox_tables(engine: Engine):
+    Mailbox.__table__.create(engine, checkfirst=True)
+    MailWorker.__table__.create(engine, checkfirst=True)
+
+def seed_default_mailbox(engine: Engine, username: str, password_env: str) -> bool:
+    """Add the single env-configured inbox (GMAIL_USER) when no mailboxes exist yet
+
+    Only the name of the password's environment variable is stored.
+    """
+    if not username:
+        return False
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(Mailbox)).scalar():
+            return False
+        conn.execute(insert(Mailbox).values(
+            name=DEFAULT_MAILBOX, host='imap.gmail.com', port=993, username=username,
+            password_env=password_env, folder='INBOX', enabled=True, created_at=datetime.utcnow(),
+        ))
+    return True
+
+def mailbox_config(row) -> MailboxConfig:
+    password = os.getenv(row.password_env, '') if row.password_env else (row.password or '')
+    return MailboxConfig(row.id, row.name, row.host, row.port, row.username, password, row.folder)
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class LeaseManager:
+    def __init__(self, engine: Engine, worker_id: str = '', lease_seconds: int = 90):
+        self.engine = engine
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.renewed_at: Optional[datetime] = None
+
+    def rebalance(self) -> Tuple[List[MailboxConfig], List[int]]:
+        """Heartbeat, renew held leases and take free ones up to this worker's share
+
+        Returns (mailboxes to watch, surplus mailbox ids). Surplus leases are
+        still held: stop watching those, then release() them.
+        """
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=self.lease_seconds)
+        live_after = now - timedelta(seconds=self.lease_seconds)
+        with self.engine.begin() as conn:
+            beat = conn.execute(
+                update(MailWorker).where(MailWorker.worker_id == self.worker_id).values(heartbeat_at=now)
+            )
+            if beat.rowcount == 0:
+                conn.execute(insert(MailWorker).values(worker_id=self.worker_id, heartbeat_at=now))
+            # Workers that died long ago
+            conn.execute(delete(MailWorker).where(MailWorker.heartbeat_at < now - timedelta(days=1)))
+
+            # Renew what's still ours; leases on disabled mailboxes lapse
+            conn.execute(
+                update(Mailbox)
+                .where(Mailbox.lease_owner == self.worker_id, Mailbox.lease_expires_at >= now, Mailbox.enabled)
+                .values(lease_expires_at=expires)
+            )
+            conn.execute(
+                update(Mailbox)
+                .where(Mailbox.lease_owner == self.worker_id, Mailbox.enabled.is_(False))
+                .values(lease_owner=None, lease_expires_at=None)
+            )
+            live_workers = conn.execute(
+                select(func.count()).select_from(MailWorker).where(MailWorker.heartbeat_at >= live_after)
+            ).scalar() or 1
+            mailboxes = conn.execute(select(Mailbox).where(Mailbox.enabled).order_by(Mailbox.id)).all()
+        self.renewed_at = now
+
+        share = math.ceil(len(mailboxes) / live_workers)
+        held = [row for row in mailboxes if row.lease_owner == self.worker_id and row.lease_expires_at >= now]
+        surplus = [row.id for row in held[share:]]
+        held = held[:share]
+
+        for row in mailboxes:
+            if len(held) >= share:
+                break
+            if row.lease_owner is not None and row.lease_expires_at is not None and row.lease_expires_at >= now:
+                continue
+            if self._acquire(row.id, now, expires):
+                held.append(row)
+        return [mailbox_config(row) for row in held], surplus
+
+    def _acquire(self, mailbox_id: int, now: datetime, expires: datetime) -> bool:
+        """Take a free or expired lease; False if another worker got there first"""
+        with self.engine.begin() as conn:
+            taken = conn.execute(
+                update(Mailbox)
+                .where(
+                    Mailbox.id == mailbox_id,
+                    or_(Mailbox.lease_owner.is_(None), Mailbox.lease_expires_at.is_(None),
+                        Mailbox.lease_expires_at < now),
+                )
+                .values(lease_owner=self.worker_id, lease_expires_at=expires)
+            )
+        return taken.rowcount == 1
+
+    def lease_lost(self) -> bool:
+        """Leases couldn't be renewed for a full TTL, so others may be watching our mailboxes"""
+        return self.renewed_at is None or \
+            datetime.utcnow() - self.renewed_at > timedelta(seconds=self.lease_seconds)
+
+    def release(self, mailbox_ids: List[int]):
+        if not mailbox_ids:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(Mailbox)
+                .where(Mailbox.id.in_(mailbox_ids), Mailbox.lease_owner == self.worker_id)
+                .values(lease_owner=None, lease_expires_at=None)
+            )
+
+    def release_all(self):
+        """On shutdown: free every lease right away instead of letting them expire"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(Mailbox).where(Mailbox.lease_owner == self.worker_id)
+                .values(lease_owner=None, lease_expires_at=None)
+            )
+            conn.execute(delete(MailWorker).where(MailWorker.worker_id == self.worker_id))
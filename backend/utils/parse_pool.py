@@ -0,0 +1,60 @@
+"""Process pool for parsing emails
+
+MIME decoding, link extraction (utils/email_parsing.py's streaming HTML
+parser and URL regexes) and link scoring are CPU-bound, so after a
+backlog they, not IMAP, limit how fast the worker ingests. ParsePool
+runs a picklable function over a stream of items in worker processes. At
+most max_in_flight items are submitted ahead of the one being collected,
+so memory stays bounded for any input size, and results come back in
+input order. With one worker it runs inline, without processes. Several
+threads (one per mailbox) can share a pool.
+"""
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, Optional
+
+class ParsePool:
+    def __init__(self, workers: int = 0, max_in_flight: int = 0):
+        """workers=0 means one per CPU; max_in_flight=0 means four per worker"""
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.workers * 4
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def map(self, fn: Callable, items: Iterable) -> Iterator:
+        """fn(item) for each item, in order"""
+        if self.workers <= 1:
+            yield from map(fn, items)
+            return
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            executor = self._executor
+        pending = deque()
+        try:
+            for item in items:
+                if len(pending) >= self.max_in_flight:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(fn, item))
+            while pending:
+                yield pending.popleft().result()
+        except BrokenProcessPool:
+            # A worker process died; start a fresh pool next time
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        finally:
+            # Consumer stopped early or a result raised: don't leave work queued
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
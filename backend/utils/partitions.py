@@ -0,0 +1,101 @@
+"""Monthly range partitions of feed_items on PostgreSQL
+
+partition_feed_items.py converts the table once; after that the worker keeps
+partitions created a few months ahead and drops old ones that the cold tier
+(utils/cold_tier.py) has emptied. Rows outside every partition land in
+feed_items_default. Everything here is a no-op on SQLite or on an
+unpartitioned table.
+"""
+import logging
+import re
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from typing import List
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r'^feed_items_p(\d{4})(\d{2})$')
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"feed_items_p{month:%Y%m}"
+
+def create_partition_sql(month: date) -> str:
+    return (f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF feed_items "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')")
+
+def is_partitioned(engine: Engine) -> bool:
+    if engine.dialect.name != 'postgresql':
+        return False
+    with engine.connect() as conn:
+        return conn.execute(text('''
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid
+                WHERE c.relname = 'feed_items'
+            )
+        ''')).scalar()
+
+def monthly_partitions(engine: Engine) -> List[str]:
+    with engine.connect() as conn:
+        names = conn.execute(text('''
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'feed_items'
+        ''')).scalars().all()
+    return sorted(name for name in names if PARTITION_NAME.match(name))
+
+def ensure_feed_partitions(engine: Engine, months_ahead: int = None) -> int:
+    """Create this month's and the next months_ahead partitions; returns how many were created"""
+    months_ahead = settings.feed_partition_months_ahead if months_ahead is None else months_ahead
+    if not is_partitioned(engine):
+        return 0
+    existing = set(monthly_partitions(engine))
+    created = 0
+    this_month = month_start(datetime.utcnow())
+    for offset in range(months_ahead + 1):
+        month = add_months(this_month, offset)
+        if partition_name(month) in existing:
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(create_partition_sql(month)))
+            created += 1
+        except Exception as e:
+            # Fails if feed_items_default already holds rows for that month
+            logger.error(f"Could not create partition {partition_name(month)}: {e}")
+    return created
+
+def drop_empty_partitions(engine: Engine, before: datetime) -> List[str]:
+    """Drop monthly partitions that end on or before `before` and hold no rows"""
+    if not is_partitioned(engine):
+        return []
+    dropped = []
+    for name in monthly_partitions(engine):
+        year, month = (int(part) for part in PARTITION_NAME.match(name).groups())
+        if add_months(date(year, month, 1), 1) > before.date():
+            continue
+        with engine.begin() as conn:
+            if conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first() is None:
+                conn.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+    return dropped
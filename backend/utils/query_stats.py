@@ -0,0 +1,126 @@
+"""Per-request SQL instrumentation: query counts, timings, slow-query and N+1 logging
+
+With QUERY_BUDGET_STRICT=true a statement that would take a route over its
+budget is refused before it runs (QueryBudgetExceeded, a 500), so the
+request's transaction rolls back instead of committing and then reporting
+failure. Once the request has committed, or its response has started
+(statements run while streaming a body), going over is only logged.
+"""
+import sys
+from pathlib import Path
+
+# Add paths for imports
+current_dir = Path(__file__).parent
+backend_dir = current_dir.parent
+
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class QueryBudgetExceeded(Exception):
+    """Strict mode: the route tried to run more statements than its budget"""
+
+class QueryStats:
+    """SQL statements executed on behalf of one request"""
+
+    def __init__(self, keep_statements: bool = False):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements = Counter()
+        self.budget: Optional[int] = None
+        self.committed = False
+        self.finished = False  # The response has started
+        # (statement, parameters) in execution order, for tests that EXPLAIN them
+        self.executed: Optional[List[Tuple[str, Any]]] = [] if keep_statements else None
+
+    def record(self, statement: str, elapsed_ms: float, parameters=None):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] += 1
+        if self.executed is not None:
+            self.executed.append((statement, parameters))
+
+    def repeated(self, threshold: int):
+        """Statements run at least threshold times, the usual shape of an N+1"""
+        return [(statement, n) for statement, n in self.statements.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_ms:.1f};desc="{self.count} queries"'
+
+# A mutable object in the context var: sync routes and run_sync helpers run
+# in copies of the request's context, and their counts still land here
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def start_request(keep_statements: bool = False) -> QueryStats:
+    """Begin collecting for the current request"""
+    stats = QueryStats(keep_statements)
+    _current.set(stats)
+    return stats
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+def query_budget(limit: int):
+    """Route dependency declaring the most queries the route may run per request"""
+    async def declare_budget():
+        stats = _current.get()
+        if stats is not None:
+            stats.budget = limit
+    return declare_budget
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if (settings.query_budget_strict and stats is not None and stats.budget is not None
+            and stats.count >= stats.budget and not (stats.committed or stats.finished)):
+        raise QueryBudgetExceeded(f"Query budget of {stats.budget} exceeded by: {' '.join(statement.split())[:300]}")
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms, parameters)
+    if elapsed_ms >= settings.slow_query_ms:
+        logger.warning(f"Slow query ({elapsed_ms:.0f} ms): {' '.join(statement.split())[:500]}")
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    # (statements don't nest on a connection, so that's all there is)
+    if context.connection is not None:
+        context.connection.info.pop("query_started", None)
+
+def _on_commit(conn):
+    stats = _current.get()
+    if stats is not None:
+        stats.committed = True
+
+def install_query_instrumentation(*engines):
+    """Time every statement on the given (sync) engines"""
+    for engine in engines:
+        if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(engine, "handle_error", _handle_error)
+            event.listen(engine, "commit", _on_commit)
+
+def finish_request(stats: QueryStats, method: str, path: str) -> Optional[str]:
+    """Log N+1 suspects; returns a message when the route went over its query budget"""
+    stats.finished = True
+    for statement, n in stats.repeated(settings.query_repeat_warn):
+        logger.warning(f"Possible N+1 in {method} {path}: {n}x {' '.join(statement.split())[:300]}")
+    if stats.budget is not None and stats.count > stats.budget:
+        message = f"Query budget exceeded for {method} {path}: {stats.count} queries, budget {stats.budget}"
+        logger.warning(message)
+        return message
+    return None
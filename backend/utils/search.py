@@ -0,0 +1,325 @@
+"""Full-text search index over feed items
+
+SQLite uses an FTS5 table kept in sync by triggers on feed_items; PostgreSQL
+uses a GIN expression index over to_tsvector(...), which the database maintains
+on every insert/update. Either way the worker's inserts and notes edits are
+indexed incrementally without any application code on the write path.
+
+Items in the cold tier (utils/cold_tier.py) stay searchable: their text is
+only in a compressed payload there, so their index entries outlive the move.
+On SQLite the FTS5 row is kept when a feed_items row is deleted because it
+was frozen; on PostgreSQL the trigger that sees the freeze copies the row's
+tsvector into feed_items_cold_search. Thawing an item hands it back to the
+hot index, and deleting a cold item drops its entry. Items frozen before
+this was in place are indexed from their payloads on startup.
+"""
+import base64
+import json
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Float, Integer, LargeBinary, String, Text, bindparam, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from utils.cold_tier import cold_export_row, cold_feed_row
+
+logger = logging.getLogger(__name__)
+
+# Text columns that make up a feed item's searchable document
+SEARCH_COLUMNS = ['core_link', 'notes', 'preview_title', 'preview_description', 'preview_site_name']
+
+FTS_TABLE = 'feed_items_fts'
+PG_INDEX = 'ix_feed_items_search'
+PG_TS_CONFIG = 'english'
+# tsvectors of cold-tier items (PostgreSQL)
+PG_COLD_TABLE = 'feed_items_cold_search'
+
+# Characters that split a URL into words in the PostgreSQL document
+URL_SEPARATORS = '/.:?=&-_#'
+
+# Set by ensure_search_index(); columns that actually exist on feed_items
+# (preview_* only exist on tables created by the worker or migrate_db.py)
+_available_columns: List[str] = []
+_index_ready = False
+
+class SearchUnavailable(Exception):
+    """Raised when the search index could not be created on this database"""
+
+def _is_sqlite(bind) -> bool:
+    return bind.dialect.name == 'sqlite'
+
+def _pg_document(columns: List[str], row: str = '') -> str:
+    """SQL expression for the PostgreSQL document (must match the index exactly)
+
+    row qualifies the columns, e.g. 'OLD.' inside a trigger.
+    """
+    parts = []
+    for column in columns:
+        if column == 'core_link':
+            # Split URLs into words so "nytimes" matches https://www.nytimes.com/...
+            parts.append(f"translate(coalesce({row}core_link, ''), '{URL_SEPARATORS}', "
+                         f"'{' ' * len(URL_SEPARATORS)}')")
+        else:
+            parts.append(f"coalesce({row}{column}, '')")
+    return f"to_tsvector('{PG_TS_CONFIG}', " + " || ' ' || ".join(parts) + ")"
+
+def _document_text(values: Dict, columns: List[str]) -> str:
+    """The text _pg_document() builds, from a dict of column values (for backfills)"""
+    parts = []
+    for column in columns:
+        value = values.get(column) or ''
+        if column == 'core_link':
+            value = value.translate(str.maketrans(URL_SEPARATORS, ' ' * len(URL_SEPARATORS)))
+        parts.append(value)
+    return ' '.join(parts)
+
+def _sqlite_values(columns: List[str], prefix: str) -> str:
+    """NEW.x / OLD.x list for trigger bodies, NULL for columns the table lacks"""
+    return ', '.join(f'{prefix}.{c}' if c in columns else 'NULL' for c in SEARCH_COLUMNS)
+
+def _missing_cold_items(conn, indexed_ids: str) -> List[Dict]:
+    """Cold items whose ids aren't in the indexed_ids subquery, as dicts of their searchable columns"""
+    rows = conn.execute(text(
+        f"SELECT id, sender_email, received_date, archived_at, payload FROM feed_items_cold "
+        f"WHERE id NOT IN ({indexed_ids})"
+    )).all()
+    return [cold_export_row(row, ['id'] + SEARCH_COLUMNS) for row in rows]
+
+def ensure_search_index(engine: Engine):
+    """Create the search index (and backfill it) if it doesn't exist yet"""
+    global _available_columns, _index_ready
+
+    inspector = inspect(engine)
+    if not inspector.has_table('feed_items'):
+        return
+    existing = {col['name'] for col in inspector.get_columns('feed_items')}
+    _available_columns = [c for c in SEARCH_COLUMNS if c in existing]
+    has_cold_tier = inspector.has_table('feed_items_cold')
+
+    with engine.begin() as conn:
+        if _is_sqlite(engine):
+            created = not conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {"name": FTS_TABLE}).first()
+            try:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                    f"USING fts5({', '.join(SEARCH_COLUMNS)}, tokenize = 'unicode61')"
+                ))
+            except Exception as e:
+                logger.warning(f"FTS5 not available, search disabled: {e}")
+                return
+
+            column_list = ', '.join(SEARCH_COLUMNS)
+            watched = ', '.join(_available_columns)
+            # Triggers from before cold items stayed indexed dropped their rows on freeze
+            delete_trigger = conn.execute(text(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = :name"
+            ), {"name": f"{FTS_TABLE}_ad"}).scalar() or ''
+            reindex_cold = has_cold_tier and (created or 'feed_items_cold' not in delete_trigger)
+
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai"))
+            conn.execute(text(f'''
+                CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON feed_items BEGIN
+                    -- A thawed item still has its row from the cold tier
+                    DELETE FROM {FTS_TABLE} WHERE rowid = NEW.id;
+                    INSERT INTO {FTS_TABLE}(rowid, {column_list})
+                    VALUES (NEW.id, {_sqlite_values(_available_columns, 'NEW')});
+                END
+            '''))
+            if has_cold_tier:
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad"))
+                conn.execute(text(f'''
+                    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON feed_items
+                    WHEN NOT EXISTS (SELECT 1 FROM feed_items_cold WHERE id = OLD.id) BEGIN
+                        DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+                    END
+                '''))
+                conn.execute(text(f'''
+                    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_cold_ad AFTER DELETE ON feed_items_cold
+                    WHEN NOT EXISTS (SELECT 1 FROM feed_items WHERE id = OLD.id) BEGIN
+                        DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+                    END
+                '''))
+            else:
+                conn.execute(text(f'''
+                    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON feed_items BEGIN
+                        DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+                    END
+                '''))
+            conn.execute(text(f'''
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {watched} ON feed_items BEGIN
+                    DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+                    INSERT INTO {FTS_TABLE}(rowid, {column_list})
+                    VALUES (NEW.id, {_sqlite_values(_available_columns, 'NEW')});
+                END
+            '''))
+
+            if created:
+                select_list = ', '.join(c if c in _available_columns else 'NULL' for c in SEARCH_COLUMNS)
+                conn.execute(text(
+                    f"INSERT INTO {FTS_TABLE}(rowid, {column_list}) SELECT id, {select_list} FROM feed_items"
+                ))
+                logger.info("Search index created and backfilled (FTS5)")
+            if reindex_cold:
+                cold_items = _missing_cold_items(conn, f"SELECT rowid FROM {FTS_TABLE}")
+                if cold_items:
+                    conn.execute(text(
+                        f"INSERT INTO {FTS_TABLE}(rowid, {column_list}) "
+                        f"VALUES (:id, {', '.join(':' + c for c in SEARCH_COLUMNS)})"
+                    ), cold_items)
+                    logger.info(f"Indexed {len(cold_items)} cold-tier items for search")
+        else:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON feed_items "
+                f"USING GIN ({_pg_document(_available_columns)})"
+            ))
+            if has_cold_tier:
+                _ensure_pg_cold_index(conn)
+
+    _index_ready = True
+
+def _ensure_pg_cold_index(conn):
+    """feed_items_cold_search and the triggers that keep it in step with the tiers"""
+    created = conn.execute(text(f"SELECT to_regclass('{PG_COLD_TABLE}') IS NULL")).scalar()
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {PG_COLD_TABLE} (id integer PRIMARY KEY, document tsvector NOT NULL)"))
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{PG_COLD_TABLE}_document ON {PG_COLD_TABLE} USING GIN (document)"))
+    conn.execute(text(f'''
+        CREATE OR REPLACE FUNCTION index_cold_feed_item() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                IF EXISTS (SELECT 1 FROM feed_items_cold WHERE id = OLD.id) THEN
+                    -- Frozen: its text is about to be compressed, keep it searchable
+                    INSERT INTO {PG_COLD_TABLE}(id, document)
+                    VALUES (OLD.id, {_pg_document(_available_columns, 'OLD.')})
+                    ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document;
+                END IF;
+                RETURN OLD;
+            END IF;
+            DELETE FROM {PG_COLD_TABLE} WHERE id = NEW.id;  -- Thawed: back in the hot index
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    '''))
+    conn.execute(text(f'''
+        CREATE OR REPLACE FUNCTION unindex_cold_feed_item() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM {PG_COLD_TABLE} WHERE id = OLD.id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+    '''))
+    conn.execute(text("DROP TRIGGER IF EXISTS feed_items_cold_search_trg ON feed_items"))
+    conn.execute(text(
+        "CREATE TRIGGER feed_items_cold_search_trg AFTER INSERT OR DELETE ON feed_items "
+        "FOR EACH ROW EXECUTE PROCEDURE index_cold_feed_item()"
+    ))
+    conn.execute(text("DROP TRIGGER IF EXISTS feed_items_cold_search_trg ON feed_items_cold"))
+    conn.execute(text(
+        "CREATE TRIGGER feed_items_cold_search_trg AFTER DELETE ON feed_items_cold "
+        "FOR EACH ROW EXECUTE PROCEDURE unindex_cold_feed_item()"
+    ))
+
+    if created:
+        cold_items = _missing_cold_items(conn, f"SELECT id FROM {PG_COLD_TABLE}")
+        if cold_items:
+            conn.execute(text(
+                f"INSERT INTO {PG_COLD_TABLE}(id, document) VALUES (:id, to_tsvector('{PG_TS_CONFIG}', :document))"
+            ), [{"id": item["id"], "document": _document_text(item, _available_columns)} for item in cold_items])
+            logger.info(f"Indexed {len(cold_items)} cold-tier items for search")
+
+def _query_terms(q: str) -> List[str]:
+    """Split user input into plain word tokens (no query syntax is passed through)"""
+    return re.findall(r'\w+', q.lower())
+
+def encode_cursor(score: float, item_id: int) -> str:
+    """Opaque cursor for the position after (score, id)"""
+    raw = json.dumps([score, item_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Inverse of encode_cursor(); raises ValueError on malformed input"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(score), int(item_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def search_feed_items(
+    db: Session,
+    q: str,
+    sender_emails: List[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    archived: bool = False
+) -> Tuple[List[Tuple], Optional[str]]:
+    """Ranked search over the given senders' items, in both tiers
+
+    Like the feed, archived items are left out unless archived is True,
+    and then they're all that's searched. Returns (rows, next_cursor); rows
+    are (id, sender_email, core_link, received_date, processed_date, notes)
+    tuples, best match first. Lower score is better on both backends so the
+    cursor logic is shared.
+    """
+    if not _index_ready:
+        raise SearchUnavailable("Search index is not available")
+
+    terms = _query_terms(q)
+    if not terms or not sender_emails:
+        return [], None
+
+    params: Dict = {"emails": sender_emails, "limit": limit + 1}
+    after = ""
+    if cursor:
+        params["after_score"], params["after_id"] = decode_cursor(cursor)
+        after = "WHERE score > :after_score OR (score = :after_score AND id < :after_id)"
+    archived_filter = "IS NOT NULL" if archived else "IS NULL"
+
+    if _is_sqlite(db.get_bind()):
+        # Quote every term; the last one is a prefix match for search-as-you-type
+        params["q"] = ' '.join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+        # An index row belongs to a hot item or, failing that, a cold one
+        inner = f'''
+            SELECT {FTS_TABLE}.rowid AS id, coalesce(fi.sender_email, fc.sender_email) AS sender_email,
+                   fi.core_link, coalesce(fi.received_date, fc.received_date) AS received_date,
+                   fi.processed_date, fi.notes, fc.payload, bm25({FTS_TABLE}) AS score
+            FROM {FTS_TABLE}
+            LEFT JOIN feed_items fi ON fi.id = {FTS_TABLE}.rowid
+            LEFT JOIN feed_items_cold fc ON fc.id = {FTS_TABLE}.rowid AND fi.id IS NULL
+            WHERE {FTS_TABLE} MATCH :q AND coalesce(fi.sender_email, fc.sender_email) IN :emails
+              AND coalesce(fi.archived_at, fc.archived_at) {archived_filter}
+        '''
+    else:
+        params["q"] = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        document = _pg_document(_available_columns)
+        inner = f'''
+            SELECT id, sender_email, core_link, received_date, processed_date, notes,
+                   CAST(NULL AS bytea) AS payload, -ts_rank_cd({document}, query) AS score
+            FROM feed_items, to_tsquery('{PG_TS_CONFIG}', :q) query
+            WHERE {document} @@ query AND sender_email IN :emails AND archived_at {archived_filter}
+            UNION ALL
+            SELECT fc.id, fc.sender_email, CAST(NULL AS text), fc.received_date, CAST(NULL AS timestamp),
+                   CAST(NULL AS text), fc.payload, -ts_rank_cd(cs.document, query)
+            FROM {PG_COLD_TABLE} cs JOIN feed_items_cold fc ON fc.id = cs.id, to_tsquery('{PG_TS_CONFIG}', :q) query
+            WHERE cs.document @@ query AND fc.sender_email IN :emails AND fc.archived_at {archived_filter}
+        '''
+
+    statement = text(
+        f"SELECT * FROM ({inner}) ranked {after} ORDER BY score, id DESC LIMIT :limit"
+    ).bindparams(bindparam("emails", expanding=True)).columns(
+        id=Integer, sender_email=String, core_link=String, received_date=DateTime,
+        processed_date=DateTime, notes=Text, payload=LargeBinary, score=Float
+    )
+    rows = db.execute(statement, params).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[7], last[0])
+    # Cold rows carry their link and notes in the compressed payload
+    return [cold_feed_row((row[0], row[1], row[3], row[6])) if row[6] is not None else tuple(row[:6])
+            for row in rows], next_cursor
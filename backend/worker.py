@@ -1,12 +1,13 @@
 """Email worker - processes emails and extracts links"""
+import argparse
 import imaplib
 import email
-import re
-from bs4 import BeautifulSoup
-from datetime import datetime
+import logging
+from datetime import datetime, timedelta
 import os
 import signal
 import sys
+import threading
 from pathlib import Path
 import time
 
@@ -20,13 +21,41 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 # Use direct imports (Railway runs from /backend directory)
-from utils.database import get_raw_connection
+from utils.database import get_raw_connection, engine
 from config import settings
 from utils.link_preview import fetch_link_preview
+from utils.feed_events import FEED_NOTIFY_CHANNEL
+from utils.changes import prune_change_log
+from utils.feed_cache import feed_cache
+from utils.cold_tier import freeze_old_items
+from utils.partitions import ensure_feed_partitions, drop_empty_partitions
+from utils.mail_sync import ensure_sync_state, load_checkpoint, save_checkpoint
+from utils.imap_fetch import fetch_text_messages
+from utils.imap_session import CONNECTION_ERRORS, ImapSession, write_metrics_file
+from utils.imap_idle import supports_idle, wait_for_new_mail
+from utils.mailbox_leases import LeaseManager, ensure_mailbox_tables, seed_default_mailbox
+from utils.email_parsing import parse_fetched_message, parse_raw_message
+from utils.mail_archives import iter_archive
+from utils.parse_pool import ParsePool
+
+logger = logging.getLogger(__name__)
+
+# How often to drop expired delta-sync change records
+CHANGE_PRUNE_INTERVAL = 3600
+
+# How often to move old items to the cold tier and manage PostgreSQL partitions
+TIER_MAINTENANCE_INTERVAL = 3600
+
+# Parses fetched mail; processes start on first use
+parse_pool = ParsePool(settings.parse_workers, settings.parse_max_in_flight)
+
+# How often to log IMAP session metrics (IMAP_METRICS_FILE is rewritten every rebalance)
+METRICS_INTERVAL = 3600
 
 # Try PostgreSQL, fallback to SQLite
 try:
     import psycopg2
+    from psycopg2.extras import execute_values
     USE_POSTGRES = True
 except ImportError:
     USE_POSTGRES = False
@@ -84,209 +113,443 @@ def init_database():
     
     conn.commit()
     conn.close()
+    ensure_sync_state(engine)
+    ensure_mailbox_tables(engine)
+    if seed_default_mailbox(engine, settings.gmail_user, 'GMAIL_PASSWORD'):
+        print(f"📬 Added {settings.gmail_user} as mailbox 'default' (password from GMAIL_PASSWORD)")
     print(f"✅ Database initialized ({'PostgreSQL' if USE_POSTGRES and settings.database_url and not settings.database_url.startswith('sqlite') else 'SQLite'})")
 
-def save_to_database(sender_email, core_link, received_date):
-    """Save feed item to database (just the link, no preview data)"""
-    conn = get_raw_connection()
+def save_items(conn, items):
+    """Insert parsed (sender_email, core_link, received_date) items in one transaction
+
+    Returns (inserted, duplicates); items already in feed_items, or repeated
+    within the batch, are duplicates. Raises (after rolling back) if the
+    insert fails, so the caller can retry the batch.
+    """
+    if not items:
+        return 0, 0
     cursor = conn.cursor()
+    processed_date = datetime.now()
     
     try:
         if USE_POSTGRES and settings.database_url and not settings.database_url.startswith('sqlite'):
-            cursor.execute('''
+            inserted_rows = execute_values(cursor, '''
                 INSERT INTO feed_items (
                     sender_email, core_link, received_date, processed_date
                 )
-                VALUES (%s, %s, %s, %s)
+                VALUES %s
                 ON CONFLICT (sender_email, core_link, received_date) DO NOTHING
-            ''', (
-                sender_email, core_link, received_date, datetime.now()
-            ))
+                RETURNING sender_email
+            ''', [item + (processed_date,) for item in items], page_size=500, fetch=True)
+            inserted = len(inserted_rows)
+            inserted_senders = {row[0] for row in inserted_rows}
+            for sender_email in sorted(inserted_senders):
+                # Wake up live feed streams (delivered when the transaction commits)
+                cursor.execute("SELECT pg_notify(%s, %s)", (FEED_NOTIFY_CHANNEL, sender_email))
         else:
-            cursor.execute('''
-                INSERT INTO feed_items (
-                    sender_email, core_link, received_date, processed_date
-                )
-                VALUES (?, ?, ?, ?)
-            ''', (
-                sender_email, core_link, received_date, datetime.now().isoformat()
-            ))
+            # One statement per row: executemany's rowcount can't say which rows were
+            # new, and invalidating every sender in the batch would drop their cached
+            # first pages for nothing (sqlite3 can't RETURNING from executemany)
+            processed = processed_date.isoformat()
+            inserted_senders = set()
+            inserted = 0
+            for item in items:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO feed_items (
+                        sender_email, core_link, received_date, processed_date
+                    )
+                    VALUES (?, ?, ?, ?)
+                ''', item + (processed,))
+                if cursor.rowcount == 1:
+                    inserted += 1
+                    inserted_senders.add(item[0])
         
         conn.commit()
-        rows_affected = cursor.rowcount
-        
-        if rows_affected > 0:
-            print(f"✅ Saved: {core_link} from {sender_email}")
-            return True
-        else:
-            print(f"⚠️ Duplicate: {core_link} from {sender_email}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Database error: {e}")
-        return False
-    finally:
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    if inserted_senders:
+        # Shared cache backends drop cached first pages right away; API
+        # processes with the in-process cache hear about it via the feed
+        # event broker
+        feed_cache.invalidate_senders(sorted(inserted_senders))
+    return inserted, len(items) - inserted
 
-def connect_to_gmail():
-    """Connect to Gmail"""
-    imap = imaplib.IMAP4_SSL("imap.gmail.com")
-    imap.login(settings.gmail_user, settings.gmail_password)
+def connect_to_mailbox(mailbox):
+    """Connect and log in to a mailbox's IMAP server"""
+    imap = imaplib.IMAP4_SSL(mailbox.host, mailbox.port)
+    imap.login(mailbox.username, mailbox.password)
     return imap
 
-def extract_sender_email(from_field):
-    """Extract clean email address from From field"""
-    match = re.search(r'<(.+?)>', from_field)
-    return match.group(1) if match else from_field.strip()
-
-def extract_urls_from_email(message):
-    """Extract all URLs from email"""
-    urls = []
-    text_content = ""
-    html_content = ""
-    
-    if message.is_multipart():
-        for part in message.walk():
-            content_type = part.get_content_type()
-            content_disposition = str(part.get("Content-Disposition"))
-            
-            if "attachment" not in content_disposition:
-                if content_type == "text/plain":
-                    text_content = part.get_payload(decode=True).decode(errors='ignore')
-                elif content_type == "text/html":
-                    html_content = part.get_payload(decode=True).decode(errors='ignore')
-    else:
-        content = message.get_payload(decode=True).decode(errors='ignore')
-        if message.get_content_type() == "text/html":
-            html_content = content
-        else:
-            text_content = content
-    
-    url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-    
-    if text_content:
-        urls.extend(re.findall(url_pattern, text_content))
-    
-    if html_content:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        for link in soup.find_all('a', href=True):
-            urls.append(link['href'])
-        urls.extend(re.findall(url_pattern, html_content))
-    
-    # Deduplicate
-    seen = set()
-    unique_urls = []
-    for url in urls:
-        clean_url = url.rstrip('>')
-        if clean_url not in seen and clean_url.startswith('http'):
-            seen.add(clean_url)
-            unique_urls.append(clean_url)
-    
-    return unique_urls
+def selected_mailbox_value(imap, name):
+    """A response code (UIDVALIDITY, UIDNEXT) the server sent when the mailbox was selected"""
+    values = imap.untagged_responses.get(name)
+    return int(values[-1]) if values else None
 
-def get_primary_url(urls):
-    """Get primary URL by filtering junk"""
-    if not urls:
-        return None
-    
-    junk_patterns = [
-        r'apps\.apple\.com',
-        r'play\.google\.com',
-        r'onelink\.me',
-        r'app\.link',
-        r'/download',
-        r'cdnjs\.cloudflare\.com',
-        r'ea\.twimg\.com',
-        r'pbs\.twimg\.com/profile',
-        r'\.(png|jpg|jpeg|gif|svg|ico|css|js)(\?|$)',
-        r'/pixel',
-        r'google-analytics\.com',
-        r'doubleclick\.net',
-    ]
-    
-    for url in urls:
-        is_junk = any(re.search(pattern, url, re.IGNORECASE) for pattern in junk_patterns)
-        if not is_junk:
-            return url
-    
-    return urls[0] if urls else None
+def process_new_emails(imap, mailbox):
+    """Process messages that arrived since the last UID checkpoint and add them to the database
 
-def process_unseen_emails():
-    """Process all unseen emails and add to database"""
+    imap is a connection with the mailbox's folder selected; mailbox is its
+    checkpoint key. Connection errors propagate so the session can
+    reconnect; anything else is logged.
+    """
     
-    print(f"🔄 Checking emails at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"🔄 Checking {mailbox} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
-        imap = connect_to_gmail()
-        imap.select('"INBOX"')
-        
-        status, messages = imap.search(None, 'UNSEEN')
-        
-        if not messages[0]:
-            print("   No new emails")
-            imap.close()
-            imap.logout()
-            return 0
-        
-        email_ids = messages[0].split()
-        processed_count = 0
+        uid_validity = selected_mailbox_value(imap, 'UIDVALIDITY')
+        checkpoint = load_checkpoint(engine, mailbox)
+        if checkpoint is not None and checkpoint.uid_validity == uid_validity:
+            last_uid = checkpoint.last_uid
+            criteria = f'UID {last_uid + 1}:*'
+        else:
+            if checkpoint is None:
+                # First UID sync: pick up what \Seen-based polling hadn't processed yet
+                criteria = 'UNSEEN'
+            else:
+                # Old UIDs mean nothing now; re-read recent mail, duplicates are skipped on insert
+                print(f"⚠️ UIDVALIDITY changed ({checkpoint.uid_validity} -> {uid_validity}), re-scanning recent mail")
+                since = checkpoint.updated_at - timedelta(days=1)
+                criteria = f'SINCE {since.strftime("%d-%b-%Y")}'
+            last_uid = 0
+            uid_next = selected_mailbox_value(imap, 'UIDNEXT')
         
-        for email_id in email_ids:
-            try:
-                _, msg_data = imap.fetch(email_id, "(RFC822)")
-                message = email.message_from_bytes(msg_data[0][1])
-                
-                from_field = message.get('From', '')
-                sender_email = extract_sender_email(from_field)
-                received_date = message.get('Date', datetime.now().isoformat())
-                
-                urls = extract_urls_from_email(message)
-                core_link = get_primary_url(urls)
-                
-                if core_link:
-                    # Just save the link, previews will be fetched on-demand
-                    if save_to_database(sender_email, core_link, received_date):
-                        processed_count += 1
+        status, messages = imap.uid('SEARCH', None, criteria)
+        # "UID n:*" always matches the newest message, even when its UID is below n
+        uids = sorted(uid for uid in (int(u) for u in messages[0].split()) if uid > last_uid)
+        inserted_count = duplicate_count = 0
+        conn = get_raw_connection() if uids else None
+        try:
+            for start in range(0, len(uids), settings.imap_fetch_batch_size):
+                # Headers and text parts only, a few FETCHes per batch; PEEK leaves
+                # \Seen alone. A connection error here stops the cycle without
+                # moving the checkpoint past these messages
+                batch = fetch_text_messages(
+                    imap, uids[start:start + settings.imap_fetch_batch_size], settings.imap_max_message_bytes
+                )
+                items = []
+                # Decoding and link extraction run in the parse pool, results in UID order
+                for parsed in parse_pool.map(parse_fetched_message, batch):
+                    if parsed.error:
+                        print(f"❌ Error processing email UID {parsed.uid}: {parsed.error}")
+                    elif parsed.core_link:
+                        # Just the link, previews will be fetched on-demand
+                        items.append((parsed.sender_email, parsed.core_link, parsed.received_date))
                 
-            except Exception as e:
-                print(f"❌ Error processing email {email_id}: {e}")
-                continue
+                # One transaction per batch, then move the checkpoint past it; a
+                # crash in between only re-reads the batch, whose rows are duplicates then
+                inserted, duplicates = save_items(conn, items)
+                inserted_count += inserted
+                duplicate_count += duplicates
+                if batch:
+                    last_uid = batch[-1].uid
+                    save_checkpoint(engine, mailbox, uid_validity, last_uid)
+                print(f"   Batch of {len(batch)} messages: {inserted} saved, {duplicates} duplicates")
+        finally:
+            if conn is not None:
+                conn.close()
         
-        print(f"✅ Processed {processed_count} new items")
+        if checkpoint is None or checkpoint.uid_validity != uid_validity:
+            # New checkpoint starts past everything that was already in the mailbox
+            save_checkpoint(engine, mailbox, uid_validity, max(last_uid, (uid_next or 1) - 1))
         
-        imap.close()
-        imap.logout()
+        if uids:
+            print(f"✅ Processed {inserted_count} new items from {len(uids)} messages ({duplicate_count} duplicates)")
+        else:
+            print("   No new emails")
         
-        return processed_count
+        return inserted_count
         
+    except CONNECTION_ERRORS:
+        raise
     except Exception as e:
         print(f"❌ Error: {e}")
         return 0
 
+_last_change_prune = 0.0
+
+def prune_expired_changes():
+    """Drop change log rows past the retention window (at most once per CHANGE_PRUNE_INTERVAL)"""
+    global _last_change_prune
+    if time.time() - _last_change_prune < CHANGE_PRUNE_INTERVAL:
+        return
+    _last_change_prune = time.time()
+    try:
+        pruned = prune_change_log(engine)
+        if pruned:
+            print(f"🧹 Pruned {pruned} expired change records")
+    except Exception as e:
+        print(f"❌ Change log prune error: {e}")
+
+_last_tier_maintenance = 0.0
+
+def maintain_storage_tiers():
+    """Create upcoming partitions, move old items to the cold tier, drop emptied partitions"""
+    global _last_tier_maintenance
+    if time.time() - _last_tier_maintenance < TIER_MAINTENANCE_INTERVAL:
+        return
+    _last_tier_maintenance = time.time()
+    try:
+        created = ensure_feed_partitions(engine)
+        if created:
+            print(f"🗂️  Created {created} feed_items partitions")
+        moved = freeze_old_items(engine)
+        if moved:
+            print(f"🧊 Moved {moved} items older than {settings.cold_tier_after_days} days to the cold tier")
+        if settings.cold_tier_after_days > 0:
+            cutoff = datetime.utcnow() - timedelta(days=settings.cold_tier_after_days)
+            for name in drop_empty_partitions(engine, cutoff):
+                print(f"🧹 Dropped empty partition {name}")
+    except Exception as e:
+        print(f"❌ Storage tier maintenance error: {e}")
+
+_last_metrics_report = 0.0
+
+def report_imap_metrics(watchers):
+    """Export each mailbox session's counters to IMAP_METRICS_FILE, and log them once per METRICS_INTERVAL"""
+    global _last_metrics_report
+    sessions = {watcher.mailbox.name: watcher.session for watcher in watchers}
+    if settings.imap_metrics_file:
+        try:
+            write_metrics_file(settings.imap_metrics_file, sessions)
+        except OSError as e:
+            logger.error(f"Couldn't write IMAP metrics to {settings.imap_metrics_file}: {e}")
+    if time.time() - _last_metrics_report < METRICS_INTERVAL:
+        return
+    _last_metrics_report = time.time()
+    for name, session in sessions.items():
+        metrics = session.metrics()
+        logger.info(f"IMAP {name} {metrics['state']} since {metrics['connected_since']}: "
+                    f"{metrics['reconnects']} reconnects, {metrics['failures']} failures "
+                    f"({metrics['health_check_failures']} failed health checks), last error: {metrics['last_error']}")
+
+def run_maintenance():
+    prune_expired_changes()
+    maintain_storage_tiers()
+
+class MaintenanceThread(threading.Thread):
+    """Runs run_maintenance() every mailbox_rebalance_seconds, off the lease loop
+
+    The first cold-tier pass on a large table can take far longer than a
+    lease period. Run from the lease loop, it would stop this worker's
+    leases from being renewed while its watchers kept running, and other
+    workers would start ingesting the same mailboxes.
+    """
+    def __init__(self):
+        super().__init__(name="maintenance", daemon=True)
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.is_set():
+            run_maintenance()
+            self.stopping.wait(settings.mailbox_rebalance_seconds)
+
+    def stop(self, timeout=10):
+        # A freeze batch in progress is left to roll back when the process exits
+        self.stopping.set()
+        self.join(timeout)
+
+def run_mailbox(session, mailbox):
+    """Check for mail, then wait in IDLE (or sleep check_interval when IDLE is off or unsupported), until stopped"""
+    idle_reported = None
+    while not session.stopped:
+        try:
+            imap = session.connection()
+            process_new_emails(imap, mailbox.checkpoint_key)
+            session.healthy()
+            
+            use_idle = settings.imap_idle and supports_idle(imap)
+            if use_idle != idle_reported:
+                if use_idle:
+                    print(f"📬 {mailbox.name}: IDLE push mode, waiting for new mail")
+                elif settings.imap_idle:
+                    print(f"⚠️ {mailbox.name}: server doesn't support IDLE, polling every {settings.check_interval} seconds")
+                idle_reported = use_idle
+            if use_idle:
+                # Rescan after every IDLE, whatever it returns: responses
+                # that arrive around DONE never reach imaplib, and on
+                # timeout a notification may have been missed
+                wait_for_new_mail(imap, settings.imap_idle_timeout)
+            else:
+                session.sleep(settings.check_interval)
+        except Exception as e:
+            if session.stopped:
+                break
+            # Reconnects with jittered exponential backoff
+            print(f"❌ {mailbox.name}: worker error: {e}")
+            session.invalidate(e)
+    session.close()
+
+class MailboxWatcher(threading.Thread):
+    """A thread watching one leased mailbox over its own IMAP session"""
+    def __init__(self, mailbox):
+        super().__init__(name=f"mailbox-{mailbox.name}", daemon=True)
+        self.mailbox = mailbox
+        self.session = ImapSession(
+            lambda: connect_to_mailbox(mailbox),
+            mailbox=f'"{mailbox.folder}"',
+            health_check_seconds=settings.imap_health_check_seconds,
+            backoff_base=settings.imap_backoff_base,
+            backoff_max=settings.imap_backoff_max,
+        )
+
+    def run(self):
+        run_mailbox(self.session, self.mailbox)
+
+    def stop(self, timeout=10):
+        self.session.stop()
+        self.join(timeout)
+
+def stop_watchers(watchers, mailbox_ids):
+    for mailbox_id in mailbox_ids:
+        watcher = watchers.pop(mailbox_id, None)
+        if watcher is not None:
+            print(f"⏹️  Stopping {watcher.mailbox.name}")
+            watcher.stop()
+
+def run_worker(leases):
+    """Keep one watcher thread per leased mailbox, rebalancing leases every mailbox_rebalance_seconds"""
+    watchers = {}
+    maintenance = MaintenanceThread()
+    maintenance.start()
+    try:
+        while True:
+            try:
+                held, surplus = leases.rebalance()
+                # Another worker started: hand these over once we've stopped watching them
+                stop_watchers(watchers, surplus)
+                leases.release(surplus)
+
+                held_ids = {mailbox.id for mailbox in held}
+                stop_watchers(watchers, [
+                    mailbox_id for mailbox_id, watcher in watchers.items()
+                    if mailbox_id not in held_ids or not watcher.is_alive()
+                ])
+                for mailbox in held:
+                    watcher = watchers.get(mailbox.id)
+                    if watcher is not None and watcher.mailbox != mailbox:
+                        # Host, credentials or folder changed
+                        stop_watchers(watchers, [mailbox.id])
+                    if mailbox.id not in watchers:
+                        print(f"▶️  Watching {mailbox.name} ({mailbox.username} {mailbox.folder} on {mailbox.host})")
+                        watchers[mailbox.id] = MailboxWatcher(mailbox)
+                        watchers[mailbox.id].start()
+            except Exception as e:
+                print(f"❌ Lease error: {e}")
+                if leases.lease_lost() and watchers:
+                    # Others may have taken our mailboxes over by now
+                    print("⚠️ Leases not renewed for a full lease period, stopping all mailboxes")
+                    stop_watchers(watchers, list(watchers))
+            
+            report_imap_metrics(list(watchers.values()))
+            time.sleep(settings.mailbox_rebalance_seconds)
+    finally:
+        maintenance.stop()
+        stop_watchers(watchers, list(watchers))
+        leases.release_all()
+
+def ingest_archive(path, kind, pool, batch_size=1000, dry_run=False):
+    """Backfill feed_items from a local mbox file or Maildir
+
+    Messages are streamed from disk, parsed in the pool with the same link
+    extraction and scoring as IMAP mail, and inserted batch_size at a time.
+    With dry_run nothing is written, which makes this an offline benchmark
+    of the worker's parsing throughput. Returns the counts it printed.
+    """
+    counts = {'messages': 0, 'links': 0, 'inserted': 0, 'duplicates': 0, 'no_link': 0, 'errors': 0}
+    items = []
+    started = time.monotonic()
+
+    def flush():
+        if items and conn is not None:
+            inserted, duplicates = save_items(conn, items)
+            counts['inserted'] += inserted
+            counts['duplicates'] += duplicates
+        items.clear()
+        rate = counts['messages'] / max(time.monotonic() - started, 1e-9)
+        print(f"   {counts['messages']} messages ({rate:.0f}/s): {counts['inserted']} saved, "
+              f"{counts['duplicates']} duplicates, {counts['no_link']} without links, {counts['errors']} errors")
+
+    conn = None if dry_run else get_raw_connection()
+    try:
+        for parsed in pool.map(parse_raw_message, iter_archive(path, kind)):
+            counts['messages'] += 1
+            if parsed.error:
+                counts['errors'] += 1
+                print(f"❌ Error processing message {parsed.uid}: {parsed.error}")
+            elif parsed.core_link:
+                counts['links'] += 1
+                items.append((parsed.sender_email, parsed.core_link, parsed.received_date))
+            else:
+                counts['no_link'] += 1
+            if len(items) >= batch_size:
+                flush()
+        flush()
+    finally:
+        if conn is not None:
+            conn.close()
+
+    elapsed = time.monotonic() - started
+    print(f"✅ {counts['messages']} messages in {elapsed:.1f}s ({counts['messages'] / max(elapsed, 1e-9):.0f}/s, "
+          f"{pool.workers} parse processes): {counts['links']} links"
+          + (" (dry run, nothing saved)" if dry_run else f", {counts['inserted']} new items"))
+    return counts
+
 def signal_handler(sig, frame):
     """Graceful shutdown"""
     print('\n\n👋 Shutting down gracefully...')
     sys.exit(0)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch the mailboxes for new mail, or backfill from local archives")
+    commands = parser.add_subparsers(dest="command")
+    ingest = commands.add_parser("ingest", help="Load links from a local mbox file or Maildir, then exit")
+    source = ingest.add_mutually_exclusive_group(required=True)
+    source.add_argument("--mbox")
+    source.add_argument("--maildir")
+    ingest.add_argument("--batch-size", type=int, default=1000)
+    ingest.add_argument("--workers", type=int, default=settings.parse_workers,
+                        help="Parse processes (default: PARSE_WORKERS; 0 = one per CPU)")
+    ingest.add_argument("--dry-run", action="store_true", help="Parse without saving: measures throughput")
+    args = parser.parse_args()
+    
     signal.signal(signal.SIGTERM, signal_handler)
     signal.signal(signal.SIGINT, signal_handler)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
     
+    if args.command == "ingest":
+        if not args.dry_run:
+            init_database()
+        pool = ParsePool(args.workers, settings.parse_max_in_flight)
+        try:
+            ingest_archive(args.mbox or args.maildir, 'mbox' if args.mbox else 'maildir', pool,
+                           args.batch_size, args.dry_run)
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        finally:
+            pool.close()
+        sys.exit(0)
+    
+    leases = LeaseManager(engine, settings.worker_id, settings.mailbox_lease_seconds)
     print("=" * 80)
     print("🚀 FEED PROCESSOR STARTED")
-    print(f"📧 Monitoring: {settings.gmail_user}")
-    print(f"⏱️  Check interval: {settings.check_interval} seconds")
+    print(f"🆔 Worker: {leases.worker_id} (leases: {settings.mailbox_lease_seconds}s, "
+          f"rebalanced every {settings.mailbox_rebalance_seconds}s)")
+    if settings.imap_idle:
+        print(f"⏱️  Mode: IDLE push (renewed every {settings.imap_idle_timeout} seconds)")
+    else:
+        print(f"⏱️  Check interval: {settings.check_interval} seconds")
     print("=" * 80)
     
     init_database()
     
-    while True:
-        try:
-            process_unseen_emails()
-            time.sleep(settings.check_interval)
-        except KeyboardInterrupt:
-            break
-        except Exception as e:
-            print(f"❌ Fatal error: {e}")
-            time.sleep(60)
-
+    try:
+        run_worker(leases)
+    finally:
+        parse_pool.close()